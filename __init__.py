@@ -50,13 +50,14 @@ install_tkinter()
 
 # Qtools节点组
 from .nodes.Qtools.dir_picker import DirPicker
-from .nodes.Qtools.path_processor import PathProcessor
+from .nodes.Qtools.path_processor import PathProcessor, PathBatchProcessor
 from .nodes.Qtools.queue_trigger import ImpactQueueTriggerCountdown
 from .nodes.Qtools.work_mode import WorkMode
 from .nodes.Qtools.dir_opener import DirOpener
 
 # AI助手节点组
 from .nodes.AIAssistant.AIAssistant import GenericOpenAILLMAPI, GenericOpenAIVLMAPI
+from .nodes.AIAssistant.batch_llm import GenericOpenAIBatchLLMAPI
 from .nodes.AIAssistant.preset_node import AIAssistantPreset
 from .nodes.AIAssistant.text_processor import TextProcessor
 from .nodes.AIAssistant.number_generator import NumberGenerator
@@ -69,6 +70,9 @@ from .nodes.AIAssistant.story_extractor import StoryExtractor
 from .nodes.Translator.translator_node import TranslatorNode
 from .nodes.Translator.auto_translator_box import AutoTranslatorBox
 
+# 前端翻译与翻译记忆接口（/translator/*）
+from .nodes.Translator import translator_routes
+
 # Lotus节点组
 from .nodes.Lotus.lotus_nodes import LoadLotusModel, LotusSampler
 
@@ -80,6 +84,9 @@ from .nodes.Supir.supir_decode import SUPIR_decode
 from .nodes.Supir.supir_conditioner import SUPIR_conditioner
 from .nodes.Supir.supir_model_loader import SUPIR_model_loader
 
+# 节点状态同步接口（/axun/state）
+from .utils import state_sync
+
 #######################
 # 节点映射
 #######################
@@ -89,6 +96,7 @@ NODE_CLASS_MAPPINGS = {
     # Qtools节点组
     "axun_nodes_DirPicker": DirPicker,
     "axun_nodes_PathProcessor": PathProcessor,
+    "axun_nodes_PathBatchProcessor": PathBatchProcessor,
     "axun_nodes_QueueTrigger": ImpactQueueTriggerCountdown,
     "axun_nodes_WorkMode": WorkMode,
     "axun_nodes_DirOpener": DirOpener,
@@ -96,6 +104,7 @@ NODE_CLASS_MAPPINGS = {
     # AI助手节点组
     "GenericOpenAILLMAPI": GenericOpenAILLMAPI,
     "GenericOpenAIVLMAPI": GenericOpenAIVLMAPI,
+    "GenericOpenAIBatchLLMAPI": GenericOpenAIBatchLLMAPI,
     "AIAssistantPreset": AIAssistantPreset,
     "TextProcessor": TextProcessor,
     "NumberGenerator": NumberGenerator,
@@ -126,6 +135,7 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     # Qtools节点组
     "axun_nodes_DirPicker": "📁 Directory Picker",
     "axun_nodes_PathProcessor": "🔍 Path Processor",
+    "axun_nodes_PathBatchProcessor": "🔍 Path Batch Processor",
     "axun_nodes_QueueTrigger": "⏱️ Queue Trigger",
     "axun_nodes_WorkMode": "⚙️ Work Mode",
     "axun_nodes_DirOpener": "📂 Directory Opener",
@@ -133,6 +143,7 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     # AI助手节点组
     "GenericOpenAILLMAPI": "🤖 OpenAI 兼容 LLM",
     "GenericOpenAIVLMAPI": "🔍 OpenAI 兼容 VLM",
+    "GenericOpenAIBatchLLMAPI": "🚀 OpenAI 兼容批量 LLM",
     "AIAssistantPreset": "⚙️ AI Assistant Preset",
     "TextProcessor": "📝 Text Processor",
     "NumberGenerator": "🔢 Number Generator",
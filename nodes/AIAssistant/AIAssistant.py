@@ -1,50 +1,111 @@
 import json
 import asyncio
+import importlib.util
 import aiohttp
 from aiohttp import web
 from server import PromptServer
 from typing import List, Dict
-import os
 import sys
+import time
+
+import comfy.model_management
 
 from .utils.api_handler import GenericOpenAIHandler
-from .utils.image_utils import encode_comfy_image
+from .utils.http_client import get_http_client
+from .utils.response_cache import get_response_cache
+from .utils.telemetry import get_telemetry
+from .utils.api_handler import format_bytes
+from .utils.config_manager import get_config_path as _get_config_path, get_config_store
+from .utils.image_utils import PAYLOAD_FORMATS, encode_images_for_payload
+from ...utils.feedback import get_feedback_dispatcher, send_feedback, truncate_text
 
 def get_config_path(filename):
     """获取配置文件的路径，固定使用Axun_Nodes/config目录"""
-    # 获取当前文件所在目录
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # 定位到 Axun_Nodes 目录
-    # 当前目录结构: .../custom_nodes/Axun_Nodes/nodes/AIAssistant
-    axun_nodes_dir = os.path.dirname(os.path.dirname(current_dir))
-    
-    # 构造配置文件路径
-    config_path = os.path.join(axun_nodes_dir, "config", filename)
-    
-    # 确保配置目录存在
-    os.makedirs(os.path.dirname(config_path), exist_ok=True)
-    
-    # 打印配置文件路径进行调试
-    abs_path = os.path.abspath(config_path)
-    print(f"[AIAssistant] 使用固定配置路径: {abs_path}")
-    
-    return config_path
+    return _get_config_path(filename)
+
+class StreamFeedback:
+    """流式响应的增量文本回调
+
+    累积增量文本，并按固定间隔通过 impact-node-feedback 推送到节点的
+    stream_preview 预览控件（前端仅用于显示的 DOM 控件，不是节点输入）；
+    每次回调都会检查中断标志，用户取消时立即中止请求。
+    """
+
+    def __init__(self, node_id, widget_name="stream_preview", interval=0.2):
+        self.node_id = node_id
+        self.widget_name = widget_name
+        self.interval = interval
+        self.parts = []
+        self._last_sent = 0.0
+
+    def __call__(self, delta: str):
+        comfy.model_management.throw_exception_if_processing_interrupted()
+        self.parts.append(delta)
+        now = time.monotonic()
+        if now - self._last_sent >= self.interval:
+            self._last_sent = now
+            self._send()
+
+    def finish(self):
+        """推送最终完整文本"""
+        self._send()
+
+    def _send(self):
+        if not self.node_id:
+            return
+        try:
+            send_feedback(self.node_id, self.widget_name, "text", "".join(self.parts), display_only=True)
+        except Exception as e:
+            print(f"[AIAssistant] 推送流式文本失败: {e}")
+
+# 支持 async 节点函数的最低 ComfyUI 版本
+ASYNC_NODES_MIN_VERSION = (0, 3, 45)
+
+def _comfy_supports_async_nodes() -> bool:
+    """当前 ComfyUI 是否支持 async 节点函数（支持时执行器会在等待期间运行其他分支）
+
+    依据公开的 comfy_api.latest 模块（随 async 节点之后发布）或 comfyui_version 中的版本号判断，
+    无法判断时按同步执行。
+    """
+    try:
+        if importlib.util.find_spec("comfy_api.latest") is not None:
+            return True
+    except (ImportError, ValueError):
+        pass
+    try:
+        from comfyui_version import __version__
+        return tuple(int(part) for part in __version__.split(".")[:3]) >= ASYNC_NODES_MIN_VERSION
+    except Exception:
+        return False
+
+ASYNC_NODES_SUPPORTED = _comfy_supports_async_nodes()
+
+def parse_chat_response(response, feedback=None):
+    """从 chat/completions 响应中取出文本，返回节点输出；流式输出时同时在预览控件中显示最终文本"""
+    ret = json.loads(response)
+    text = ret["choices"][0]["message"]["content"]
+    print(f"[AIAssistant] API调用成功, 返回内容长度: {len(text)}")
+    if feedback:
+        feedback.finish()
+        preview = truncate_text(text, get_feedback_dispatcher().settings["max_text_length"])
+        return {"ui": {"stream_preview": [preview]}, "result": (text,)}
+    return (text,)
+
+def api_call_error(e):
+    print(f"[AIAssistant] API调用失败: {str(e)}")
+    return Exception(f"调用 API 失败: {str(e)}")
 
 class GenericOpenAILLMAPI:
     """通用 OpenAI 格式 LLM API 节点，支持自定义 API 地址"""
     
     def __init__(self):
         self.config_path = get_config_path("AIAssistant_config.json")
-        print(f"[AIAssistant] LLM节点使用配置文件路径: {self.config_path}")
         
         # 确保配置文件存在，如果不存在则创建一个带有空api_configs的基础配置
-        if not os.path.exists(self.config_path):
+        store = get_config_store()
+        if not store.exists("AIAssistant_config.json"):
             print(f"[AIAssistant] 配置文件不存在，创建默认配置: {self.config_path}")
-            default_config = {"api_configs": []}
-            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=4, ensure_ascii=False)
+            store.save("AIAssistant_config.json", {"api_configs": []})
 
     @classmethod
     def INPUT_TYPES(s):
@@ -108,11 +169,16 @@ class GenericOpenAILLMAPI:
                         "multiline": False,
                     }
                 ),
+                "stream": ("BOOLEAN", {"default": False, "label_on": "流式输出", "label_off": "一次性输出"}),
+                "use_cache": ("BOOLEAN", {"default": False, "label_on": "使用缓存", "label_off": "跳过缓存"}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             }
         }
 
     RETURN_TYPES = ("STRING",)
-    FUNCTION = "get_llm_model_response"
+    FUNCTION = "aget_llm_model_response" if ASYNC_NODES_SUPPORTED else "get_llm_model_response"
     OUTPUT_NODE = False
     CATEGORY = "!Axun Nodes/AIAssistant"
 
@@ -120,14 +186,8 @@ class GenericOpenAILLMAPI:
     def load_api_configs(cls):
         """加载API配置"""
         try:
-            config_path = get_config_path("AIAssistant_config.json")
-            print(f"[AIAssistant] load_api_configs 使用配置文件路径: {config_path}")
-            
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    return config.get("api_configs", [])
-            return []
+            config = get_config_store().load("AIAssistant_config.json", {})
+            return config.get("api_configs", [])
         except Exception as e:
             print(f"加载配置失败: {e}")
             return []
@@ -135,46 +195,41 @@ class GenericOpenAILLMAPI:
     def save_config(self, config_name, config_data):
         """保存完整的API配置到配置文件"""
         try:
-            # 读取现有配置
-            all_configs = {}
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    all_configs = json.load(f)
+            def apply(all_configs):
+                # 确保api_configs字段存在
+                if "api_configs" not in all_configs:
+                    all_configs["api_configs"] = []
             
-            # 确保api_configs字段存在
-            if "api_configs" not in all_configs:
-                all_configs["api_configs"] = []
-            
-            # 检查是否已存在相同名称的配置
-            exists = False
-            for i, config in enumerate(all_configs["api_configs"]):
-                if config["name"] == config_name:
-                    all_configs["api_configs"][i] = config_data
-                    exists = True
-                    print(f"[AIAssistant] 更新配置 '{config_name}'")
-                    break
-            
-            if not exists:
-                all_configs["api_configs"].append(config_data)
-                print(f"[AIAssistant] 添加新配置 '{config_name}'")
+                # 检查是否已存在相同名称的配置
+                exists = False
+                for i, config in enumerate(all_configs["api_configs"]):
+                    if config["name"] == config_name:
+                        all_configs["api_configs"][i] = config_data
+                        exists = True
+                        print(f"[AIAssistant] 更新配置 '{config_name}'")
+                        break
             
+                if not exists:
+                    all_configs["api_configs"].append(config_data)
+                    print(f"[AIAssistant] 添加新配置 '{config_name}'")
+
             # 记录保存的配置内容
             print(f"[AIAssistant] 保存配置内容: model={config_data.get('model')}, system_prompt长度={len(config_data.get('system_prompt', ''))}, user_prompt长度={len(config_data.get('user_prompt', ''))}")
             
-            # 保存配置
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(all_configs, f, indent=4, ensure_ascii=False)
-                
+            # 读取现有配置、合并后原子写回
+            get_config_store().update("AIAssistant_config.json", apply)
+            
             print(f"[AIAssistant] 配置成功保存到 {self.config_path}")
             return True
         except Exception as e:
             print(f"[AIAssistant] 保存配置失败: {e}")
             return False
 
-    def get_llm_model_response(
-        self, config_selection, base_url, api_key, model, system_prompt, user_prompt, 
+    def _prepare_request(
+        self, config_selection, base_url, api_key, model, system_prompt, user_prompt,
         max_tokens, temperature, top_p, save_config=None, config_name=None
     ):
+        """解析预设配置、按需保存配置，返回 (handler, 请求参数)"""
         # 如果选择了预设配置，读取配置
         if config_selection != "手动输入":
             configs = self.load_api_configs()
@@ -222,24 +277,50 @@ class GenericOpenAILLMAPI:
         
         print(f"[AIAssistant] 开始调用API, 模型: {model}, base_url: {base_url}")
         handler = GenericOpenAIHandler(base_url=base_url, api_key=api_key)
+        return handler, (model, system_prompt, user_prompt, max_tokens, temperature, top_p)
+
+    def get_llm_model_response(
+        self, config_selection, base_url, api_key, model, system_prompt, user_prompt, 
+        max_tokens, temperature, top_p, save_config=None, config_name=None,
+        stream=False, use_cache=False, unique_id=None
+    ):
+        handler, request = self._prepare_request(
+            config_selection, base_url, api_key, model, system_prompt, user_prompt,
+            max_tokens, temperature, top_p, save_config, config_name
+        )
+        feedback = StreamFeedback(unique_id) if stream else None
         
         try:
-            response = handler.get_llm_response(
-                model,
-                system_prompt,
-                user_prompt,
-                max_tokens,
-                temperature,
-                top_p,
+            response = handler.get_llm_response(*request, stream=stream, on_delta=feedback, use_cache=use_cache)
+            return parse_chat_response(response, feedback)
+        except comfy.model_management.InterruptProcessingException:
+            print("[AIAssistant] 用户中断，已停止接收流式响应")
+            raise
+        except Exception as e:
+            raise api_call_error(e)
+
+    async def aget_llm_model_response(
+        self, config_selection, base_url, api_key, model, system_prompt, user_prompt,
+        max_tokens, temperature, top_p, save_config=None, config_name=None,
+        stream=False, use_cache=False, unique_id=None
+    ):
+        """get_llm_model_response 的异步版本，等待响应期间执行器可继续运行其他分支"""
+        handler, request = self._prepare_request(
+            config_selection, base_url, api_key, model, system_prompt, user_prompt,
+            max_tokens, temperature, top_p, save_config, config_name
+        )
+        feedback = StreamFeedback(unique_id) if stream else None
+
+        try:
+            response = await handler.aget_llm_response(
+                *request, stream=stream, on_delta=feedback, use_cache=use_cache
             )
-            
-            ret = json.loads(response)
-            text = ret["choices"][0]["message"]["content"]
-            print(f"[AIAssistant] API调用成功, 返回内容长度: {len(text)}")
-            return (text,)
+            return parse_chat_response(response, feedback)
+        except comfy.model_management.InterruptProcessingException:
+            print("[AIAssistant] 用户中断，已停止接收流式响应")
+            raise
         except Exception as e:
-            print(f"[AIAssistant] API调用失败: {str(e)}")
-            raise Exception(f"调用 API 失败: {str(e)}")
+            raise api_call_error(e)
 
 @PromptServer.instance.routes.post("/axun/AIAssistant/generic_openai/models")
 async def get_generic_openai_models(request):
@@ -257,6 +338,43 @@ async def get_generic_openai_models(request):
         print(f"[AIAssistant] 获取通用 OpenAI 模型列表失败: {e}")
         return web.json_response([f"获取模型列表失败: {str(e)}"])
 
+@PromptServer.instance.routes.get("/axun/AIAssistant/http_stats")
+async def get_http_stats(request):
+    """获取共享 HTTP 连接池的连接复用统计，以及节点是否以异步方式执行"""
+    stats = get_http_client().get_stats()
+    stats["async_nodes"] = ASYNC_NODES_SUPPORTED
+    return web.json_response(stats)
+
+@PromptServer.instance.routes.get("/axun/AIAssistant/telemetry")
+async def get_telemetry_stats(request):
+    """获取 LLM/VLM 调用的耗时、字节数和 token 用量统计"""
+    try:
+        recent = int(request.query.get("recent", 20))
+    except ValueError:
+        recent = 20
+    return web.json_response(get_telemetry().get_stats(recent))
+
+@PromptServer.instance.routes.post("/axun/AIAssistant/telemetry_reset")
+async def reset_telemetry(request):
+    """清空调用统计"""
+    get_telemetry().reset()
+    return web.json_response({"status": "success"})
+
+@PromptServer.instance.routes.get("/axun/AIAssistant/cache_stats")
+async def get_cache_stats(request):
+    """获取 LLM/VLM 响应缓存的命中统计"""
+    return web.json_response(get_response_cache().get_stats())
+
+@PromptServer.instance.routes.post("/axun/AIAssistant/cache_clear")
+async def clear_response_cache(request):
+    """清空 LLM/VLM 响应缓存"""
+    try:
+        get_response_cache().clear()
+        return web.json_response({"status": "success"})
+    except Exception as e:
+        print(f"[AIAssistant] 清空响应缓存失败: {e}")
+        return web.json_response({"status": "error", "message": str(e)})
+
 @PromptServer.instance.routes.post("/axun/AIAssistant/load_config")
 async def load_api_config(request):
     """加载指定名称的API配置"""
@@ -268,16 +386,11 @@ async def load_api_config(request):
             return web.json_response({"error": "未提供配置名称"}, status=400)
         
         # 读取配置文件
-        config_path = get_config_path("AIAssistant_config.json")
-        print(f"[AIAssistant] 路由处理函数使用配置文件路径: {config_path}")
-        
-        if not os.path.exists(config_path):
-            print(f"[AIAssistant] 配置文件不存在: {config_path}")
+        all_configs = get_config_store().load("AIAssistant_config.json")
+        if all_configs is None:
+            print(f"[AIAssistant] 配置文件不存在: {get_config_path('AIAssistant_config.json')}")
             return web.json_response({"error": "配置文件不存在"}, status=404)
         
-        with open(config_path, 'r', encoding='utf-8') as f:
-            all_configs = json.load(f)
-        
         api_configs = all_configs.get("api_configs", [])
         print(f"[AIAssistant] 已加载配置列表: {[config.get('name') for config in api_configs]}")
         
@@ -291,7 +404,8 @@ async def load_api_config(request):
                 print(f"[AIAssistant] 找到配置 '{config_name}', 包含字段: {list(config.keys())}")
                 print(f"[AIAssistant] system_prompt长度: {prompt_length}, user_prompt长度: {user_prompt_length}")
                 
-                # 如果有必要，确保所有字段都存在，避免前端undefined错误
+                # 如果有必要，确保所有字段都存在，避免前端undefined错误（在副本上补全，不修改缓存）
+                config = dict(config)
                 required_fields = ["base_url", "api_key", "model", "system_prompt", "user_prompt", 
                                   "max_tokens", "temperature", "top_p"]
                 
@@ -313,15 +427,12 @@ class GenericOpenAIVLMAPI:
     
     def __init__(self):
         self.config_path = get_config_path("AIAssistant_config.json")
-        print(f"[AIAssistant] VLM节点使用配置文件路径: {self.config_path}")
         
         # 确保配置文件存在，如果不存在则创建一个带有空api_configs的基础配置
-        if not os.path.exists(self.config_path):
+        store = get_config_store()
+        if not store.exists("AIAssistant_config.json"):
             print(f"[AIAssistant] 配置文件不存在，创建默认配置: {self.config_path}")
-            default_config = {"api_configs": []}
-            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=4, ensure_ascii=False)
+            store.save("AIAssistant_config.json", {"api_configs": []})
 
     @classmethod
     def INPUT_TYPES(s):
@@ -385,11 +496,19 @@ class GenericOpenAIVLMAPI:
                         "multiline": False,
                     }
                 ),
+                "stream": ("BOOLEAN", {"default": False, "label_on": "流式输出", "label_off": "一次性输出"}),
+                "use_cache": ("BOOLEAN", {"default": False, "label_on": "使用缓存", "label_off": "跳过缓存"}),
+                "resize_by_detail": ("BOOLEAN", {"default": False, "label_on": "按detail缩放", "label_off": "原始尺寸"}),
+                "image_format": (list(PAYLOAD_FORMATS.keys()), {"default": "WEBP无损"}),
+                "image_quality": ("INT", {"default": 90, "min": 1, "max": 100}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             }
         }
 
     RETURN_TYPES = ("STRING",)
-    FUNCTION = "get_vlm_model_response"
+    FUNCTION = "aget_vlm_model_response" if ASYNC_NODES_SUPPORTED else "get_vlm_model_response"
     OUTPUT_NODE = False
     CATEGORY = "!Axun Nodes/AIAssistant"
 
@@ -397,14 +516,8 @@ class GenericOpenAIVLMAPI:
     def load_api_configs(cls):
         """加载API配置"""
         try:
-            config_path = get_config_path("AIAssistant_config.json")
-            print(f"[AIAssistant] load_api_configs 使用配置文件路径: {config_path}")
-            
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    return config.get("api_configs", [])
-            return []
+            config = get_config_store().load("AIAssistant_config.json", {})
+            return config.get("api_configs", [])
         except Exception as e:
             print(f"加载配置失败: {e}")
             return []
@@ -412,46 +525,41 @@ class GenericOpenAIVLMAPI:
     def save_config(self, config_name, config_data):
         """保存完整的API配置到配置文件"""
         try:
-            # 读取现有配置
-            all_configs = {}
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    all_configs = json.load(f)
-            
-            # 确保api_configs字段存在
-            if "api_configs" not in all_configs:
-                all_configs["api_configs"] = []
+            def apply(all_configs):
+                # 确保api_configs字段存在
+                if "api_configs" not in all_configs:
+                    all_configs["api_configs"] = []
             
-            # 检查是否已存在相同名称的配置
-            exists = False
-            for i, config in enumerate(all_configs["api_configs"]):
-                if config["name"] == config_name:
-                    all_configs["api_configs"][i] = config_data
-                    exists = True
-                    print(f"[AIAssistant] 更新配置 '{config_name}'")
-                    break
-            
-            if not exists:
-                all_configs["api_configs"].append(config_data)
-                print(f"[AIAssistant] 添加新配置 '{config_name}'")
+                # 检查是否已存在相同名称的配置
+                exists = False
+                for i, config in enumerate(all_configs["api_configs"]):
+                    if config["name"] == config_name:
+                        all_configs["api_configs"][i] = config_data
+                        exists = True
+                        print(f"[AIAssistant] 更新配置 '{config_name}'")
+                        break
             
+                if not exists:
+                    all_configs["api_configs"].append(config_data)
+                    print(f"[AIAssistant] 添加新配置 '{config_name}'")
+
             # 记录保存的配置内容
             print(f"[AIAssistant] 保存配置内容: model={config_data.get('model')}, system_prompt长度={len(config_data.get('system_prompt', ''))}, user_prompt长度={len(config_data.get('user_prompt', ''))}")
             
-            # 保存配置
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(all_configs, f, indent=4, ensure_ascii=False)
-                
+            # 读取现有配置、合并后原子写回
+            get_config_store().update("AIAssistant_config.json", apply)
+            
             print(f"[AIAssistant] 配置成功保存到 {self.config_path}")
             return True
         except Exception as e:
             print(f"[AIAssistant] 保存配置失败: {e}")
             return False
 
-    def get_vlm_model_response(
-        self, config_selection, base_url, api_key, model, system_prompt, user_prompt, 
-        images, max_tokens, temperature, top_p, detail, save_config=None, config_name=None
+    def _prepare_request(
+        self, config_selection, base_url, api_key, model, system_prompt, user_prompt,
+        max_tokens, temperature, top_p, detail, save_config=None, config_name=None
     ):
+        """解析预设配置、按需保存配置，返回 (handler, 请求参数)；图像单独编码"""
         # 如果选择了预设配置，读取配置
         if config_selection != "手动输入":
             configs = self.load_api_configs()
@@ -499,33 +607,70 @@ class GenericOpenAIVLMAPI:
             print(f"[AIAssistant] 模型加载失败: {model}")
             raise Exception(f"模型加载失败: {model}")
         
-        # 编码图像为 base64 格式
-        encoded_images_json = encode_comfy_image(
-            images, image_format="WEBP", lossless=True
+        handler = GenericOpenAIHandler(base_url=base_url, api_key=api_key)
+        return handler, (model, system_prompt, user_prompt, max_tokens, temperature, top_p, detail)
+
+    @staticmethod
+    def _encode_images(images, detail, image_format, image_quality, resize_by_detail):
+        """编码图像为 base64 格式，返回 (base64 列表, MIME 类型)"""
+        base64_images, image_mime, payload_bytes = encode_images_for_payload(
+            images, detail=detail, payload_format=image_format, quality=image_quality, resize=resize_by_detail
         )
-        encoded_images_dict = json.loads(encoded_images_json)
-        base64_images = list(encoded_images_dict.values())
-        print(f"[AIAssistant] 已编码 {len(base64_images)} 张图像")
+        print(f"[AIAssistant] 已编码 {len(base64_images)} 张图像, 格式: {image_format}, "
+              f"图像负载: {format_bytes(payload_bytes)}")
+        return base64_images, image_mime
 
-        print(f"[AIAssistant] 开始调用API, 模型: {model}, base_url: {base_url}")
-        handler = GenericOpenAIHandler(base_url=base_url, api_key=api_key)
+    def get_vlm_model_response(
+        self, config_selection, base_url, api_key, model, system_prompt, user_prompt, 
+        images, max_tokens, temperature, top_p, detail, save_config=None, config_name=None,
+        stream=False, use_cache=False, resize_by_detail=False,
+        image_format="WEBP无损", image_quality=90, unique_id=None
+    ):
+        handler, (model, system_prompt, user_prompt, max_tokens, temperature, top_p, detail) = self._prepare_request(
+            config_selection, base_url, api_key, model, system_prompt, user_prompt,
+            max_tokens, temperature, top_p, detail, save_config, config_name
+        )
+        base64_images, image_mime = self._encode_images(images, detail, image_format, image_quality, resize_by_detail)
+        print(f"[AIAssistant] 开始调用API, 模型: {model}, base_url: {handler.base_url}")
+        feedback = StreamFeedback(unique_id) if stream else None
         
         try:
             response = handler.get_vlm_response(
-                model,
-                system_prompt,
-                user_prompt,
-                base64_images,
-                max_tokens,
-                temperature,
-                top_p,
-                detail,
+                model, system_prompt, user_prompt, base64_images, max_tokens, temperature, top_p, detail,
+                stream=stream, on_delta=feedback, use_cache=use_cache, image_mime=image_mime,
             )
-            
-            ret = json.loads(response)
-            text = ret["choices"][0]["message"]["content"]
-            print(f"[AIAssistant] API调用成功, 返回内容长度: {len(text)}")
-            return (text,)
+            return parse_chat_response(response, feedback)
+        except comfy.model_management.InterruptProcessingException:
+            print("[AIAssistant] 用户中断，已停止接收流式响应")
+            raise
+        except Exception as e:
+            raise api_call_error(e)
+
+    async def aget_vlm_model_response(
+        self, config_selection, base_url, api_key, model, system_prompt, user_prompt,
+        images, max_tokens, temperature, top_p, detail, save_config=None, config_name=None,
+        stream=False, use_cache=False, resize_by_detail=False,
+        image_format="WEBP无损", image_quality=90, unique_id=None
+    ):
+        """get_vlm_model_response 的异步版本，图像编码和网络请求都不占用执行器"""
+        handler, (model, system_prompt, user_prompt, max_tokens, temperature, top_p, detail) = self._prepare_request(
+            config_selection, base_url, api_key, model, system_prompt, user_prompt,
+            max_tokens, temperature, top_p, detail, save_config, config_name
+        )
+        base64_images, image_mime = await asyncio.to_thread(
+            self._encode_images, images, detail, image_format, image_quality, resize_by_detail
+        )
+        print(f"[AIAssistant] 开始调用API, 模型: {model}, base_url: {handler.base_url}")
+        feedback = StreamFeedback(unique_id) if stream else None
+
+        try:
+            response = await handler.aget_vlm_response(
+                model, system_prompt, user_prompt, base64_images, max_tokens, temperature, top_p, detail,
+                stream=stream, on_delta=feedback, use_cache=use_cache, image_mime=image_mime,
+            )
+            return parse_chat_response(response, feedback)
+        except comfy.model_management.InterruptProcessingException:
+            print("[AIAssistant] 用户中断，已停止接收流式响应")
+            raise
         except Exception as e:
-            print(f"[AIAssistant] API调用失败: {str(e)}")
-            raise Exception(f"调用 API 失败: {str(e)}")
+            raise api_call_error(e)
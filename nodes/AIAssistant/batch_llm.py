@@ -0,0 +1,198 @@
+"""
+Batch LLM Node for ComfyUI
+将多条用户提示词并发发送到 OpenAI 兼容接口，按输入顺序返回结果列表
+"""
+
+import asyncio
+import re
+from typing import List
+
+import comfy.model_management
+
+from .AIAssistant import ASYNC_NODES_SUPPORTED, GenericOpenAILLMAPI
+from .utils.api_handler import GenericOpenAIHandler, extract_response_content
+from .utils.http_client import AsyncRateLimiter, get_http_client
+from .utils.markup import tokenize_markup
+
+# 提示词拆分方式
+SPLIT_MODES = ["每行一条", "空行分隔", "scene块"]
+# scene块模式下的块名称
+SCENE_BLOCK_PATTERN = re.compile(r'scene_(\d+)')
+
+
+def split_prompts(text: str, split_mode: str) -> List[str]:
+    """按拆分方式将文本拆成多条提示词"""
+    if not text or not text.strip():
+        return []
+    if split_mode == "scene块":
+        # 与 TextProcessor 相同的 ##scene_N:{...} 格式，按场景序号排序
+        scenes = sorted(
+            (int(match.group(1)), block.content.strip())
+            for block in tokenize_markup(text)
+            for match in [SCENE_BLOCK_PATTERN.fullmatch(block.name)] if match
+        )
+        return [content for _, content in scenes if content]
+    if split_mode == "空行分隔":
+        return [block.strip() for block in re.split(r'\n\s*\n', text) if block.strip()]
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+class GenericOpenAIBatchLLMAPI:
+    """批量 OpenAI 格式 LLM API 节点，限制并发数和请求速率并发请求多条提示词"""
+
+    @classmethod
+    def INPUT_TYPES(s):
+        configs = GenericOpenAILLMAPI.load_api_configs()
+        config_names = ["手动输入"] + [config["name"] for config in configs]
+
+        return {
+            "required": {
+                "config_selection": (config_names, {"default": "手动输入"}),
+                "base_url": (
+                    "STRING",
+                    {
+                        "default": "https://api.openai.com/v1",
+                        "multiline": False,
+                    }
+                ),
+                "api_key": (
+                    "STRING",
+                    {
+                        "default": "",
+                        "multiline": False,
+                    }
+                ),
+                "model": ((), {}),
+                "system_prompt": (
+                    "STRING",
+                    {
+                        "multiline": True,
+                        "dynamicPrompts": True,
+                    },
+                ),
+                "user_prompts": (
+                    "STRING",
+                    {
+                        "multiline": True,
+                        "dynamicPrompts": True,
+                    },
+                ),
+                "split_mode": (SPLIT_MODES, {"default": "每行一条"}),
+                "max_tokens": ("INT", {"default": 4096, "min": 100, "max": 1e5}),
+                "temperature": (
+                    "FLOAT",
+                    {"min": 0.0, "max": 2.0, "step": 0.01, "default": 0.7},
+                ),
+                "top_p": (
+                    "FLOAT",
+                    {"min": 0.0, "max": 1.0, "step": 0.01, "default": 0.9},
+                ),
+                "max_concurrency": ("INT", {"default": 4, "min": 1, "max": 64}),
+                "requests_per_second": (
+                    "FLOAT",
+                    {"min": 0.0, "max": 100.0, "step": 0.1, "default": 0.0},
+                ),
+            },
+            "optional": {
+                "use_cache": ("BOOLEAN", {"default": False, "label_on": "使用缓存", "label_off": "跳过缓存"}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("responses", "joined_text")
+    OUTPUT_IS_LIST = (True, False)
+    INPUT_IS_LIST = True
+    FUNCTION = "aget_batch_responses" if ASYNC_NODES_SUPPORTED else "get_batch_responses"
+    OUTPUT_NODE = False
+    CATEGORY = "!Axun Nodes/AIAssistant"
+
+    def _prepare_batch(self, config_selection, base_url, api_key, model, system_prompt, user_prompts,
+                       split_mode, max_tokens, temperature, top_p, max_concurrency,
+                       requests_per_second, use_cache=None):
+        """解析输入并构造批量请求协程；没有提示词时返回 None"""
+        # INPUT_IS_LIST 模式下所有输入均为列表，除 user_prompts 外取第一个值
+        config_selection, base_url, api_key, model, system_prompt = (
+            config_selection[0], base_url[0], api_key[0], model[0], system_prompt[0]
+        )
+        split_mode, max_tokens, temperature, top_p = split_mode[0], max_tokens[0], temperature[0], top_p[0]
+        max_concurrency, requests_per_second = max_concurrency[0], requests_per_second[0]
+        use_cache = use_cache[0] if use_cache else False
+
+        # 如果选择了预设配置，读取连接信息和模型
+        if config_selection != "手动输入":
+            for config in GenericOpenAILLMAPI.load_api_configs():
+                if config["name"] == config_selection:
+                    base_url = config.get("base_url", base_url)
+                    api_key = config.get("api_key", api_key)
+                    model = config.get("model", model)
+                    break
+
+        if model == "获取模型列表失败" or model.startswith("获取模型列表失败:"):
+            raise Exception(f"模型加载失败: {model}")
+
+        prompts = []
+        for text in user_prompts:
+            prompts.extend(split_prompts(text, split_mode))
+        if not prompts:
+            print("[BatchLLM] 没有可发送的提示词")
+            return None
+
+        print(f"[BatchLLM] 开始批量调用API, 共 {len(prompts)} 条, 并发: {max_concurrency}, "
+              f"限速: {requests_per_second or '不限'} 次/秒")
+        handler = GenericOpenAIHandler(base_url=base_url, api_key=api_key)
+
+        async def run_batch():
+            semaphore = asyncio.Semaphore(max_concurrency)
+            # 限速只作用于本次批量调用，不修改共享客户端的按主机限速，其他节点不受影响
+            limiter = AsyncRateLimiter(requests_per_second) if requests_per_second > 0 else None
+
+            async def run_one(prompt):
+                async with semaphore:
+                    # 用户中断后不再发起新的请求
+                    if comfy.model_management.processing_interrupted():
+                        raise comfy.model_management.InterruptProcessingException()
+                    if limiter is not None:
+                        await limiter.acquire()
+                    return await handler.aget_llm_response(
+                        model, system_prompt, prompt, max_tokens, temperature, top_p, use_cache=use_cache
+                    )
+
+            return await asyncio.gather(*(run_one(p) for p in prompts), return_exceptions=True)
+
+        return run_batch()
+
+    @staticmethod
+    def _collect_results(results):
+        comfy.model_management.throw_exception_if_processing_interrupted()
+
+        texts = []
+        failures = []
+        for index, result in enumerate(results):
+            content = None if isinstance(result, BaseException) else extract_response_content(result)
+            if content is None:
+                error = result if isinstance(result, BaseException) else f"响应格式异常: {result[:200]}"
+                failures.append(f"#{index + 1}: {error}")
+                texts.append("")
+            else:
+                texts.append(content)
+
+        if failures:
+            # 开启 use_cache 时已成功的请求已写入响应缓存，重新执行时会立即完成
+            print(f"[BatchLLM] {len(failures)}/{len(results)} 条请求失败")
+            raise Exception("批量调用 API 失败:\n" + "\n".join(failures))
+
+        print(f"[BatchLLM] 批量调用完成, 共 {len(texts)} 条结果")
+        return (texts, "\n\n".join(texts))
+
+    def get_batch_responses(self, *args, **kwargs):
+        batch = self._prepare_batch(*args, **kwargs)
+        if batch is None:
+            return ([], "")
+        return self._collect_results(get_http_client().run(batch))
+
+    async def aget_batch_responses(self, *args, **kwargs):
+        """get_batch_responses 的异步版本，等待期间执行器可继续运行其他分支"""
+        batch = self._prepare_batch(*args, **kwargs)
+        if batch is None:
+            return ([], "")
+        return self._collect_results(await get_http_client().run_async(batch))
@@ -3,9 +3,11 @@ import string
 from server import PromptServer
 from aiohttp import web
 import json
+from ...utils.feedback import send_feedback
+from ...utils.state_store import get_node_state, node_state_key, workflow_id_of
 
-# 存储每个节点的当前数字值
-number_values = {}
+# 存储每个节点的当前数字值，重启后保留
+number_values = get_node_state("number_values", value_types=(int,))
 
 @PromptServer.instance.routes.get("/axun-number/get-value")
 async def get_number_value(request):
@@ -13,7 +15,8 @@ async def get_number_value(request):
     node_id = request.query.get("id")
     if not node_id:
         return web.Response(status=400)
-    return web.json_response({"number_value": number_values.get(node_id, 1)})
+    key = node_state_key(node_id, request.query.get("workflow", ""))
+    return web.json_response({"number_value": number_values.get(key, 1)})
 
 @PromptServer.instance.routes.post("/axun-number/set-value")
 async def set_number_value(request):
@@ -23,7 +26,7 @@ async def set_number_value(request):
     if not node_id or not value:
         return web.Response(status=400)
     try:
-        number_values[node_id] = int(value)
+        number_values[node_state_key(node_id, request.query.get("workflow", ""))] = int(value)
         return web.Response(status=200)
     except ValueError:
         return web.Response(status=400)
@@ -43,6 +46,7 @@ class NumberGenerator:
             },
             "hidden": {
                 "id": "UNIQUE_ID",
+                "extra_pnginfo": "EXTRA_PNGINFO",
             }
         }
 
@@ -50,17 +54,18 @@ class NumberGenerator:
     FUNCTION = "generate"
     CATEGORY = "!Axun Nodes/AIAssistant"
 
-    def generate(self, prefix_text: str, middle_text: str, number_value: int, max_value: int, suffix_text: str, id: str):
+    def generate(self, prefix_text: str, middle_text: str, number_value: int, max_value: int, suffix_text: str, id: str, extra_pnginfo=None):
         """生成递进数字"""
         try:
-            # 获取当前数字值
-            current_number = number_values.get(id, number_value)
+            # 获取当前数字值，按工作流区分同号节点
+            state_key = node_state_key(id, workflow_id_of(extra_pnginfo))
+            current_number = number_values.get(state_key, number_value)
             
             # 计算下一个数字值
             next_number = current_number + 1 if current_number < max_value else 1
             
             # 更新数值
-            number_values[id] = next_number
+            number_values[state_key] = next_number
             self._update_value(id, next_number)
             
             # 组合最终文本
@@ -76,14 +81,6 @@ class NumberGenerator:
     def _update_value(self, node_id: str, value: int):
         """更新前端显示的数字值"""
         try:
-            PromptServer.instance.send_sync(
-                "impact-node-feedback",
-                {
-                    "node_id": node_id,
-                    "widget_name": "number_value",
-                    "type": "int",
-                    "value": value
-                }
-            )
+            send_feedback(node_id, "number_value", "int", value)
         except Exception as e:
             print(f"[NumberGenerator] 更新数字值失败: {str(e)}") 
\ No newline at end of file
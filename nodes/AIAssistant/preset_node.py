@@ -1,39 +1,24 @@
-import json
-import os
+import copy
 from server import PromptServer
 from aiohttp import web
 
+from .utils.config_manager import get_config_path, get_config_store
+
+PRESETS_FILE = "AIAssistant_presets.json"
+
 class AIAssistantPreset:
     @classmethod
     def get_config_path(cls):
         """获取配置文件路径"""
-        # 获取当前文件所在目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        print(f"[AIAssistant] 当前文件目录: {current_dir}")
-        
-        # 获取Axun_Nodes目录（当前文件上溯两级）
-        axun_nodes_dir = os.path.dirname(os.path.dirname(current_dir))
-        print(f"[AIAssistant] Axun_Nodes目录: {axun_nodes_dir}")
-        
-        # 构建配置文件路径
-        config_path = os.path.join(axun_nodes_dir, "config", "AIAssistant_presets.json")
-        print(f"[AIAssistant] 配置文件完整路径: {os.path.abspath(config_path)}")
-        
-        # 检查文件是否存在
-        if os.path.exists(config_path):
-            print(f"[AIAssistant] 配置文件已存在")
-        else:
-            print(f"[AIAssistant] 配置文件不存在")
-        
-        return config_path
+        return get_config_path(PRESETS_FILE)
 
     @classmethod
     def load_presets(cls):
-        """加载预设配置"""
+        """加载预设配置（返回共享的缓存对象，修改前需复制）"""
         try:
-            config_path = cls.get_config_path()
+            presets = get_config_store().load(PRESETS_FILE)
             
-            if not os.path.exists(config_path):
+            if presets is None:
                 print(f"[AIAssistant] 配置文件不存在，将创建默认配置")
                 default_config = {
                     "system_presets": {
@@ -64,12 +49,9 @@ class AIAssistantPreset:
                         "魔法师": {"prompt": "powerful mage, ornate robes, mystical artifacts, glowing magical effects, arcane symbols, dramatic lighting"}
                     }
                 }
-                os.makedirs(os.path.dirname(config_path), exist_ok=True)
                 cls.save_presets(default_config)
                 return default_config
             
-            with open(config_path, 'r', encoding='utf-8') as f:
-                presets = json.loads(f.read())
             return presets
         except Exception as e:
             print(f"[AIAssistant] 加载预设配置失败: {e}")
@@ -79,26 +61,8 @@ class AIAssistantPreset:
     def save_presets(cls, presets):
         """保存预设到文件"""
         try:
-            config_path = cls.get_config_path()
-            # 确保目录存在
-            os.makedirs(os.path.dirname(config_path), exist_ok=True)
-            
-            # 先将内容转换为JSON字符串
-            content = json.dumps(presets, ensure_ascii=False, indent=4)
-            print(f"[AIAssistant] 准备写入的内容: {content}")
-            
-            # 写入文件
-            with open(config_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
+            get_config_store().save(PRESETS_FILE, presets)
             print(f"[AIAssistant] 预设保存成功，当前预设: {list(presets.keys())}")
-            
-            # 验证写入是否成功
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    verify_content = f.read()
-                print(f"[AIAssistant] 验证读取的内容: {verify_content}")
-            
             return True
         except Exception as e:
             print(f"[AIAssistant] 保存预设失败: {e}")
@@ -271,7 +235,7 @@ async def save_preset(request):
         if not preset_type or not preset_name:
             raise ValueError("预设类型和名称不能为空")
         
-        presets = AIAssistantPreset.load_presets()
+        presets = copy.deepcopy(AIAssistantPreset.load_presets())
         preset_key = f"{preset_type}_presets"
         
         # 检查预设类型是否有效
@@ -315,7 +279,7 @@ async def delete_preset(request):
         if not preset_type or not preset_name:
             raise ValueError("预设类型和名称不能为空")
         
-        presets = AIAssistantPreset.load_presets()
+        presets = copy.deepcopy(AIAssistantPreset.load_presets())
         preset_key = f"{preset_type}_presets"
         
         if preset_key not in presets:
@@ -5,7 +5,11 @@ Story Extractor Node for ComfyUI
 
 import re
 import json
-from server import PromptServer
+from .utils.markup import tokenize_markup
+from ...utils.feedback import send_feedback
+
+# 故事章节块名称
+STORY_BLOCK_PATTERN = re.compile(r'story_(\d+)')
 
 class StoryExtractor:
     """故事提取器节点"""
@@ -36,15 +40,17 @@ class StoryExtractor:
             result = []
             print("[StoryExtractor] 开始处理故事内容...")
             
+            # 一次性切分所有 ##名称:{内容} 块
+            blocks = tokenize_markup(sample_story)
+            
             # 提取故事信息
             print("[StoryExtractor] 尝试匹配story_info...")
-            story_info_pattern = r'##story_info:\s*({(?:[^{}]|{[^{}]*})*})'
-            story_info_match = re.search(story_info_pattern, sample_story, re.DOTALL)
+            story_info_block = next((block for block in blocks if block.name == "story_info"), None)
             
-            if story_info_match:
+            if story_info_block:
                 try:
                     # 清理和格式化 JSON 字符串
-                    json_str = story_info_match.group(1).strip()
+                    json_str = "{" + story_info_block.content.strip() + "}"
                     print(f"[StoryExtractor] 找到story_info: {json_str[:100]}...")
                     story_info = json.loads(json_str)
                     
@@ -67,15 +73,16 @@ class StoryExtractor:
             
             # 提取所有故事章节
             print("[StoryExtractor] 开始提取故事章节...")
-            story_pattern = r'##story_(\d+):\s*({(?:[^{}]|{[^{}]*})*})'
-            story_matches = re.finditer(story_pattern, sample_story, re.DOTALL)
             chapters = []
             
-            for match in story_matches:
+            for block in blocks:
+                match = STORY_BLOCK_PATTERN.fullmatch(block.name)
+                if not match:
+                    continue
                 chapter_num = int(match.group(1))
                 try:
                     # 清理和格式化 JSON 字符串
-                    json_str = match.group(2).strip()
+                    json_str = "{" + block.content.strip() + "}"
                     print(f"[StoryExtractor] 找到第{chapter_num}章: {json_str[:100]}...")
                     chapter_content = json.loads(json_str)
                     narrative = chapter_content.get('narrative_cn', '')
@@ -104,15 +111,7 @@ class StoryExtractor:
                 print(f"[StoryExtractor] 成功提取内容，总长度：{len(final_text)}")
 
             # 发送结果到前端显示
-            PromptServer.instance.send_sync(
-                "impact-node-feedback",
-                {
-                    "node_id": unique_id,
-                    "widget_name": "extracted_text",
-                    "type": "text",
-                    "value": final_text
-                }
-            )
+            send_feedback(unique_id, "extracted_text", "text", final_text, display_only=True)
             
             return ()
             
@@ -120,15 +119,7 @@ class StoryExtractor:
             error_msg = f"处理故事内容时发生错误：{str(e)}"
             print(f"[StoryExtractor] {error_msg}")
             # 发送错误信息到前端显示
-            PromptServer.instance.send_sync(
-                "impact-node-feedback",
-                {
-                    "node_id": unique_id,
-                    "widget_name": "extracted_text",
-                    "type": "text",
-                    "value": error_msg
-                }
-            )
+            send_feedback(unique_id, "extracted_text", "text", error_msg, display_only=True)
             return ()
 
     @classmethod
@@ -3,27 +3,25 @@ import json
 import re
 from server import PromptServer
 from aiohttp import web
+from .utils.markup import tokenize_markup
+from ...utils.feedback import send_feedback
+from ...utils.state_store import get_node_state, node_state_key, workflow_id_of
 
-# 用于存储文本缓存的字典
-text_cache = {}
+# 各节点的缓存文本，超出上限时淘汰最久未更新的节点，重启后保留
+text_cache = get_node_state("text_cache", value_types=(str,))
 
 def clean_text(text: str) -> str:
     """清理文本，去除索引标记，只保留括号内的内容"""
     try:
-        # 使用统一的格式处理 ##标识:{内容}
+        # 使用共享的标记分词器处理 ##标识:{内容}
         # 可以处理：
         # ##名字:{内容}
         # ##scene_数字:{内容}
         # ##story_数字:{内容}
-        pattern = r'##[^{:]*:\{(.*?)\}'
-        
-        # 找到所有匹配项
-        matches = re.finditer(pattern, text, re.DOTALL)
-        
-        # 提取所有括号内的内容并用换行符连接
+        # 提取所有括号内的内容（支持嵌套括号）
         result = []
-        for match in matches:
-            content = match.group(1).strip()
+        for block in tokenize_markup(text):
+            content = block.content.strip()
             if content:  # 只添加非空内容
                 result.append(content)
         
@@ -47,7 +45,8 @@ async def get_cached_text(request):
     node_id = request.query.get("id")
     if not node_id:
         return web.Response(status=400)
-    return web.json_response({"text": text_cache.get(node_id, "")})
+    key = node_state_key(node_id, request.query.get("workflow", ""))
+    return web.json_response({"text": text_cache.get(key, "")})
 
 @PromptServer.instance.routes.post("/axun-text/set-cache")
 async def set_cached_text(request):
@@ -58,7 +57,9 @@ async def set_cached_text(request):
     try:
         data = await request.json()
         text = data.get("text", "")
-        text_cache[node_id] = text
+        if not isinstance(text, str):
+            return web.Response(status=400)
+        text_cache[node_state_key(node_id, request.query.get("workflow", ""))] = text
         return web.Response(status=200)
     except Exception as e:
         print(f"[TextCache] 设置缓存失败: {str(e)}")
@@ -78,6 +79,7 @@ class TextCache:
             },
             "hidden": {
                 "id": "UNIQUE_ID",
+                "extra_pnginfo": "EXTRA_PNGINFO",
             }
         }
 
@@ -94,7 +96,7 @@ class TextCache:
         """
         return True
 
-    def process_text(self, input_text: str = "", cache_text: str = "", id: str = None):
+    def process_text(self, input_text: str = "", cache_text: str = "", id: str = None, extra_pnginfo=None):
         """处理文本内容"""
         try:
             print(f"[TextCache] 开始处理文本:")
@@ -106,7 +108,7 @@ class TextCache:
             if input_text and input_text.strip():
                 print(f"[TextCache] 处理输入文本")
                 # 更新缓存
-                text_cache[id] = input_text
+                text_cache[node_state_key(id, workflow_id_of(extra_pnginfo))] = input_text
                 # 更新前端显示
                 self._update_cache_display(id, input_text)
                 # 返回处理后的文本
@@ -130,14 +132,6 @@ class TextCache:
         """更新前端显示的缓存文本"""
         try:
             print(f"[TextCache] 更新缓存显示: node_id={node_id}, text={text[:100]}")
-            PromptServer.instance.send_sync(
-                "impact-node-feedback",
-                {
-                    "node_id": node_id,
-                    "widget_name": "cache_text",
-                    "type": "string",
-                    "value": text
-                }
-            )
+            send_feedback(node_id, "cache_text", "string", text)
         except Exception as e:
             print(f"[TextCache] 更新缓存显示失败: {str(e)}") 
\ No newline at end of file
@@ -5,7 +5,18 @@ from server import PromptServer
 from aiohttp import web
 import traceback
 
-text_indices = {}
+from .preset_node import PRESETS_FILE
+from .utils.config_manager import get_config_store
+from .utils.markup import tokenize_markup
+from .utils.story_parser import parse_story
+from ...utils.feedback import send_feedback
+from ...utils.state_store import get_node_state, node_state_key, workflow_id_of
+
+CHARACTER_NAME_PATTERN = re.compile(r'Character name:\s*\n[^:]*:\s*(\w+)', re.DOTALL)
+CHARACTER_CONTENT_PATTERN = re.compile(r'\{(.*?)\}', re.DOTALL)
+
+# 各节点的当前故事索引，重启后保留
+text_indices = get_node_state("text_indices", value_types=(int,))
 
 @PromptServer.instance.routes.get("/axun-text/text-index")
 async def get_text_index(request):
@@ -13,7 +24,8 @@ async def get_text_index(request):
     node_id = request.query.get("id")
     if not node_id:
         return web.Response(status=400)
-    return web.json_response({"text_index": text_indices.get(node_id, 1)})
+    key = node_state_key(node_id, request.query.get("workflow", ""))
+    return web.json_response({"text_index": text_indices.get(key, 1)})
 
 @PromptServer.instance.routes.post("/axun-text/set-text-index")
 async def set_text_index(request):
@@ -23,7 +35,7 @@ async def set_text_index(request):
     if not node_id or not index:
         return web.Response(status=400)
     try:
-        text_indices[node_id] = int(index)
+        text_indices[node_state_key(node_id, request.query.get("workflow", ""))] = int(index)
         return web.Response(status=200)
     except ValueError:
         return web.Response(status=400)
@@ -31,14 +43,8 @@ async def set_text_index(request):
 def load_character_presets():
     """加载角色预设"""
     try:
-        # 获取当前文件所在目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # 获取配置文件路径
-        config_path = os.path.join(os.path.dirname(os.path.dirname(current_dir)), "config", "AIAssistant_presets.json")
-        
-        with open(config_path, 'r', encoding='utf-8') as f:
-            presets = json.load(f)
-            return list(presets.get("character_presets", {}).keys())
+        presets = get_config_store().load(PRESETS_FILE, {})
+        return list(presets.get("character_presets", {}).keys()) or ["null"]
     except Exception as e:
         print(f"[TextProcessor] 加载角色预设失败: {str(e)}")
         return ["null"]
@@ -46,14 +52,8 @@ def load_character_presets():
 def load_shot_presets():
     """加载镜头预设"""
     try:
-        # 获取当前文件所在目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # 获取配置文件路径
-        config_path = os.path.join(os.path.dirname(os.path.dirname(current_dir)), "config", "AIAssistant_presets.json")
-        
-        with open(config_path, 'r', encoding='utf-8') as f:
-            presets = json.load(f)
-            return list(presets.get("shot_presets", {}).keys())
+        presets = get_config_store().load(PRESETS_FILE, {})
+        return list(presets.get("shot_presets", {}).keys()) or ["null"]
     except Exception as e:
         print(f"[TextProcessor] 加载镜头预设失败: {str(e)}")
         return ["null"]
@@ -125,14 +125,10 @@ class TextProcessor:
     def get_character_info(self, preset_name):
         """获取角色预设信息"""
         try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            config_path = os.path.join(os.path.dirname(os.path.dirname(current_dir)), "config", "AIAssistant_presets.json")
-            
-            with open(config_path, 'r', encoding='utf-8') as f:
-                presets = json.load(f)
-                character_info = presets.get("character_presets", {}).get(preset_name, {})
-                if character_info and preset_name != "null":
-                    return character_info.get("prompt", "")
+            presets = get_config_store().load(PRESETS_FILE, {})
+            character_info = presets.get("character_presets", {}).get(preset_name, {})
+            if character_info and preset_name != "null":
+                return character_info.get("prompt", "")
         except Exception as e:
             print(f"[TextProcessor] 获取角色信息失败: {str(e)}")
         return ""
@@ -140,14 +136,10 @@ class TextProcessor:
     def get_shot_prompt(self, preset_name):
         """获取镜头预设信息"""
         try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            config_path = os.path.join(os.path.dirname(os.path.dirname(current_dir)), "config", "AIAssistant_presets.json")
-            
-            with open(config_path, 'r', encoding='utf-8') as f:
-                presets = json.load(f)
-                shot_info = presets.get("shot_presets", {}).get(preset_name, {})
-                if shot_info and preset_name != "null":
-                    return shot_info.get("prompt", "")
+            presets = get_config_store().load(PRESETS_FILE, {})
+            shot_info = presets.get("shot_presets", {}).get(preset_name, {})
+            if shot_info and preset_name != "null":
+                return shot_info.get("prompt", "")
         except Exception as e:
             print(f"[TextProcessor] 获取镜头信息失败: {str(e)}")
         return ""
@@ -178,36 +170,17 @@ class TextProcessor:
     def extract_story_info(self, text: str) -> dict:
         """提取故事信息"""
         try:
-            print(f"[TextProcessor] 开始提取故事信息，输入文本长度: {len(text)}")
-            
-            story_info_pattern = r'##story_info:\s*\{(.*?)\}\s*(?=##|$)'
-            story_info_match = re.search(story_info_pattern, text, re.DOTALL)
-            
-            if story_info_match:
-                story_info_text = story_info_match.group(1).strip()
-                print(f"[TextProcessor] 找到故事信息块，长度: {len(story_info_text)}")
+            story_info = parse_story(text).story_info
+            if story_info:
+                print(f"[TextProcessor] 标题: {story_info.get('title_en', '')} / {story_info.get('title_cn', '')}")
                 
-                json_str = "{" + story_info_text + "}"
-                json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-                json_str = re.sub(r'[\n\r]+\s*', ' ', json_str)
-                
-                try:
-                    story_info = json.loads(json_str)
-                    print(f"[TextProcessor] 成功解析故事信息")
-                    print(f"[TextProcessor] 标题: {story_info.get('title_en', '')} / {story_info.get('title_cn', '')}")
-                    
-                    required_fields = ['title_en', 'title_cn', 'summary_en', 'summary_cn', 'cover_prompt']
-                    missing_fields = [field for field in required_fields if field not in story_info]
-                    if missing_fields:
-                        print(f"[TextProcessor] 警告：缺少必要字段: {missing_fields}")
-                    
-                    return story_info
-                except json.JSONDecodeError as je:
-                    print(f"[TextProcessor] JSON解析失败: {str(je)}")
-                    print(f"[TextProcessor] 尝试解析的文本: {json_str[:200]}")
+                required_fields = ['title_en', 'title_cn', 'summary_en', 'summary_cn', 'cover_prompt']
+                missing_fields = [field for field in required_fields if field not in story_info]
+                if missing_fields:
+                    print(f"[TextProcessor] 警告：缺少必要字段: {missing_fields}")
             else:
                 print(f"[TextProcessor] 未找到故事信息块")
-            return {}
+            return story_info
         except Exception as e:
             print(f"[TextProcessor] 提取故事信息失败: {str(e)}")
             return {}
@@ -255,16 +228,14 @@ class TextProcessor:
         
         if prefix_text:
             if '##' in prefix_text:
-                prefix_matches = re.finditer(r'##[^{]*:\{(.*?)\}', prefix_text, re.DOTALL)
-                prefix_text = '\n\n'.join(m.group(1).strip() for m in prefix_matches)
+                prefix_text = '\n\n'.join(block.content.strip() for block in tokenize_markup(prefix_text))
             result_parts.append(prefix_text)
         
         result_parts.append(main_text)
         
         if suffix_text:
             if '##' in suffix_text:
-                suffix_matches = re.finditer(r'##[^{]*:\{(.*?)\}', suffix_text, re.DOTALL)
-                suffix_text = '\n\n'.join(m.group(1).strip() for m in suffix_matches)
+                suffix_text = '\n\n'.join(block.content.strip() for block in tokenize_markup(suffix_text))
             result_parts.append(suffix_text)
         
         return '\n\n'.join(part.strip() for part in result_parts if part.strip())
@@ -387,6 +358,8 @@ class TextProcessor:
                 out_path = os.path.join(in_path, "Story") if in_path else "Story"
                 out_path = out_path.replace("\\", "/")
                 
+                # 故事文本只解析一次，之后按 scene_index 迭代都是索引查找
+                document = parse_story(sample_story)
                 story_info = self.extract_story_info(sample_story)
                 story_name = ""
                 if story_info:
@@ -404,127 +377,74 @@ class TextProcessor:
                             selected_characters.append(char_info)
                             print(f"[TextProcessor] 添加角色: {preset_name}")
                 
-                content_types = [t.strip() for t in content_type.split(',')]
-                
-                patterns = []
-                for ct in content_types:
-                    if '*' in ct:
-                        pattern = ct.replace('*', r'\d+')
-                    else:
-                        pattern = ct
-                    patterns.append(f"##({pattern}):\s*\{{(.*?)\}}")
-                
-                all_matches = []
-                for pattern in patterns:
-                    matches = list(re.finditer(pattern, sample_story, re.DOTALL))
-                    all_matches.extend(matches)
-                
-                if not all_matches:
-                    return (character_prompt, scene_prompt, cover_prompt, animation_prompt, reasoning_prompt, enter_prompt,
-                           current_index, max_scene, save_text, file_name, out_path)
-                
-                scene_matches = []
-                story_matches = []
-                for match in all_matches:
-                    full_match = match.group(1)
-                    if 'scene_' in full_match:
-                        scene_matches.append(match)
-                    elif 'story_' in full_match:
-                        story_matches.append(match)
-                
-                if not scene_matches:
+                selection = document.select(content_type)
+                if not selection.scenes:
                     return (character_prompt, scene_prompt, cover_prompt, animation_prompt, reasoning_prompt, enter_prompt,
                            current_index, max_scene, save_text, file_name, out_path)
                 
-                def extract_index(match):
-                    try:
-                        full_match = match.group(1)
-                        return int(full_match.split('_')[1])
-                    except Exception as e:
-                        print(f"[TextProcessor] 提取索引出错: {str(e)}")
-                        return 0
-                
-                max_scene = max(extract_index(m) for m in scene_matches)
+                max_scene = selection.max_scene
                 current_index = ((scene_index - 1) % max_scene) + 1
                 
-                for match in scene_matches:
-                    if extract_index(match) == current_index:
-                        scene_index = match.group(1)
-                        current_scene = match.group(2)
-                        
-                        scene_content = ""
-                        
-                        # 1. 提取characters_present
-                        char_match = re.search(r'"characters_present":\s*\[(.*?)\]', current_scene)
-                        if char_match:
-                            chars_text = "[" + char_match.group(1) + "]"
-                            try:
-                                characters_present = json.loads(chars_text)
-                                characters_present = [name.lower() for name in characters_present]
-                                print(f"[TextProcessor] 场景中的角色: {characters_present}")
-                                # 保留characters_present部分
-                                scene_content += f'"characters_present": {chars_text}\n'
-                            except json.JSONDecodeError:
-                                print("[TextProcessor] 解析characters_present失败")
-                        
-                        # 2. 提取scene_description部分
-                        scene_desc = re.search(r'"scene_description":\s*(.*?)(?=\}|$)', current_scene, re.DOTALL)
-                        if scene_desc:
-                            scene_content += f'"scene_description":\n{scene_desc.group(1).strip()}\n'
-                        
-                        # 3. 处理角色内容
-                        character_contents = []
-                        for char_info in selected_characters:
-                            # 提取角色名称
-                            name_match = re.search(r'Character name:\s*\n[^:]*:\s*(\w+)', char_info, re.DOTALL)
-                            if name_match:
-                                char_name = name_match.group(1).strip()
-                                print(f"[TextProcessor] 检查角色: {char_name}")
-                                if char_name.lower() in characters_present:
-                                    print(f"[TextProcessor] 添加角色内容: {char_name}")
-                                    # 提取大括号内的内容
-                                    char_content_match = re.search(r'\{(.*?)\}', char_info, re.DOTALL)
-                                    if char_content_match:
-                                        # 提取并清理内容
-                                        content = char_content_match.group(1).strip()
-                                        character_contents.append(content)
-                            else:
-                                print(f"[TextProcessor] 未能提取角色名称: {char_info[:100]}...")
-                        
-                        # 4. 将角色内容添加到场景内容后面
-                        if character_contents:
-                            scene_content += "\n\n" + "\n\n".join(character_contents)
-                        
-                        scene_content = self.remove_leading_spaces(scene_content)
-                        scene_prompt = self.append_text_content(scene_content, shot_text, appstart_text, append_text)
-                        break
-                
-                for match in story_matches:
-                    if extract_index(match) == current_index:
-                        story_index = match.group(1)
-                        story_text = match.group(2).strip()
-                        
-                        # 修改正则表达式以匹配完整的引号内容
-                        cn_match = re.search(r'"narrative_cn":\s*"(.*?)"(?=\s*[,}])', story_text, re.DOTALL)
-                        en_match = re.search(r'"narrative_en":\s*"(.*?)"(?=\s*[,}])', story_text, re.DOTALL)
-                        
-                        if cn_match and en_match:
-                            story_text_cn = cn_match.group(1).strip()
-                            story_text_en = en_match.group(1).strip()
-                            save_text = f"{story_text_cn}\n\n{story_text_en}"
-                            print(f"[TextProcessor] 提取故事内容 CN: {story_text_cn[:50]}...")
-                            print(f"[TextProcessor] 提取故事内容 EN: {story_text_en[:50]}...")
+                scene_block = selection.scenes.get(current_index)
+                if scene_block is not None:
+                    scene_content = ""
+                    
+                    # 1. 提取characters_present
+                    chars_text, characters_present = scene_block.characters_present
+                    if characters_present is not None:
+                        print(f"[TextProcessor] 场景中的角色: {characters_present}")
+                        # 保留characters_present部分
+                        scene_content += f'"characters_present": {chars_text}\n'
+                    
+                    # 2. 提取scene_description部分
+                    if scene_block.scene_description is not None:
+                        scene_content += f'"scene_description":\n{scene_block.scene_description}\n'
+                    
+                    # 3. 处理角色内容
+                    character_contents = []
+                    for char_info in selected_characters:
+                        # 提取角色名称
+                        name_match = CHARACTER_NAME_PATTERN.search(char_info)
+                        if name_match:
+                            char_name = name_match.group(1).strip()
+                            print(f"[TextProcessor] 检查角色: {char_name}")
+                            if char_name.lower() in (characters_present or []):
+                                print(f"[TextProcessor] 添加角色内容: {char_name}")
+                                # 提取大括号内的内容
+                                char_content_match = CHARACTER_CONTENT_PATTERN.search(char_info)
+                                if char_content_match:
+                                    # 提取并清理内容
+                                    content = char_content_match.group(1).strip()
+                                    character_contents.append(content)
                         else:
-                            print("[TextProcessor] 未能完整提取故事内容")
-                            save_text = ""
-                        break
+                            print(f"[TextProcessor] 未能提取角色名称: {char_info[:100]}...")
+                    
+                    # 4. 将角色内容添加到场景内容后面
+                    if character_contents:
+                        scene_content += "\n\n" + "\n\n".join(character_contents)
+                    
+                    scene_content = self.remove_leading_spaces(scene_content)
+                    scene_prompt = self.append_text_content(scene_content, shot_text, appstart_text, append_text)
+                
+                story_index = ""
+                story_block = selection.stories.get(current_index)
+                if story_block is not None:
+                    story_index = story_block.name
+                    story_text_cn, story_text_en = story_block.narrative
+                    if story_text_cn and story_text_en:
+                        save_text = f"{story_text_cn}\n\n{story_text_en}"
+                        print(f"[TextProcessor] 提取故事内容 CN: {story_text_cn[:50]}...")
+                        print(f"[TextProcessor] 提取故事内容 EN: {story_text_en[:50]}...")
+                    else:
+                        print("[TextProcessor] 未能完整提取故事内容")
+                        save_text = ""
                 
                 if story_name and story_index:
                     file_name = f"{story_name}_{story_index}"
                 
                 if unique_id:
                     next_index = (current_index % max_scene) + 1
-                    text_indices[unique_id] = next_index
+                    text_indices[node_state_key(unique_id, workflow_id_of(extra_pnginfo))] = next_index
                     self._update_index(unique_id, next_index)
                     print(f"[TextProcessor] 更新索引: {current_index} -> {next_index}")
             
@@ -549,12 +469,7 @@ class TextProcessor:
         """更新节点索引"""
         try:
             if node_id:
-                PromptServer.instance.send_sync("impact-node-feedback", {
-                    "node_id": node_id,
-                    "widget_name": "scene_index",
-                    "type": "int",
-                    "value": index
-                })
+                send_feedback(node_id, "scene_index", "int", index)
                 print(f"[TextProcessor] 更新索引成功: {index}")
         except Exception as e:
             print(f"[TextProcessor] 更新索引失败: {str(e)}") 
\ No newline at end of file
@@ -5,5 +5,6 @@
 from .api_handler import SiliconCloudHandler
 from .image_utils import encode_comfy_image
 from .config_manager import ConfigManager
+from .http_client import PooledHttpClient, get_http_client
 
-__all__ = ['SiliconCloudHandler', 'encode_comfy_image', 'ConfigManager'] 
\ No newline at end of file
+__all__ = ['SiliconCloudHandler', 'encode_comfy_image', 'ConfigManager', 'PooledHttpClient', 'get_http_client'] 
\ No newline at end of file
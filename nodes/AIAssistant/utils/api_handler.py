@@ -2,46 +2,193 @@ import base64
 import json
 import os
 import pickle
-import urllib.parse
-import urllib.request
 import zlib
-from typing import List, Tuple, Union
+from typing import Callable, List, Optional, Tuple, Union
 
 import numpy as np
 import aiohttp
 import asyncio
 
+from .http_client import get_http_client
+from .response_cache import compute_cache_key, get_response_cache
+from .telemetry import get_telemetry
+
 BIZYAIR_DEBUG = os.getenv("BIZYAIR_DEBUG", False)
 
 
-def send_post_request(api_url, payload, headers):
+def _raise_for_status(status: int, response_data: str):
+    """将 HTTP 错误状态转换为带服务端信息的异常"""
+    if status == 401:
+        raise Exception(
+            "Key is invalid, please check the API key of the selected service.\n"
+            f"Server response: {response_data[:500]}"
+        )
+    if status >= 400:
+        raise Exception(f"Failed to connect to the server: HTTP {status} {response_data[:500]}")
+
+
+def send_post_request(api_url, payload, headers, base_url=None):
     """
     Sends a POST request to the specified API URL with the given payload and headers.
 
+    The request goes through the process-wide pooled client, so connections to the
+    same base_url are kept alive and reused across node executions.
+
     Args:
         api_url (str): The URL of the API endpoint.
         payload (dict): The payload to send in the POST request.
         headers (dict): The headers to include in the POST request.
+        base_url (str, optional): The connection pool key. Defaults to the URL origin.
 
     Raises:
         Exception: If there is an error connecting to the server or the request fails.
     """
+    call = get_telemetry().start_call(base_url or api_url, payload)
     try:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(api_url, data=data, headers=headers, method="POST")
-        with urllib.request.urlopen(req) as response:
-            response_data = response.read().decode("utf-8")
-        return response_data
-    except urllib.error.URLError as e:
-        if "Unauthorized" in str(e):
-            raise Exception(
-                "Key is invalid, please refer to https://cloud.siliconflow.cn to get the API key.\n"
-                "If you have the key, please click the 'BizyAir Key' button at the bottom right to set the key."
-            )
-        else:
-            raise Exception(
-                f"Failed to connect to the server: {e}, if you have no key, "
-            )
+        status, response_data = get_http_client().post(
+            api_url, payload, headers, base_url=base_url, metrics=call.metrics
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        call.finish(error=e)
+        raise Exception(f"Failed to connect to the server: {e}")
+    except Exception as e:
+        call.finish(error=e)
+        raise
+
+    call.finish(status, response_data)
+    _raise_for_status(status, response_data)
+    return response_data
+
+
+async def asend_post_request(api_url, payload, headers, base_url=None):
+    """send_post_request 的异步版本，可在任意事件循环中等待"""
+    call = get_telemetry().start_call(base_url or api_url, payload)
+    try:
+        status, response_data = await get_http_client().apost(
+            api_url, payload, headers, base_url=base_url, metrics=call.metrics
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        call.finish(error=e)
+        raise Exception(f"Failed to connect to the server: {e}")
+    except Exception as e:
+        call.finish(error=e)
+        raise
+
+    call.finish(status, response_data)
+    _raise_for_status(status, response_data)
+    return response_data
+
+
+class _StreamCollector:
+    """收集 SSE 增量事件，组装成与非流式接口相同结构的响应 JSON"""
+
+    def __init__(self, payload, on_delta: Optional[Callable[[str], None]] = None):
+        self.on_delta = on_delta
+        self.content_parts = []
+        self.model = payload.get("model")
+        self.finish_reason = None
+        self.usage = None
+
+    def on_event(self, chunk):
+        if "error" in chunk:
+            error = chunk["error"]
+            message = error.get("message", error) if isinstance(error, dict) else error
+            raise Exception(f"API错误: {message}")
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        choices = chunk.get("choices") or []
+        if not choices:
+            return
+        choice = choices[0]
+        if choice.get("finish_reason"):
+            self.finish_reason = choice["finish_reason"]
+        delta = (choice.get("delta") or {}).get("content")
+        if delta:
+            self.content_parts.append(delta)
+            if self.on_delta:
+                self.on_delta(delta)
+
+    def build_response(self, status, response_data) -> str:
+        _raise_for_status(status, response_data)
+        # 服务端忽略了 stream 参数，直接返回完整响应
+        if response_data:
+            return response_data
+
+        response = {
+            "model": self.model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(self.content_parts)},
+                "finish_reason": self.finish_reason,
+            }],
+        }
+        if self.usage:
+            response["usage"] = self.usage
+        return json.dumps(response, ensure_ascii=False)
+
+
+def send_stream_request(api_url, payload, headers, on_delta: Optional[Callable[[str], None]] = None,
+                        base_url=None):
+    """
+    以 SSE 流式方式发送 chat/completions 请求
+
+    每收到一段增量文本就回调 on_delta(delta)，最终组装成与非流式接口相同结构的
+    响应 JSON 字符串返回，调用方无需区分两种模式。on_delta 抛出异常会中止请求。
+    """
+    collector = _StreamCollector(payload, on_delta)
+    call = get_telemetry().start_call(base_url or api_url, payload)
+    try:
+        status, response_data = get_http_client().stream_post(
+            api_url, payload, headers, collector.on_event, base_url=base_url, metrics=call.metrics
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        call.finish(error=e)
+        raise Exception(f"Failed to connect to the server: {e}")
+    except Exception as e:
+        call.finish(error=e)
+        raise
+
+    try:
+        response = collector.build_response(status, response_data)
+    except Exception as e:
+        call.finish(status, error=e)
+        raise
+    call.finish(status, response)
+    return response
+
+
+async def asend_stream_request(api_url, payload, headers, on_delta: Optional[Callable[[str], None]] = None,
+                               base_url=None):
+    """send_stream_request 的异步版本，on_delta 在连接池事件循环线程中回调"""
+    collector = _StreamCollector(payload, on_delta)
+    call = get_telemetry().start_call(base_url or api_url, payload)
+    try:
+        status, response_data = await get_http_client().astream_post(
+            api_url, payload, headers, collector.on_event, base_url=base_url, metrics=call.metrics
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        call.finish(error=e)
+        raise Exception(f"Failed to connect to the server: {e}")
+    except Exception as e:
+        call.finish(error=e)
+        raise
+
+    try:
+        response = collector.build_response(status, response_data)
+    except Exception as e:
+        call.finish(status, error=e)
+        raise
+    call.finish(status, response)
+    return response
+
+
+def extract_response_content(response_text: str) -> Optional[str]:
+    """从 chat/completions 响应中提取文本内容，格式不符时返回 None"""
+    try:
+        content = json.loads(response_text)["choices"][0]["message"]["content"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    return content if isinstance(content, str) else None
 
 
 def serialize_and_encode(obj: Union[np.ndarray], compress=True) -> Tuple[str, bool]:
@@ -323,27 +470,28 @@ class SiliconCloudHandler:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params, timeout=10) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        models = [model["id"] for model in data["data"]]
-                        
-                        # 根据类型过滤模型
-                        if model_type == "vlm":
-                            # VLM 模型包含 "vl"
-                            models = [m for m in models if "vl" in m.lower()]
-                            models.append("No VLM Enhancement")
-                        else:
-                            # LLM 模型不包含 "vl"
-                            models = [m for m in models if "vl" not in m.lower()]
-                            models.append("No LLM Enhancement")
-                            
-                        print(f"[Silicon] 获取{model_type.upper()}模型列表成功: {models}")
-                        return models
-                    else:
-                        print(f"[Silicon] 获取模型列表失败: HTTP {response.status}")
-                        return []
+            base_url = self.vlm_api_base if model_type == "vlm" else self.api_base
+            status, _, data = await get_http_client().aget_json(
+                url, headers, params=params, base_url=base_url, timeout=10
+            )
+            if status == 200:
+                models = [model["id"] for model in data["data"]]
+                
+                # 根据类型过滤模型
+                if model_type == "vlm":
+                    # VLM 模型包含 "vl"
+                    models = [m for m in models if "vl" in m.lower()]
+                    models.append("No VLM Enhancement")
+                else:
+                    # LLM 模型不包含 "vl"
+                    models = [m for m in models if "vl" not in m.lower()]
+                    models.append("No LLM Enhancement")
+                    
+                print(f"[Silicon] 获取{model_type.upper()}模型列表成功: {models}")
+                return models
+            else:
+                print(f"[Silicon] 获取模型列表失败: HTTP {status}")
+                return []
         except Exception as e:
             print(f"[Silicon] 获取模型列表失败: {e}")
             return []
@@ -381,40 +529,34 @@ class SiliconCloudHandler:
         }
         
         try:
-            import urllib.request
-            import urllib.error
+            response_text = send_post_request(url, payload, headers, base_url=self.api_base)
+            response_json = json.loads(response_text)
+            
+            # 检查响应格式
+            if "error" in response_json:
+                error_msg = response_json["error"].get("message", "Unknown error")
+                print(f"[Silicon] API错误: {error_msg}")
+                return json.dumps({
+                    "choices": [{
+                        "message": {
+                            "content": f"API错误: {error_msg}"
+                        }
+                    }]
+                })
+            
+            # 确保响应包含必要的字段
+            if "choices" not in response_json or not response_json["choices"]:
+                print(f"[Silicon] 响应格式错误: {response_text}")
+                return json.dumps({
+                    "choices": [{
+                        "message": {
+                            "content": "响应格式错误，请检查API配置"
+                        }
+                    }]
+                })
+            
+            return response_text
             
-            data = json.dumps(payload).encode('utf-8')
-            req = urllib.request.Request(url, data=data, headers=headers)
-            with urllib.request.urlopen(req) as response:
-                response_text = response.read().decode('utf-8')
-                response_json = json.loads(response_text)
-                
-                # 检查响应格式
-                if "error" in response_json:
-                    error_msg = response_json["error"].get("message", "Unknown error")
-                    print(f"[Silicon] API错误: {error_msg}")
-                    return json.dumps({
-                        "choices": [{
-                            "message": {
-                                "content": f"API错误: {error_msg}"
-                            }
-                        }]
-                    })
-                
-                # 确保响应包含必要的字段
-                if "choices" not in response_json or not response_json["choices"]:
-                    print(f"[Silicon] 响应格式错误: {response_text}")
-                    return json.dumps({
-                        "choices": [{
-                            "message": {
-                                "content": "响应格式错误，请检查API配置"
-                            }
-                        }]
-                    })
-                
-                return response_text
-                
         except Exception as e:
             error_msg = str(e)
             print(f"[Silicon] 请求失败: {error_msg}")
@@ -474,13 +616,7 @@ class SiliconCloudHandler:
         }
         
         try:
-            import urllib.request
-            import urllib.error
-            
-            data = json.dumps(payload).encode('utf-8')
-            req = urllib.request.Request(url, data=data, headers=headers)
-            with urllib.request.urlopen(req) as response:
-                return response.read().decode('utf-8')
+            return send_post_request(url, payload, headers, base_url=self.vlm_api_base)
         except Exception as e:
             error_msg = {"error": {"message": str(e)}}
             return json.dumps(error_msg)
@@ -528,17 +664,17 @@ class DeepSeekHandler:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, timeout=10) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        models = [model["id"] for model in data.get("data", [])]
-                        models.append("No DeepSeek Enhancement")
-                        print(f"[AIAssistant] 获取DeepSeek模型列表成功: {models}")
-                        return models
-                    else:
-                        print(f"[AIAssistant] 获取DeepSeek模型列表失败: HTTP {response.status}")
-                        return []
+            status, _, data = await get_http_client().aget_json(
+                url, headers, base_url=self.api_base, timeout=10
+            )
+            if status == 200:
+                models = [model["id"] for model in data.get("data", [])]
+                models.append("No DeepSeek Enhancement")
+                print(f"[AIAssistant] 获取DeepSeek模型列表成功: {models}")
+                return models
+            else:
+                print(f"[AIAssistant] 获取DeepSeek模型列表失败: HTTP {status}")
+                return []
         except Exception as e:
             print(f"[AIAssistant] 获取DeepSeek模型列表失败: {e}")
             return []
@@ -582,10 +718,7 @@ class DeepSeekHandler:
         }
         
         try:
-            import requests
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.text
+            return send_post_request(url, payload, headers, base_url=self.api_base)
         except Exception as e:
             error_msg = str(e)
             print(f"[AIAssistant] DeepSeek请求失败: {error_msg}")
@@ -612,50 +745,17 @@ class GenericOpenAIHandler:
         if self.base_url.endswith("/"):
             self.base_url = self.base_url[:-1]
             
-    async def fetch_models(self) -> List[str]:
-        """获取模型列表"""
-        try:
-            if not self.api_key:
-                return ["API Key 未设置"]
-                
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/models", headers=headers) as response:
-                    if response.status != 200:
-                        return [f"获取模型列表失败: {response.status} {response.reason}"]
-                    
-                    data = await response.json()
-                    if "data" in data:
-                        return [model["id"] for model in data["data"]]
-                    else:
-                        return ["获取模型列表格式异常"]
-        except Exception as e:
-            print(f"[GenericOpenAIHandler] 获取模型列表失败: {e}")
-            return [f"获取模型列表失败: {e}"]
-    
-    def get_llm_response(
-        self,
-        model: str,
-        system_prompt: str,
-        user_prompt: str,
-        max_tokens: int = 4096,
-        temperature: float = 0.7,
-        top_p: float = 0.9,
-    ) -> str:
-        """发送 LLM 请求到任意兼容 OpenAI 格式的 API"""
+    def _build_headers(self) -> dict:
         if not self.api_key:
             raise Exception("API Key 未设置")
-            
-        headers = {
+        return {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
-        
-        payload = {
+
+    def _build_llm_payload(self, model, system_prompt, user_prompt, max_tokens, temperature, top_p,
+                           stream=False) -> dict:
+        return {
             "model": model,
             "messages": [
                 {"role": "system", "content": system_prompt},
@@ -665,31 +765,11 @@ class GenericOpenAIHandler:
             "temperature": temperature,
             "top_p": top_p,
             "n": 1,
-            "stream": False
+            "stream": stream
         }
-        
-        return send_post_request(f"{self.base_url}/chat/completions", headers=headers, payload=payload)
-    
-    def get_vlm_response(
-        self,
-        model: str,
-        system_prompt: str,
-        user_prompt: str,
-        base64_images: List[str],
-        max_tokens: int = 4096,
-        temperature: float = 0.7,
-        top_p: float = 0.9,
-        detail: str = "auto"
-    ) -> str:
-        """发送包含图像的 VLM 请求到任意兼容 OpenAI 格式的 API"""
-        if not self.api_key:
-            raise Exception("API Key 未设置")
-            
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
+
+    def _build_vlm_payload(self, model, system_prompt, user_prompt, base64_images, max_tokens, temperature,
+                           top_p, detail="auto", stream=False, image_mime="image/webp") -> dict:
         # 系统消息
         messages = [
             {"role": "system", "content": system_prompt}
@@ -701,7 +781,7 @@ class GenericOpenAIHandler:
             user_content.append({
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/webp;base64,{base64_image}",
+                    "url": f"data:{image_mime};base64,{base64_image}",
                     "detail": detail
                 }
             })
@@ -712,14 +792,179 @@ class GenericOpenAIHandler:
         # 添加到消息列表
         messages.append({"role": "user", "content": user_content})
         
-        payload = {
+        return {
             "model": model,
             "messages": messages,
             "max_tokens": max_tokens,
             "temperature": temperature,
             "top_p": top_p,
             "n": 1,
-            "stream": False
+            "stream": stream
         }
-        
-        return send_post_request(f"{self.base_url}/chat/completions", headers=headers, payload=payload)
+
+    def _lookup_cache(self, payload, use_cache):
+        """查询响应缓存，返回 (缓存键, 缓存的响应)；未启用缓存时键为 None"""
+        cache = get_response_cache() if use_cache else None
+        if cache is None or not cache.enabled:
+            return None, None
+        cache_key = compute_cache_key(self.base_url, payload)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f"[GenericOpenAIHandler] 命中响应缓存: {cache_key[:12]}")
+        return cache_key, cached
+
+    @staticmethod
+    def _store_cache(cache_key, response):
+        # 只缓存包含有效内容的响应
+        if cache_key and extract_response_content(response):
+            get_response_cache().put(cache_key, response)
+
+    def _send_chat_request(self, payload, headers, stream=False, on_delta=None, use_cache=False) -> str:
+        """发送 chat/completions 请求，按需切换流式/非流式，并读写响应缓存"""
+        cache_key, cached = self._lookup_cache(payload, use_cache)
+        if cached is not None:
+            if stream and on_delta:
+                on_delta(extract_response_content(cached) or "")
+            return cached
+
+        url = f"{self.base_url}/chat/completions"
+        if stream:
+            response = send_stream_request(url, payload, headers, on_delta=on_delta, base_url=self.base_url)
+        else:
+            response = send_post_request(url, headers=headers, payload=payload, base_url=self.base_url)
+
+        self._store_cache(cache_key, response)
+        return response
+
+    async def _asend_chat_request(self, payload, headers, stream=False, on_delta=None, use_cache=False) -> str:
+        """_send_chat_request 的异步版本，响应缓存的哈希计算和磁盘读写在线程中执行，不阻塞事件循环"""
+        cache_key, cached = None, None
+        if use_cache:
+            cache_key, cached = await asyncio.to_thread(self._lookup_cache, payload, use_cache)
+        if cached is not None:
+            if stream and on_delta:
+                on_delta(extract_response_content(cached) or "")
+            return cached
+
+        url = f"{self.base_url}/chat/completions"
+        if stream:
+            response = await asend_stream_request(url, payload, headers, on_delta=on_delta, base_url=self.base_url)
+        else:
+            response = await asend_post_request(url, headers=headers, payload=payload, base_url=self.base_url)
+
+        if cache_key:
+            await asyncio.to_thread(self._store_cache, cache_key, response)
+        return response
+
+    async def fetch_models(self) -> List[str]:
+        """获取模型列表"""
+        try:
+            if not self.api_key:
+                return ["API Key 未设置"]
+                
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+            
+            status, reason, data = await get_http_client().aget_json(
+                f"{self.base_url}/models", headers, base_url=self.base_url
+            )
+            if status != 200:
+                return [f"获取模型列表失败: {status} {reason}"]
+            
+            if isinstance(data, dict) and "data" in data:
+                return [model["id"] for model in data["data"]]
+            else:
+                return ["获取模型列表格式异常"]
+        except Exception as e:
+            print(f"[GenericOpenAIHandler] 获取模型列表失败: {e}")
+            return [f"获取模型列表失败: {e}"]
+    
+    def get_llm_response(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], None]] = None,
+        use_cache: bool = False,
+    ) -> str:
+        """发送 LLM 请求到任意兼容 OpenAI 格式的 API
+
+        stream 为 True 时以 SSE 方式接收，增量文本通过 on_delta 回调，返回值结构不变；
+        use_cache 为 True 时相同请求负载直接返回磁盘缓存的响应
+        """
+        headers = self._build_headers()
+        payload = self._build_llm_payload(model, system_prompt, user_prompt, max_tokens, temperature, top_p, stream)
+        return self._send_chat_request(payload, headers, stream, on_delta, use_cache)
+
+    async def aget_llm_response(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], None]] = None,
+        use_cache: bool = False,
+    ) -> str:
+        """get_llm_response 的异步版本，在连接池事件循环中执行，不阻塞调用方线程"""
+        headers = self._build_headers()
+        payload = self._build_llm_payload(model, system_prompt, user_prompt, max_tokens, temperature, top_p, stream)
+        return await self._asend_chat_request(payload, headers, stream, on_delta, use_cache)
+    
+    def get_vlm_response(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        base64_images: List[str],
+        max_tokens: int = 4096,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        detail: str = "auto",
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], None]] = None,
+        use_cache: bool = False,
+        image_mime: str = "image/webp",
+    ) -> str:
+        """发送包含图像的 VLM 请求到任意兼容 OpenAI 格式的 API
+
+        stream 为 True 时以 SSE 方式接收，增量文本通过 on_delta 回调，返回值结构不变；
+        use_cache 为 True 时相同请求负载（图像按编码字节计算摘要）直接返回缓存的响应
+        """
+        headers = self._build_headers()
+        payload = self._build_vlm_payload(
+            model, system_prompt, user_prompt, base64_images, max_tokens, temperature, top_p, detail,
+            stream, image_mime
+        )
+        return self._send_chat_request(payload, headers, stream, on_delta, use_cache)
+
+    async def aget_vlm_response(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        base64_images: List[str],
+        max_tokens: int = 4096,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        detail: str = "auto",
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], None]] = None,
+        use_cache: bool = False,
+        image_mime: str = "image/webp",
+    ) -> str:
+        """get_vlm_response 的异步版本，在连接池事件循环中执行，不阻塞调用方线程"""
+        headers = self._build_headers()
+        payload = self._build_vlm_payload(
+            model, system_prompt, user_prompt, base64_images, max_tokens, temperature, top_p, detail,
+            stream, image_mime
+        )
+        return await self._asend_chat_request(payload, headers, stream, on_delta, use_cache)
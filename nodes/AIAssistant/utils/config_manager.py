@@ -4,7 +4,109 @@
 
 import json
 import os
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+
+# 插件配置目录: .../custom_nodes/Axun_Nodes/config
+CONFIG_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    "config"
+)
+
+
+def get_config_path(filename: str) -> str:
+    """获取插件 config 目录下配置文件的路径"""
+    return os.path.join(CONFIG_DIR, filename)
+
+
+def write_json_atomic(path: str, data: Any) -> str:
+    """先写临时文件再替换，避免读者看到写了一半的 JSON；返回写入的文本"""
+    content = json.dumps(data, indent=4, ensure_ascii=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return content
+
+
+class JsonConfigStore:
+    """
+    JSON 配置文件缓存
+
+    每个文件只解析一次，之后每次读取仅做一次 stat，文件 mtime 或大小变化时
+    重新解析；load 返回的对象在各调用方之间共享，不可修改，修改请使用 update。
+    """
+
+    def __init__(self, config_dir: str = CONFIG_DIR):
+        self.config_dir = config_dir
+        self._lock = threading.RLock()
+        # 文件名 -> ((mtime_ns, size), 解析结果)
+        self._entries: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.config_dir, filename)
+
+    def load(self, filename: str, default: Any = None) -> Any:
+        """读取配置；文件不存在或解析失败时返回 default"""
+        path = self.path(filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return default
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[ConfigStore] 读取配置文件失败 {filename}: {e}")
+                return default
+            self._entries[filename] = (signature, data)
+            return data
+
+    def save(self, filename: str, data: Any):
+        """原子写入配置并更新缓存"""
+        path = self.path(filename)
+        with self._lock:
+            content = write_json_atomic(path, data)
+            stat = os.stat(path)
+            # 缓存写入文本的解析结果，与调用方持有的对象互不影响
+            self._entries[filename] = ((stat.st_mtime_ns, stat.st_size), json.loads(content))
+
+    def update(self, filename: str, mutator: Callable[[Dict[str, Any]], None],
+               default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """读取配置副本，交给 mutator 原地修改后原子写回，返回写入的配置"""
+        with self._lock:
+            current = self.load(filename)
+            data = json.loads(json.dumps(current)) if current is not None else dict(default or {})
+            mutator(data)
+            self.save(filename, data)
+            return data
+
+    def exists(self, filename: str) -> bool:
+        return os.path.exists(self.path(filename))
+
+
+_config_store: Optional[JsonConfigStore] = None
+_config_store_lock = threading.Lock()
+
+
+def get_config_store() -> JsonConfigStore:
+    """获取进程级共享的配置缓存"""
+    global _config_store
+    with _config_store_lock:
+        if _config_store is None:
+            _config_store = JsonConfigStore()
+        return _config_store
 
 class ConfigManager:
     def __init__(self):
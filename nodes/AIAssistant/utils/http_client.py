@@ -0,0 +1,489 @@
+"""
+共享 HTTP 连接池
+为 AI 助手的所有 API 处理器提供进程级、长连接复用的异步 HTTP 客户端
+"""
+
+import asyncio
+import atexit
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from ....utils.background_loop import get_background_loop
+from .config_manager import get_config_store
+
+# 默认连接池参数，可在 AIAssistant_config.json 的 "http_client" 字段中覆盖
+DEFAULT_HTTP_SETTINGS = {
+    "limit": 64,                # 全局最大连接数
+    "limit_per_host": 8,        # 单个主机最大连接数
+    "keepalive_timeout": 60,    # 空闲连接保活时间（秒）
+    "connect_timeout": 10,      # 建立连接超时（秒）
+    "read_timeout": 300,        # 读取响应超时（秒）
+    "max_retries": 3,           # 可重试错误的最大重试次数
+    "retry_read_errors": False, # 读取超时、响应中断后是否也重试（请求可能已被处理，会重复生成和计费）
+    "backoff_base": 1.0,        # 指数退避基数（秒）
+    "backoff_max": 30.0,        # 单次退避上限（秒）
+    "retry_after_max": 120.0,   # Retry-After 等待上限（秒）
+    "retry_statuses": [408, 425, 429, 500, 502, 503, 504],
+    "circuit_failure_threshold": 5,   # 连续失败多少次后熔断
+    "circuit_reset_timeout": 30.0,    # 熔断后多久允许试探请求（秒）
+}
+
+
+def _load_http_settings() -> Dict[str, Any]:
+    """从插件配置文件读取连接池参数"""
+    settings = dict(DEFAULT_HTTP_SETTINGS)
+    try:
+        user_settings = get_config_store().load("AIAssistant_config.json", {}).get("http_client", {})
+        settings.update({k: v for k, v in user_settings.items() if k in DEFAULT_HTTP_SETTINGS})
+    except Exception as e:
+        print(f"[HttpClient] 读取连接池配置失败，使用默认值: {e}")
+    return settings
+
+
+# 连接阶段的错误：请求尚未发出，重试不会让服务端重复处理
+# （连接被拒绝、DNS 失败、建立连接时被重置，以及 aiohttp 3.10 起单独区分的连接超时）
+CONNECT_ERRORS = (aiohttp.ClientConnectorError,) + (
+    (aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, "ConnectionTimeoutError") else ()
+)
+
+
+def get_pool_key(url: str, base_url: Optional[str] = None) -> str:
+    """计算连接池键：优先使用 base_url，否则取 URL 的 scheme://host:port"""
+    if base_url:
+        return base_url.rstrip("/")
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class CircuitOpenError(Exception):
+    """目标服务处于熔断状态，请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """单个 base_url 的熔断器
+
+    连续失败达到阈值后进入 open 状态，在 reset_timeout 内直接拒绝请求；
+    超时后进入 half_open 状态放行一次试探请求，成功则恢复，失败则重新熔断。
+    """
+
+    def __init__(self, key: str, failure_threshold: int, reset_timeout: float):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def before_request(self):
+        """请求前检查，熔断中时抛出 CircuitOpenError"""
+        if self.state == "open":
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"服务 {self.key} 连续失败 {self.failures} 次，已熔断，{remaining:.0f} 秒后重试"
+                )
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                raise CircuitOpenError(f"服务 {self.key} 正在进行恢复探测，请稍后重试")
+            self._probing = True
+
+    def release(self):
+        """请求因非网络原因中止，只释放试探名额，不改变状态"""
+        self._probing = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncRateLimiter:
+    """令牌桶限速器，需在后台事件循环中使用"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """获取一个令牌，令牌不足时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PooledHttpClient:
+    """按 base_url 复用 aiohttp 会话的进程级 HTTP 客户端
+
+    所有会话都运行在插件共享的后台事件循环中（见 utils/background_loop.py）：
+    - 同步调用方（节点执行线程）通过 post() 等同步方法桥接
+    - 异步调用方（aiohttp 路由）通过 apost()/aget_json() 桥接
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_HTTP_SETTINGS)
+        self.settings.update(settings)
+        self._background = get_background_loop()
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._rate_limits: Dict[str, float] = {}
+        self._limiters: Dict[str, AsyncRateLimiter] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    # ---------- 事件循环管理 ----------
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在后台事件循环中执行协程，并同步等待结果"""
+        return self._background.run(coro, timeout)
+
+    async def run_async(self, coro):
+        """从其他事件循环中等待后台事件循环执行的协程"""
+        return await self._background.run_async(coro)
+
+    # ---------- 会话管理 ----------
+
+    def _stats_for(self, key: str) -> Dict[str, int]:
+        if key not in self._stats:
+            self._stats[key] = {
+                "requests": 0,
+                "errors": 0,
+                "connections_created": 0,
+                "connections_reused": 0,
+                "retries": 0,
+                "circuit_rejections": 0,
+            }
+        return self._stats[key]
+
+    def _build_trace_config(self, key: str) -> aiohttp.TraceConfig:
+        """通过 aiohttp 追踪钩子统计新建/复用连接次数"""
+        stats = self._stats_for(key)
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_connection_create_end(session, ctx, params):
+            stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            stats["connections_reused"] += 1
+
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def _get_session(self, key: str) -> aiohttp.ClientSession:
+        """获取（或创建）指定 base_url 的会话，必须在后台事件循环中调用"""
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.settings["limit"],
+                limit_per_host=self.settings["limit_per_host"],
+                keepalive_timeout=self.settings["keepalive_timeout"],
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=None,
+                connect=self.settings["connect_timeout"],
+                sock_read=self.settings["read_timeout"],
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                trace_configs=[self._build_trace_config(key)],
+            )
+            self._sessions[key] = session
+        return session
+
+    def set_rate_limit(self, base_url: str, requests_per_second: float):
+        """设置指定 base_url 的请求速率上限，0 表示不限速"""
+        key = get_pool_key(base_url, base_url)
+        if requests_per_second and requests_per_second > 0:
+            if self._rate_limits.get(key) != requests_per_second:
+                self._rate_limits[key] = requests_per_second
+                self._limiters.pop(key, None)
+        else:
+            self._rate_limits.pop(key, None)
+            self._limiters.pop(key, None)
+
+    async def _throttle(self, key: str):
+        """按主机限速，必须在后台事件循环中调用"""
+        rate = self._rate_limits.get(key)
+        if not rate:
+            return
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = AsyncRateLimiter(rate)
+        await limiter.acquire()
+
+    async def _close_sessions(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+    def configure(self, **settings):
+        """更新连接池参数，已有会话和熔断器会被重建以便新参数生效"""
+        self.settings.update({k: v for k, v in settings.items() if k in DEFAULT_HTTP_SETTINGS})
+        self._breakers.clear()
+        if self._background.running:
+            self.run(self._close_sessions())
+
+    def close(self):
+        """关闭所有会话；后台事件循环由 get_background_loop 在退出时停止"""
+        if not self._background.running:
+            return
+        try:
+            self.run(self._close_sessions(), timeout=5)
+        except Exception:
+            pass
+
+    # ---------- 请求实现（在后台事件循环中执行） ----------
+
+    def _breaker_for(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(
+                key,
+                self.settings["circuit_failure_threshold"],
+                self.settings["circuit_reset_timeout"],
+            )
+        return breaker
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """指数退避 + 全抖动"""
+        ceiling = min(self.settings["backoff_max"], self.settings["backoff_base"] * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    async def _send_with_retry(self, key: str, send: Callable, can_retry: Callable[[], bool] = lambda: True):
+        """带重试、退避和熔断的请求执行器
+
+        send() 返回 (状态码, 响应文本, 响应头)。连接阶段的错误和 retry_statuses 中的状态码
+        会按指数退避重试，429/503 等响应携带 Retry-After 时优先按其等待；
+        读取超时、响应中断时请求可能已被处理，只在开启 retry_read_errors 时重试。
+        连接错误、超时和 5xx 计入熔断器失败次数。
+        """
+        stats = self._stats_for(key)
+        breaker = self._breaker_for(key)
+        retry_statuses = set(self.settings["retry_statuses"])
+        attempt = 0
+        while True:
+            try:
+                breaker.before_request()
+            except CircuitOpenError:
+                stats["circuit_rejections"] += 1
+                raise
+            await self._throttle(key)
+            stats["requests"] += 1
+            try:
+                status, body, headers = await send()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                stats["errors"] += 1
+                breaker.record_failure()
+                retryable = isinstance(e, CONNECT_ERRORS) or self.settings["retry_read_errors"]
+                if not retryable or attempt >= self.settings["max_retries"] or not can_retry():
+                    raise
+                delay = self._backoff_delay(attempt)
+            except BaseException:
+                # 回调主动中止、任务被取消等非网络异常不计入熔断，但要释放试探名额
+                breaker.release()
+                raise
+            else:
+                if status >= 500:
+                    stats["errors"] += 1
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if status not in retry_statuses or attempt >= self.settings["max_retries"]:
+                    return status, body
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                if retry_after is not None:
+                    delay = min(retry_after, self.settings["retry_after_max"])
+                else:
+                    delay = self._backoff_delay(attempt)
+            attempt += 1
+            stats["retries"] += 1
+            print(f"[HttpClient] {key} 请求失败，{delay:.1f} 秒后进行第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _encode_payload(payload: Dict[str, Any], headers: Dict[str, str],
+                        metrics: Optional[Dict[str, Any]]) -> Tuple[bytes, Dict[str, str]]:
+        """请求体只序列化一次，重试时复用，并记录请求字节数"""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        if metrics is not None:
+            metrics["request_bytes"] = len(body)
+        return body, {"Content-Type": "application/json", **headers}
+
+    async def _post_impl(self, url: str, payload: Dict[str, Any], headers: Dict[str, str],
+                         key: str, metrics: Optional[Dict[str, Any]] = None) -> Tuple[int, str]:
+        """发送 JSON POST 请求；传入 metrics 时记录首字节时间、收发字节数和尝试次数"""
+        body, headers = self._encode_payload(payload, headers, metrics)
+        metrics = metrics if metrics is not None else {}
+
+        async def send():
+            session = self._get_session(key)
+            started = time.perf_counter()
+            metrics["attempts"] = metrics.get("attempts", 0) + 1
+            async with session.post(url, data=body, headers=headers) as response:
+                metrics["ttfb"] = time.perf_counter() - started
+                raw = await response.read()
+                metrics["response_bytes"] = len(raw)
+                return response.status, raw.decode(response.get_encoding(), errors="replace"), response.headers
+
+        return await self._send_with_retry(key, send)
+
+    async def _stream_post_impl(self, url: str, payload: Dict[str, Any], headers: Dict[str, str],
+                                key: str, on_event: Callable[[Dict[str, Any]], None],
+                                metrics: Optional[Dict[str, Any]] = None) -> Tuple[int, str]:
+        """发送 POST 请求并按 text/event-stream 逐条解析 data 事件
+
+        每个 JSON 事件都会回调 on_event；回调抛出的异常会中止读取并关闭响应，
+        从而提前结束远端生成。若服务端未返回事件流，则返回完整响应文本。
+        已经回调过事件后出现的网络错误不再重试，避免重复输出。
+        """
+        delivered = False
+        body, headers = self._encode_payload(payload, headers, metrics)
+        metrics = metrics if metrics is not None else {}
+
+        async def send():
+            nonlocal delivered
+            session = self._get_session(key)
+            started = time.perf_counter()
+            metrics["attempts"] = metrics.get("attempts", 0) + 1
+            async with session.post(url, data=body, headers=headers) as response:
+                metrics["ttfb"] = time.perf_counter() - started
+                content_type = response.headers.get("Content-Type", "")
+                if response.status != 200 or "text/event-stream" not in content_type:
+                    raw = await response.read()
+                    metrics["response_bytes"] = len(raw)
+                    return response.status, raw.decode(response.get_encoding(), errors="replace"), response.headers
+
+                metrics["response_bytes"] = 0
+                async for raw_line in response.content:
+                    metrics["response_bytes"] += len(raw_line)
+                    line = raw_line.strip()
+                    # 跳过空行和 SSE 注释（保活心跳）
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    if not delivered:
+                        delivered = True
+                        metrics["ttft"] = time.perf_counter() - started
+                    on_event(json.loads(data))
+                return response.status, "", response.headers
+
+        return await self._send_with_retry(key, send, can_retry=lambda: not delivered)
+
+    async def _get_json_impl(self, url: str, headers: Dict[str, str], params: Optional[Dict[str, Any]],
+                             key: str, timeout: Optional[float]) -> Tuple[int, str, Any]:
+        stats = self._stats_for(key)
+        stats["requests"] += 1
+        try:
+            session = self._get_session(key)
+            request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+            async with session.get(url, headers=headers, params=params, timeout=request_timeout) as response:
+                data = await response.json(content_type=None) if response.status == 200 else None
+                return response.status, response.reason, data
+        except Exception:
+            stats["errors"] += 1
+            raise
+
+    # ---------- 公共接口 ----------
+
+    def post(self, url: str, payload: Dict[str, Any], headers: Dict[str, str],
+             base_url: Optional[str] = None, metrics: Optional[Dict[str, Any]] = None) -> Tuple[int, str]:
+        """同步发送 JSON POST 请求，返回 (状态码, 响应文本)"""
+        return self.run(self._post_impl(url, payload, headers, get_pool_key(url, base_url), metrics))
+
+    def stream_post(self, url: str, payload: Dict[str, Any], headers: Dict[str, str],
+                    on_event: Callable[[Dict[str, Any]], None],
+                    base_url: Optional[str] = None, metrics: Optional[Dict[str, Any]] = None) -> Tuple[int, str]:
+        """同步发送流式 POST 请求，事件在后台事件循环线程中回调"""
+        key = get_pool_key(url, base_url)
+        return self.run(self._stream_post_impl(url, payload, headers, key, on_event, metrics))
+
+    async def apost(self, url: str, payload: Dict[str, Any], headers: Dict[str, str],
+                    base_url: Optional[str] = None, metrics: Optional[Dict[str, Any]] = None) -> Tuple[int, str]:
+        """异步发送 JSON POST 请求，返回 (状态码, 响应文本)"""
+        return await self.run_async(self._post_impl(url, payload, headers, get_pool_key(url, base_url), metrics))
+
+    async def astream_post(self, url: str, payload: Dict[str, Any], headers: Dict[str, str],
+                           on_event: Callable[[Dict[str, Any]], None],
+                           base_url: Optional[str] = None,
+                           metrics: Optional[Dict[str, Any]] = None) -> Tuple[int, str]:
+        """异步发送流式 POST 请求，事件在后台事件循环线程中回调"""
+        key = get_pool_key(url, base_url)
+        return await self.run_async(self._stream_post_impl(url, payload, headers, key, on_event, metrics))
+
+    async def aget_json(self, url: str, headers: Dict[str, str], params: Optional[Dict[str, Any]] = None,
+                        base_url: Optional[str] = None, timeout: Optional[float] = None) -> Tuple[int, str, Any]:
+        """异步发送 GET 请求，返回 (状态码, 状态描述, JSON 数据)"""
+        key = get_pool_key(url, base_url)
+        return await self.run_async(self._get_json_impl(url, headers, params, key, timeout))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接复用统计信息"""
+        hosts = {}
+        for key, stats in self._stats.items():
+            total = stats["connections_created"] + stats["connections_reused"]
+            hosts[key] = dict(stats, reuse_ratio=round(stats["connections_reused"] / total, 4) if total else 0.0)
+        for key, breaker in self._breakers.items():
+            hosts.setdefault(key, {})["circuit_state"] = breaker.state
+        return {
+            "settings": dict(self.settings),
+            "rate_limits": dict(self._rate_limits),
+            "open_sessions": sum(1 for s in self._sessions.values() if not s.closed),
+            "hosts": hosts,
+        }
+
+
+_http_client: Optional[PooledHttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> PooledHttpClient:
+    """获取进程级共享的 HTTP 客户端"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = PooledHttpClient(**_load_http_settings())
+            atexit.register(_http_client.close)
+        return _http_client
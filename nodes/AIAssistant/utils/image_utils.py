@@ -1,65 +1,152 @@
 import base64
 import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from PIL import Image
 import torch
+import torch.nn.functional as F
 import numpy as np
 import logging
-import json
 
 logger = logging.getLogger('axun.image')
 
-def encode_comfy_image(image_tensor: torch.Tensor, image_format: str = "WEBP", lossless: bool = True) -> str:
+# Pillow 编码时会释放 GIL，多张图像可在线程池中并行编码
+_encode_executor: Optional[ThreadPoolExecutor] = None
+_encode_executor_lock = threading.Lock()
+
+
+# 不同 detail 下的尺寸上限 (最长边, 最短边)，与 OpenAI 视觉接口的处理规则一致：
+# low 缩放到 512x512 以内；high/auto 先缩放到 2048x2048 以内，再缩放到最短边不超过 768
+DETAIL_LIMITS = {
+    "low": (512, 0),
+    "high": (2048, 768),
+    "auto": (2048, 768),
+}
+
+# 负载图像格式：显示名称 -> (编码格式, 是否无损, MIME 类型)
+PAYLOAD_FORMATS = {
+    "WEBP无损": ("WEBP", True, "image/webp"),
+    "WEBP": ("WEBP", False, "image/webp"),
+    "JPEG": ("JPEG", False, "image/jpeg"),
+}
+
+
+def _get_encode_executor() -> ThreadPoolExecutor:
+    global _encode_executor
+    with _encode_executor_lock:
+        if _encode_executor is None:
+            _encode_executor = ThreadPoolExecutor(
+                max_workers=min(8, os.cpu_count() or 1),
+                thread_name_prefix="axun-image-encode",
+            )
+        return _encode_executor
+
+
+def _encode_array(image_np: np.ndarray, image_format: str, lossless: bool, quality: int = 95) -> str:
+    """将单张 uint8 [H, W, C] 数组编码为 base64 字符串"""
+    mode = 'RGB' if image_np.shape[2] == 3 else 'RGBA'
+    pil_image = Image.fromarray(image_np, mode)
+
+    buffer = io.BytesIO()
+    if image_format.upper() == "WEBP":
+        pil_image.save(buffer, format="WEBP", quality=100 if lossless else quality, lossless=lossless)
+    else:
+        # JPEG 不支持透明通道
+        if image_format.upper() in ("JPEG", "JPG") and mode == 'RGBA':
+            pil_image = pil_image.convert('RGB')
+        pil_image.save(buffer, format=image_format.upper(), quality=quality)
+
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+def get_target_size(height: int, width: int, max_side: int = 0, max_short_side: int = 0) -> Tuple[int, int]:
+    """计算最长边和最短边都不超过上限的目标尺寸，保持宽高比且不放大"""
+    scale = 1.0
+    if max_side and max(height, width) > max_side:
+        scale = min(scale, max_side / max(height, width))
+    # 先按最长边缩放后最短边仍超出时继续缩小，等价于直接取两个比例中较小的一个
+    if max_short_side and min(height, width) > max_short_side:
+        scale = min(scale, max_short_side / min(height, width))
+    if scale >= 1.0:
+        return height, width
+    return max(1, int(height * scale)), max(1, int(width * scale))
+
+
+def encode_comfy_image(image_tensor: torch.Tensor, image_format: str = "WEBP", lossless: bool = True,
+                       quality: int = 95, max_side: int = 0, max_short_side: int = 0) -> List[str]:
     """
     将图像张量编码为base64字符串
     Args:
         image_tensor: [B, H, W, C] 格式的图像张量
         image_format: 图像格式，默认为WEBP
         lossless: 是否无损压缩，默认为True
+        quality: 有损压缩质量
+        max_side: 最长边上限，0 表示不限制
+        max_short_side: 最短边上限，0 表示不限制
     Returns:
-        JSON字符串，包含所有图像的base64编码
+        按批次顺序排列的base64编码列表
     """
     try:
         # 类型检查
         if not isinstance(image_tensor, torch.Tensor):
             raise TypeError(f"Expected torch.Tensor, got {type(image_tensor)}")
-            
+
         # 维度检查
         if len(image_tensor.shape) != 4:
             raise ValueError(f"Expected 4D tensor [B,H,W,C], got shape {image_tensor.shape}")
-        
-        # 存储所有图像的base64编码
-        image_dict = {}
-        
-        # 处理批次中的每张图片
-        for i in range(image_tensor.shape[0]):
-            image = image_tensor[i]
-            
-            # 确保值范围在[0,1]之间
-            if image.min() < 0 or image.max() > 1:
-                logger.warning("Image values outside [0,1] range, clipping...")
-                image = torch.clamp(image, 0, 1)
-            
-            # 转换为PIL图像
-            image_np = (image * 255).byte().cpu().numpy()
-            if image_np.shape[2] == 3:  # RGB
-                pil_image = Image.fromarray(image_np, 'RGB')
-            elif image_np.shape[2] == 4:  # RGBA
-                pil_image = Image.fromarray(image_np, 'RGBA')
-            else:
-                raise ValueError(f"Unsupported number of channels: {image_np.shape[2]}")
-            
-            # 转换为指定格式的base64字符串
-            buffer = io.BytesIO()
-            if image_format.upper() == "WEBP":
-                pil_image.save(buffer, format="WEBP", quality=100 if lossless else 95, lossless=lossless)
-            else:
-                pil_image.save(buffer, format=image_format.upper(), quality=95)
-            
-            image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            image_dict[f"image_{i}"] = image_base64
-        
-        return json.dumps(image_dict)
-        
+
+        if image_tensor.shape[3] not in (3, 4):
+            raise ValueError(f"Unsupported number of channels: {image_tensor.shape[3]}")
+
+        images = image_tensor.detach()
+
+        # 整批在原设备上缩放，减少后续拷贝和编码的数据量
+        height, width = images.shape[1], images.shape[2]
+        target_height, target_width = get_target_size(height, width, max_side, max_short_side)
+        if (target_height, target_width) != (height, width):
+            images = F.interpolate(
+                images.movedim(-1, 1).float(),
+                size=(target_height, target_width),
+                mode="bilinear",
+                antialias=True,
+                align_corners=False,
+            ).movedim(1, -1)
+
+        # 整批一次性裁剪到[0,1]并量化为uint8，只做一次设备到CPU的拷贝
+        batch_np = (images.clamp(0, 1) * 255).to(torch.uint8).cpu().numpy()
+
+        if len(batch_np) == 1:
+            return [_encode_array(batch_np[0], image_format, lossless, quality)]
+
+        executor = _get_encode_executor()
+        return list(executor.map(
+            lambda image_np: _encode_array(image_np, image_format, lossless, quality), batch_np
+        ))
+
     except Exception as e:
         logger.error(f"Error encoding image: {str(e)}")
-        return json.dumps({}) # 返回空字典的JSON字符串 
\ No newline at end of file
+        return [] # 返回空列表
+
+
+def encode_images_for_payload(image_tensor: torch.Tensor, detail: str = "auto", payload_format: str = "WEBP无损",
+                              quality: int = 90, resize: bool = True) -> Tuple[List[str], str, int]:
+    """
+    按 VLM 请求的 detail 设置优化图像负载
+    Args:
+        image_tensor: [B, H, W, C] 格式的图像张量
+        detail: VLM 图像细节级别，决定缩放上限
+        payload_format: PAYLOAD_FORMATS 中的格式名称
+        quality: 有损格式的压缩质量
+        resize: 是否按 detail 缩放
+    Returns:
+        (base64编码列表, MIME 类型, base64 总字节数)
+    """
+    image_format, lossless, mime_type = PAYLOAD_FORMATS.get(payload_format, PAYLOAD_FORMATS["WEBP无损"])
+    max_side, max_short_side = DETAIL_LIMITS.get(detail, DETAIL_LIMITS["auto"]) if resize else (0, 0)
+    base64_images = encode_comfy_image(
+        image_tensor, image_format=image_format, lossless=lossless, quality=quality,
+        max_side=max_side, max_short_side=max_short_side,
+    )
+    return base64_images, mime_type, sum(len(image) for image in base64_images)
@@ -0,0 +1,104 @@
+"""
+##名称:{内容} 标记解析
+TextCache、StoryExtractor、TextProcessor 和批量 LLM 节点共用的线性时间分词器，按文本哈希缓存结果
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+# 标记头：##名称:{
+HEADER_PATTERN = re.compile(r'##([^{:\n#]*):\s*\{')
+# 块内容中影响括号匹配的字符
+_BRACE_TOKEN_PATTERN = re.compile(r'[{}"\\]')
+
+# 缓存的分词结果数量
+_TOKEN_CACHE_SIZE = 32
+
+
+class MarkupBlock(NamedTuple):
+    """一个 ##名称:{内容} 块；content 为括号内的原始文本，start/end 为整块在原文中的范围"""
+    name: str
+    content: str
+    start: int
+    end: int
+
+
+def text_key(text: str) -> str:
+    """文本内容哈希，作为解析结果的缓存键"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def find_block_end(text: str, start: int, limit: int) -> int:
+    """
+    从左括号之后的 start 开始查找匹配的右括号，跳过 JSON 字符串中的括号
+
+    查找范围不超过下一个标记头 limit；括号不平衡时退回到 limit 之前的最后一个右括号，
+    没有右括号则返回 limit。每个字符最多检查一次，不存在回溯。
+    """
+    depth = 1
+    in_string = False
+    skip_until = start
+    for match in _BRACE_TOKEN_PATTERN.finditer(text, start, limit):
+        position = match.start()
+        if position < skip_until:
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                skip_until = position + 2
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return position
+    last_brace = text.rfind('}', start, limit)
+    return last_brace if last_brace != -1 else limit
+
+
+def _tokenize(text: str) -> Tuple[MarkupBlock, ...]:
+    blocks = []
+    headers = list(HEADER_PATTERN.finditer(text))
+    for i, header in enumerate(headers):
+        limit = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        end = find_block_end(text, header.end(), limit)
+        blocks.append(MarkupBlock(
+            header.group(1).strip(), text[header.end():end], header.start(), min(end + 1, limit)
+        ))
+    return tuple(blocks)
+
+
+_token_cache: "OrderedDict[str, Tuple[MarkupBlock, ...]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def tokenize_markup(text: str, key: str = None) -> Tuple[MarkupBlock, ...]:
+    """
+    将文本切分为按出现顺序排列的标记块
+
+    每个块只扫描到下一个标记头为止，整体为线性时间；相同文本直接返回缓存结果。
+    key 为调用方已计算好的 text_key(text)，可避免重复哈希。
+    """
+    if not text or '##' not in text:
+        return ()
+    key = key or text_key(text)
+    with _token_cache_lock:
+        blocks = _token_cache.get(key)
+        if blocks is not None:
+            _token_cache.move_to_end(key)
+            return blocks
+
+    blocks = _tokenize(text)
+    with _token_cache_lock:
+        _token_cache[key] = blocks
+        while len(_token_cache) > _TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return blocks
+
@@ -0,0 +1,201 @@
+"""
+LLM/VLM 响应缓存
+以完整请求负载的哈希为键，将成功的 API 响应持久化到磁盘
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config_manager import get_config_store
+
+# 默认缓存参数，可在 AIAssistant_config.json 的 "response_cache" 字段中覆盖
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": True,
+    "ttl_seconds": 7 * 24 * 3600,       # 条目过期时间
+    "max_entries": 2000,                # 最大条目数
+    "max_bytes": 200 * 1024 * 1024,     # 最大磁盘占用
+}
+
+# 不影响生成结果的字段，不参与缓存键计算
+_IGNORED_PAYLOAD_KEYS = ("stream", "stream_options")
+
+
+def _get_plugin_dir() -> str:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+
+
+def _load_cache_settings() -> Dict[str, Any]:
+    """从插件配置文件读取缓存参数"""
+    settings = dict(DEFAULT_CACHE_SETTINGS)
+    try:
+        user_settings = get_config_store().load("AIAssistant_config.json", {}).get("response_cache", {})
+        settings.update({k: v for k, v in user_settings.items() if k in DEFAULT_CACHE_SETTINGS})
+    except Exception as e:
+        print(f"[ResponseCache] 读取缓存配置失败，使用默认值: {e}")
+    return settings
+
+
+def _digest_images(value):
+    """将负载中的 base64 图像替换为其编码字节的摘要，避免对大段文本做规范化序列化"""
+    if isinstance(value, dict):
+        if value.get("type") == "image_url" and isinstance(value.get("image_url"), dict):
+            image_url = dict(value["image_url"])
+            url = image_url.get("url", "")
+            if url.startswith("data:"):
+                header, _, data = url.partition(",")
+                image_url["url"] = f"{header},sha256:{hashlib.sha256(data.encode('ascii')).hexdigest()}"
+            return dict(value, image_url=image_url)
+        return {k: _digest_images(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_digest_images(v) for v in value]
+    return value
+
+
+def compute_cache_key(base_url: str, payload: Dict[str, Any]) -> str:
+    """计算请求负载的内容哈希"""
+    normalized = {k: v for k, v in payload.items() if k not in _IGNORED_PAYLOAD_KEYS}
+    canonical = json.dumps(
+        {"base_url": base_url.rstrip("/"), "payload": _digest_images(normalized)},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """基于文件的响应缓存，按 TTL、条目数和磁盘占用淘汰最久未使用的条目"""
+
+    def __init__(self, cache_dir: str, **settings):
+        self.cache_dir = cache_dir
+        self.settings = dict(DEFAULT_CACHE_SETTINGS)
+        self.settings.update(settings)
+        self._lock = threading.Lock()
+        # key -> [文件大小, 最近访问时间]
+        self._index: Optional[Dict[str, list]] = None
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings.get("enabled", True))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _ensure_index(self) -> Dict[str, list]:
+        """首次访问时扫描缓存目录建立索引"""
+        if self._index is None:
+            self._index = {}
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        self._index[entry.name[:-5]] = [stat.st_size, stat.st_mtime]
+        return self._index
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存的响应文本，未命中或已过期时返回 None"""
+        with self._lock:
+            index = self._ensure_index()
+            entry = index.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                self._remove(key)
+                self._stats["misses"] += 1
+                return None
+            if time.time() - record.get("created", 0) > self.settings["ttl_seconds"]:
+                self._remove(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            # 更新访问时间，作为 LRU 淘汰依据
+            now = time.time()
+            entry[1] = now
+            try:
+                os.utime(self._path(key), (now, now))
+            except OSError:
+                pass
+            self._stats["hits"] += 1
+            return record.get("response")
+
+    def put(self, key: str, response: str):
+        """写入响应文本并执行淘汰"""
+        with self._lock:
+            index = self._ensure_index()
+            record = json.dumps({"created": time.time(), "response": response}, ensure_ascii=False)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(record)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"[ResponseCache] 写入缓存失败: {e}")
+                return
+            index[key] = [os.path.getsize(path), time.time()]
+            self._stats["stores"] += 1
+            self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的条目，直到满足条目数和磁盘占用限制"""
+        index = self._index
+        total_bytes = sum(size for size, _ in index.values())
+        if len(index) <= self.settings["max_entries"] and total_bytes <= self.settings["max_bytes"]:
+            return
+        for key, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if len(index) <= self.settings["max_entries"] and total_bytes <= self.settings["max_bytes"]:
+                break
+            self._remove(key)
+            total_bytes -= size
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for key in list(self._ensure_index().keys()):
+                self._remove(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            index = self._ensure_index()
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                hit_ratio=round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                entries=len(index),
+                bytes=sum(size for size, _ in index.values()),
+                settings=dict(self.settings),
+            )
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """获取进程级共享的响应缓存"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            cache_dir = os.path.join(_get_plugin_dir(), "cache", "llm_responses")
+            _response_cache = ResponseCache(cache_dir, **_load_cache_settings())
+        return _response_cache
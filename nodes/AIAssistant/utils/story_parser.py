@@ -0,0 +1,166 @@
+"""
+故事文本解析
+基于共享的标记分词器，将 ##名称:{内容} 格式的故事文本切分为带索引的文档对象，按文本哈希缓存
+"""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .markup import text_key, tokenize_markup
+
+_CHARACTERS_PRESENT_PATTERN = re.compile(r'"characters_present":\s*\[(.*?)\]')
+_SCENE_DESCRIPTION_PATTERN = re.compile(r'"scene_description":\s*(.*?)(?=\}|$)', re.DOTALL)
+_NARRATIVE_CN_PATTERN = re.compile(r'"narrative_cn":\s*"(.*?)"(?=\s*[,}])', re.DOTALL)
+_NARRATIVE_EN_PATTERN = re.compile(r'"narrative_en":\s*"(.*?)"(?=\s*[,}])', re.DOTALL)
+
+# 缓存的文档数量
+_DOCUMENT_CACHE_SIZE = 16
+
+
+class StoryBlock:
+    """一个 ##名称:{内容} 块，场景和故事字段在首次访问时解析并缓存"""
+
+    __slots__ = ("name", "content", "start", "_fields")
+
+    def __init__(self, name: str, content: str, start: int):
+        self.name = name
+        self.content = content
+        self.start = start
+        self._fields: Dict[str, object] = {}
+
+    @property
+    def index(self) -> int:
+        """名称中的序号，如 scene_3 -> 3；无法解析时为 0"""
+        try:
+            return int(self.name.split('_')[1])
+        except (IndexError, ValueError):
+            return 0
+
+    @property
+    def characters_present(self) -> Tuple[Optional[str], Optional[List[str]]]:
+        """返回 (characters_present 原始列表文本, 小写角色名列表)；不存在或解析失败时为 None"""
+        if "characters_present" not in self._fields:
+            chars_text, characters = None, None
+            match = _CHARACTERS_PRESENT_PATTERN.search(self.content)
+            if match:
+                chars_text = "[" + match.group(1) + "]"
+                try:
+                    characters = [name.lower() for name in json.loads(chars_text)]
+                except (ValueError, AttributeError):
+                    print(f"[StoryParser] 解析characters_present失败: {self.name}")
+            self._fields["characters_present"] = (chars_text, characters)
+        return self._fields["characters_present"]
+
+    @property
+    def scene_description(self) -> Optional[str]:
+        if "scene_description" not in self._fields:
+            match = _SCENE_DESCRIPTION_PATTERN.search(self.content)
+            self._fields["scene_description"] = match.group(1).strip() if match else None
+        return self._fields["scene_description"]
+
+    @property
+    def narrative(self) -> Tuple[Optional[str], Optional[str]]:
+        """返回 (narrative_cn, narrative_en)"""
+        if "narrative" not in self._fields:
+            story_text = self.content.strip()
+            cn_match = _NARRATIVE_CN_PATTERN.search(story_text)
+            en_match = _NARRATIVE_EN_PATTERN.search(story_text)
+            self._fields["narrative"] = (
+                cn_match.group(1).strip() if cn_match else None,
+                en_match.group(1).strip() if en_match else None,
+            )
+        return self._fields["narrative"]
+
+
+class StorySelection:
+    """按 content_type 筛选出的场景和故事索引"""
+
+    __slots__ = ("scenes", "stories", "max_scene")
+
+    def __init__(self, scenes: Dict[int, StoryBlock], stories: Dict[int, StoryBlock]):
+        self.scenes = scenes
+        self.stories = stories
+        self.max_scene = max(scenes) if scenes else 0
+
+
+class StoryDocument:
+    """解析后的故事文档，块按名称和出现顺序索引"""
+
+    def __init__(self, text: str, key: str = None):
+        self.blocks: List[StoryBlock] = []
+        self.by_name: Dict[str, StoryBlock] = {}
+        self._selections: Dict[str, StorySelection] = {}
+        self._story_info: Optional[dict] = None
+        self._lock = threading.Lock()
+
+        for token in tokenize_markup(text, key):
+            block = StoryBlock(token.name, token.content, token.start)
+            self.blocks.append(block)
+            self.by_name.setdefault(block.name, block)
+
+    def select(self, content_type: str) -> StorySelection:
+        """
+        按逗号分隔的类型（支持 * 匹配序号，如 scene_*,story_*）筛选场景和故事块
+
+        同一序号出现多次时保留先匹配到的块；结果按 content_type 缓存。
+        """
+        with self._lock:
+            selection = self._selections.get(content_type)
+            if selection is not None:
+                return selection
+
+            scenes: Dict[int, StoryBlock] = {}
+            stories: Dict[int, StoryBlock] = {}
+            for ct in (t.strip() for t in content_type.split(',')):
+                pattern = re.compile(ct.replace('*', r'\d+') if '*' in ct else ct)
+                for block in self.blocks:
+                    if not pattern.fullmatch(block.name):
+                        continue
+                    if 'scene_' in block.name:
+                        scenes.setdefault(block.index, block)
+                    elif 'story_' in block.name:
+                        stories.setdefault(block.index, block)
+
+            selection = self._selections[content_type] = StorySelection(scenes, stories)
+            return selection
+
+    @property
+    def story_info(self) -> dict:
+        """解析 ##story_info 块为字典，容忍结尾多余的逗号和换行；失败时为空字典"""
+        if self._story_info is None:
+            self._story_info = {}
+            block = self.by_name.get("story_info")
+            if block is not None:
+                json_str = "{" + block.content.strip() + "}"
+                json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
+                json_str = re.sub(r'[\n\r]+\s*', ' ', json_str)
+                try:
+                    self._story_info = json.loads(json_str)
+                except json.JSONDecodeError as je:
+                    print(f"[StoryParser] story_info JSON解析失败: {str(je)}")
+                    print(f"[StoryParser] 尝试解析的文本: {json_str[:200]}")
+        return self._story_info
+
+
+_document_cache: "OrderedDict[str, StoryDocument]" = OrderedDict()
+_document_cache_lock = threading.Lock()
+
+
+def parse_story(text: str) -> StoryDocument:
+    """解析故事文本；相同文本（按内容哈希）直接返回缓存的文档"""
+    key = text_key(text)
+    with _document_cache_lock:
+        document = _document_cache.get(key)
+        if document is not None:
+            _document_cache.move_to_end(key)
+            return document
+
+    document = StoryDocument(text, key)
+    with _document_cache_lock:
+        _document_cache[key] = document
+        while len(_document_cache) > _DOCUMENT_CACHE_SIZE:
+            _document_cache.popitem(last=False)
+    return document
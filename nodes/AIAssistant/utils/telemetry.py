@@ -0,0 +1,269 @@
+"""
+LLM/VLM 调用遥测
+记录每次 API 调用的耗时、首字节时间、收发字节数和 usage，按 base_url + 模型聚合
+"""
+
+import atexit
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from .config_manager import get_config_store
+
+# 默认遥测参数，可在 AIAssistant_config.json 的 "telemetry" 字段中覆盖
+DEFAULT_TELEMETRY_SETTINGS = {
+    "enabled": True,
+    "recent_size": 200,                         # 保留最近调用明细条数
+    "csv_path": "cache/llm_telemetry.csv",      # CSV 路径，相对路径基于插件目录
+    "dump_interval": 0,                         # 定期追加写入 CSV 的间隔（秒），0 表示不写入
+}
+
+CSV_FIELDS = [
+    "timestamp", "base_url", "model", "stream", "status", "error",
+    "wall_time", "ttfb", "ttft", "attempts", "request_bytes", "response_bytes",
+    "prompt_tokens", "completion_tokens", "total_tokens",
+]
+
+# 每个 base_url + 模型保留的耗时样本数，用于计算分位数
+_LATENCY_SAMPLES = 500
+
+
+def _get_plugin_dir() -> str:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+
+
+def _load_telemetry_settings() -> Dict[str, Any]:
+    """从插件配置文件读取遥测参数"""
+    settings = dict(DEFAULT_TELEMETRY_SETTINGS)
+    try:
+        user_settings = get_config_store().load("AIAssistant_config.json", {}).get("telemetry", {})
+        settings.update({k: v for k, v in user_settings.items() if k in DEFAULT_TELEMETRY_SETTINGS})
+    except Exception as e:
+        print(f"[Telemetry] 读取遥测配置失败，使用默认值: {e}")
+    return settings
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class CallRecorder:
+    """单次调用的计时器；metrics 交给连接池填写首字节时间和字节数"""
+
+    def __init__(self, telemetry: "Telemetry", base_url: str, payload: Dict[str, Any]):
+        self.telemetry = telemetry
+        self.base_url = base_url
+        self.model = payload.get("model", "")
+        self.stream = bool(payload.get("stream"))
+        self.metrics: Dict[str, Any] = {}
+        self._started = time.perf_counter()
+
+    def finish(self, status: Optional[int] = None, response_text: Optional[str] = None,
+               error: Optional[BaseException] = None):
+        """记录调用结果；response_text 为最终的响应 JSON，用于读取 usage"""
+        usage = {}
+        if response_text:
+            try:
+                usage = json.loads(response_text).get("usage") or {}
+            except (ValueError, AttributeError):
+                usage = {}
+        if error is None and status is not None and status >= 400:
+            error_text = f"HTTP {status}"
+        else:
+            error_text = f"{type(error).__name__}: {error}"[:200] if error is not None else ""
+
+        self.telemetry.record({
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "base_url": self.base_url,
+            "model": self.model,
+            "stream": self.stream,
+            "status": status or 0,
+            "error": error_text,
+            "wall_time": round(time.perf_counter() - self._started, 4),
+            "ttfb": round(self.metrics["ttfb"], 4) if "ttfb" in self.metrics else None,
+            "ttft": round(self.metrics["ttft"], 4) if "ttft" in self.metrics else None,
+            "attempts": self.metrics.get("attempts", 0),
+            "request_bytes": self.metrics.get("request_bytes", 0),
+            "response_bytes": self.metrics.get("response_bytes", 0),
+            "prompt_tokens": usage.get("prompt_tokens", 0) or 0,
+            "completion_tokens": usage.get("completion_tokens", 0) or 0,
+            "total_tokens": usage.get("total_tokens", 0) or 0,
+        })
+
+
+class _NullRecorder:
+    """遥测关闭时使用的空记录器"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+
+    def finish(self, status=None, response_text=None, error=None):
+        pass
+
+
+class Telemetry:
+    """进程内调用遥测聚合，可选定期追加写入 CSV"""
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_TELEMETRY_SETTINGS)
+        self.settings.update(settings)
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=int(self.settings["recent_size"]))
+        self._pending: List[Dict[str, Any]] = []
+        self._aggregates: Dict[str, Dict[str, Any]] = {}
+        self._started_at = time.time()
+        self._dump_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        if self.settings["dump_interval"] > 0:
+            self._start_dump_thread()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings.get("enabled", True))
+
+    @property
+    def csv_path(self) -> str:
+        path = self.settings["csv_path"]
+        return path if os.path.isabs(path) else os.path.join(_get_plugin_dir(), path)
+
+    def start_call(self, base_url: str, payload: Dict[str, Any]):
+        """开始记录一次调用"""
+        if not self.enabled:
+            return _NullRecorder()
+        return CallRecorder(self, base_url, payload)
+
+    def record(self, record: Dict[str, Any]):
+        key = f"{record['base_url']}|{record['model']}"
+        with self._lock:
+            self._recent.append(record)
+            if self.settings["dump_interval"] > 0:
+                self._pending.append(record)
+            agg = self._aggregates.get(key)
+            if agg is None:
+                agg = self._aggregates[key] = {
+                    "base_url": record["base_url"],
+                    "model": record["model"],
+                    "calls": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "wall_time_total": 0.0,
+                    "wall_time_max": 0.0,
+                    "ttfb_total": 0.0,
+                    "ttfb_count": 0,
+                    "request_bytes": 0,
+                    "response_bytes": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "total_tokens": 0,
+                    "latencies": deque(maxlen=_LATENCY_SAMPLES),
+                }
+            agg["calls"] += 1
+            if record["error"]:
+                agg["errors"] += 1
+            agg["retries"] += max(0, record["attempts"] - 1)
+            agg["wall_time_total"] += record["wall_time"]
+            agg["wall_time_max"] = max(agg["wall_time_max"], record["wall_time"])
+            if record["ttfb"] is not None:
+                agg["ttfb_total"] += record["ttfb"]
+                agg["ttfb_count"] += 1
+            for field in ("request_bytes", "response_bytes", "prompt_tokens", "completion_tokens", "total_tokens"):
+                agg[field] += record[field]
+            if not record["error"]:
+                agg["latencies"].append(record["wall_time"])
+
+    @staticmethod
+    def _summarize(agg: Dict[str, Any]) -> Dict[str, Any]:
+        latencies = sorted(agg["latencies"])
+        calls = agg["calls"]
+        summary = {k: v for k, v in agg.items() if k != "latencies"}
+        summary.update(
+            error_rate=round(agg["errors"] / calls, 4) if calls else 0.0,
+            avg_wall_time=round(agg["wall_time_total"] / calls, 4) if calls else 0.0,
+            p50_wall_time=round(_percentile(latencies, 0.5), 4),
+            p95_wall_time=round(_percentile(latencies, 0.95), 4),
+            avg_ttfb=round(agg["ttfb_total"] / agg["ttfb_count"], 4) if agg["ttfb_count"] else 0.0,
+            completion_tokens_per_second=(
+                round(agg["completion_tokens"] / agg["wall_time_total"], 2) if agg["wall_time_total"] else 0.0
+            ),
+            wall_time_total=round(agg["wall_time_total"], 4),
+            ttfb_total=round(agg["ttfb_total"], 4),
+        )
+        return summary
+
+    def get_stats(self, recent: int = 20) -> Dict[str, Any]:
+        """获取按 base_url + 模型聚合的统计，按总耗时降序排列"""
+        with self._lock:
+            endpoints = [self._summarize(agg) for agg in self._aggregates.values()]
+            recent_calls = list(self._recent)[-recent:] if recent > 0 else []
+        endpoints.sort(key=lambda item: item["wall_time_total"], reverse=True)
+        return {
+            "since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self._started_at)),
+            "calls": sum(item["calls"] for item in endpoints),
+            "errors": sum(item["errors"] for item in endpoints),
+            "endpoints": endpoints,
+            "recent": recent_calls,
+            "settings": dict(self.settings, csv_path=self.csv_path),
+        }
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._aggregates.clear()
+            self._recent.clear()
+            self._started_at = time.time()
+
+    def dump_csv(self) -> int:
+        """将尚未写入的调用明细追加到 CSV，返回写入条数"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        path = self.csv_path
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, 'a', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(pending)
+        except OSError as e:
+            print(f"[Telemetry] 写入 CSV 失败: {e}")
+            return 0
+        return len(pending)
+
+    def _start_dump_thread(self):
+        def loop():
+            while not self._stop_event.wait(self.settings["dump_interval"]):
+                self.dump_csv()
+
+        self._dump_thread = threading.Thread(target=loop, name="axun-telemetry-dump", daemon=True)
+        self._dump_thread.start()
+
+    def close(self):
+        """停止定期写入并写出剩余明细"""
+        self._stop_event.set()
+        if self.settings["dump_interval"] > 0:
+            self.dump_csv()
+
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> Telemetry:
+    """获取进程级共享的遥测聚合器"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry(**_load_telemetry_settings())
+            atexit.register(_telemetry.close)
+        return _telemetry
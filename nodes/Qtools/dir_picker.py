@@ -7,6 +7,7 @@ import json
 from aiohttp import web
 import server
 from folder_paths import get_input_directory
+from ...utils.feedback import send_feedback
 
 # 配置日志
 logger = logging.getLogger("axun_nodes.dir_picker")
@@ -98,15 +99,7 @@ class DirPicker:
                 save_picked_dirs()
                 
             # 发送节点更新事件
-            server.PromptServer.instance.send_sync(
-                "impact-node-feedback",
-                {
-                    "node_id": node_id,
-                    "widget_name": "directory",
-                    "type": "string",
-                    "value": folder_path
-                }
-            )
+            send_feedback(node_id, "directory", "string", folder_path)
             return web.json_response({'folder': folder_path})
         except Exception as e:
             logger.error(f"处理目录选择请求失败: {str(e)}")
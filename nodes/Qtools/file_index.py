@@ -0,0 +1,158 @@
+"""
+目录文件索引
+用途：用 os.scandir 一次性列出目录并复用 stat 结果，按 (目录, 过滤, 排序) 缓存文件列表，目录修改时间变化后重建
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("axun_nodes.file_index")
+
+# 缓存的目录扫描和文件列表数量
+_MAX_SCANS = 16
+_MAX_LISTINGS = 64
+# 目录修改时间距今不足该值（纳秒）时不缓存，避免文件系统时间精度较粗时漏掉同一秒内的变化
+_SETTLE_NS = 2 * 1_000_000_000
+
+
+class DirectoryIndex:
+    """
+    按目录缓存的文件列表
+
+    每次查询只对目录本身做一次 stat；目录内新增、删除或重命名文件会改变目录修改时间，
+    此时重新扫描。只修改已有文件内容不会触发重建，按修改时间排序时顺序保持不变。
+    文件的 stat 结果缓存在 DirEntry 上，每次扫描每个文件最多获取一次。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 目录 -> (修改时间, 文件条目)
+        self._scans: "OrderedDict[str, Tuple[int, List[os.DirEntry]]]" = OrderedDict()
+        self._listings: "OrderedDict[Tuple, Tuple[int, List[str]]]" = OrderedDict()
+        # 按分辨率分组的文件列表及各文件尺寸
+        self._buckets: "OrderedDict[Tuple, Tuple[int, List[str], Dict[str, Optional[Tuple[int, int]]]]]" = OrderedDict()
+        self._patterns: Dict[str, Optional[re.Pattern]] = {}
+
+    def _compile(self, pattern: str) -> Optional[re.Pattern]:
+        if pattern not in self._patterns:
+            try:
+                self._patterns[pattern] = re.compile(pattern)
+            except re.error as e:
+                logger.error(f"正则表达式错误: {str(e)}")
+                self._patterns[pattern] = None
+        return self._patterns[pattern]
+
+    def _scan(self, directory: str, mtime_ns: int, cacheable: bool) -> List[os.DirEntry]:
+        scan = self._scans.get(directory)
+        if scan is not None and scan[0] == mtime_ns:
+            self._scans.move_to_end(directory)
+            return scan[1]
+        with os.scandir(directory) as iterator:
+            entries = [entry for entry in iterator if entry.is_file()]
+        if cacheable:
+            self._scans[directory] = (mtime_ns, entries)
+            while len(self._scans) > _MAX_SCANS:
+                self._scans.popitem(last=False)
+        return entries
+
+    def list_files(self, directory: str, filter_type: str, filter_value: str,
+                   sort_by: str, sort_order: str, seed: int = 0) -> List[str]:
+        """
+        返回过滤并排序后的文件名列表（只包含文件，不包含子目录）
+
+        sort_order 为 random 时使用以 seed 为种子的固定排列，目录不变时每次结果相同。
+        返回的列表为缓存对象，调用方不要修改。
+        """
+        mtime_ns = os.stat(directory).st_mtime_ns
+        key = (directory, filter_type, filter_value, sort_by, sort_order, seed)
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                self._listings.move_to_end(key)
+                return cached[1]
+
+            cacheable = time.time_ns() - mtime_ns > _SETTLE_NS
+            scan = self._scan(directory, mtime_ns, cacheable)
+
+            # 过滤
+            if filter_type == "regex":
+                pattern = self._compile(filter_value)
+                entries = [e for e in scan if pattern.match(e.name)] if pattern else []
+            else:
+                entries = [e for e in scan if e.name.endswith(filter_value)]
+
+            # 排序，时间相同时按名称排序，保证各实例顺序一致
+            if sort_by == "date_modified":
+                entries.sort(key=lambda e: (e.stat().st_mtime, e.name))
+            elif sort_by == "date_created":
+                entries.sort(key=lambda e: (e.stat().st_ctime, e.name))
+            else:
+                entries.sort(key=lambda e: e.name)
+            files = [entry.name for entry in entries]
+
+            # 排序顺序
+            if sort_order == "desc":
+                files.reverse()
+            elif sort_order == "random":
+                random.Random(seed).shuffle(files)
+
+            if cacheable:
+                self._listings[key] = (mtime_ns, files)
+                while len(self._listings) > _MAX_LISTINGS:
+                    self._listings.popitem(last=False)
+            return files
+
+    def list_files_by_resolution(self, directory: str, filter_type: str, filter_value: str,
+                                 sort_by: str, sort_order: str, seed: int,
+                                 size_of: Callable[[str], Optional[Tuple[int, int]]]
+                                 ) -> Tuple[List[str], Dict[str, Optional[Tuple[int, int]]]]:
+        """
+        返回按 (宽, 高) 稳定排序的文件列表和 {文件名: 尺寸}，同一分辨率内保持 list_files 的顺序
+
+        size_of 接收文件路径，无法读取时返回 None，这些文件排在最后。结果与文件列表一样按目录修改时间缓存，
+        目录不变时重复执行不再读取每个文件的尺寸。返回的对象为缓存对象，调用方不要修改。
+        """
+        mtime_ns = os.stat(directory).st_mtime_ns
+        key = (directory, filter_type, filter_value, sort_by, sort_order, seed)
+        with self._lock:
+            cached = self._buckets.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                self._buckets.move_to_end(key)
+                return cached[1], cached[2]
+
+        # 读取文件头较慢，不持有锁
+        files = self.list_files(directory, filter_type, filter_value, sort_by, sort_order, seed)
+        sizes = {name: size_of(os.path.join(directory, name)) for name in files}
+        bucketed = sorted(files, key=lambda name: (sizes[name] is None, sizes[name] or (0, 0)))
+
+        if time.time_ns() - mtime_ns > _SETTLE_NS:
+            with self._lock:
+                self._buckets[key] = (mtime_ns, bucketed, sizes)
+                while len(self._buckets) > _MAX_LISTINGS:
+                    self._buckets.popitem(last=False)
+        return bucketed, sizes
+
+    def clear(self):
+        with self._lock:
+            self._scans.clear()
+            self._listings.clear()
+            self._buckets.clear()
+
+
+_directory_index: Optional[DirectoryIndex] = None
+_directory_index_lock = threading.Lock()
+
+
+def get_directory_index() -> DirectoryIndex:
+    """获取进程级共享的目录索引"""
+    global _directory_index
+    with _directory_index_lock:
+        if _directory_index is None:
+            _directory_index = DirectoryIndex()
+        return _directory_index
@@ -0,0 +1,208 @@
+"""
+共享目录文件分片
+用途：多个 ComfyUI 实例处理同一目录时，按固定分片或租约文件保证每个文件只被一个实例处理
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("axun_nodes.file_shard")
+
+# 分片模式
+SHARD_MODES = ["off", "static", "lease"]
+
+# 租约目录，位于被处理的目录下
+LEASE_DIR_NAME = ".axun_leases"
+LEASE_SUFFIX = ".lease"
+DONE_SUFFIX = ".done"
+
+
+def shard_files(files: List[str], worker_index: int, worker_count: int) -> List[str]:
+    """
+    固定分片：按文件名哈希分配，结果与排序方式和其他文件的增减无关
+
+    各实例使用相同的 worker_count 和不同的 worker_index 即可不重不漏地分摊文件。
+    """
+    if worker_count <= 1:
+        return files
+    worker_index %= worker_count
+    return [name for name in files if zlib.crc32(name.encode("utf-8")) % worker_count == worker_index]
+
+
+def make_worker_id(node_id: str) -> str:
+    """租约持有者标识：主机名 + 进程号 + 节点 ID"""
+    return f"{socket.gethostname()}:{os.getpid()}:{node_id}"
+
+
+class LeaseManager:
+    """
+    基于租约文件的动态分片
+
+    认领文件时以 O_EXCL 创建 <文件名>.lease，同一时刻只有一个实例能创建成功；
+    确认工作流执行成功后租约改名为 <文件名>.done，表示已处理完成（见 LeaseCompleter）。
+    超过 lease_seconds 未完成的租约视为持有者已退出，由其他实例先改名占有再重新认领。
+    """
+
+    def __init__(self, directory: str, worker_id: str, lease_seconds: float):
+        self.directory = directory
+        self.lease_dir = os.path.join(directory, LEASE_DIR_NAME)
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+
+    def _lease_path(self, name: str) -> str:
+        return os.path.join(self.lease_dir, name + LEASE_SUFFIX)
+
+    def _done_path(self, name: str) -> str:
+        return os.path.join(self.lease_dir, name + DONE_SUFFIX)
+
+    def _list_markers(self) -> Set[str]:
+        try:
+            return set(os.listdir(self.lease_dir))
+        except FileNotFoundError:
+            return set()
+
+    def _create_lease(self, name: str) -> bool:
+        try:
+            fd = os.open(self._lease_path(name), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"worker": self.worker_id, "claimed_at": time.time()}, f)
+        return True
+
+    def _read_owner(self, name: str) -> Optional[str]:
+        try:
+            with open(self._lease_path(name), "r", encoding="utf-8") as f:
+                return json.load(f).get("worker")
+        except (OSError, ValueError):
+            return None
+
+    def _reclaim_expired(self, name: str) -> bool:
+        """租约过期时改名占有后重新认领；多个实例同时尝试时只有一个改名成功"""
+        lease_path = self._lease_path(name)
+        try:
+            if time.time() - os.path.getmtime(lease_path) < self.lease_seconds:
+                return False
+            stale_path = f"{lease_path}.{uuid.uuid4().hex}.stale"
+            os.rename(lease_path, stale_path)
+        except OSError:
+            return False
+        try:
+            if time.time() - os.path.getmtime(stale_path) < self.lease_seconds:
+                # 检查与改名之间已被其他实例回收，归还其新租约
+                try:
+                    os.link(stale_path, lease_path)
+                except OSError:
+                    pass
+                os.remove(stale_path)
+                return False
+            os.remove(stale_path)
+        except OSError:
+            pass
+        logger.warning(f"回收过期租约: {name}")
+        return self._create_lease(name)
+
+    def claim_next(self, files: List[str]) -> Optional[str]:
+        """按顺序认领第一个未完成且未被占用的文件，全部处理完成时返回 None"""
+        os.makedirs(self.lease_dir, exist_ok=True)
+        markers = self._list_markers()
+        for name in files:
+            if name + DONE_SUFFIX in markers:
+                continue
+            if name + LEASE_SUFFIX in markers:
+                if self._reclaim_expired(name):
+                    return name
+                continue
+            if self._create_lease(name):
+                return name
+        return None
+
+    def complete(self, name: str) -> bool:
+        """标记文件处理完成；租约已过期并被其他实例回收时不做标记"""
+        if self._read_owner(name) != self.worker_id:
+            logger.warning(f"租约已不属于当前实例，跳过完成标记: {name}")
+            return False
+        try:
+            os.replace(self._lease_path(name), self._done_path(name))
+            return True
+        except OSError as e:
+            logger.error(f"标记完成失败 '{name}': {str(e)}")
+            return False
+
+
+# 确认工作流执行结果的轮询间隔（秒）
+COMPLETION_POLL_SECONDS = 1.0
+
+
+class LeaseCompleter:
+    """
+    按工作流执行结果完成租约
+
+    认领文件后登记执行该工作流的 prompt_id，由后台线程查询执行结果：成功时标记完成；
+    失败或被中断时保留租约，过期后由其他实例（或本实例）重新认领，保证文件不会因失败而被跳过。
+    status_of(prompt_id) 返回 "success"、"error"，尚未结束或无法查询时返回 None。
+    """
+
+    def __init__(self, status_of: Callable[[str], Optional[str]], poll_seconds: float = COMPLETION_POLL_SECONDS):
+        self._status_of = status_of
+        self._poll_seconds = poll_seconds
+        # prompt_id -> [(租约管理器, 文件名, 放弃确认的时间)]
+        self._pending: Dict[str, List[Tuple[LeaseManager, str, float]]] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, prompt_id: str, manager: LeaseManager, name: str):
+        """登记待确认的租约；超过租约时长仍无结果时放弃确认，租约随之过期"""
+        with self._condition:
+            self._pending.setdefault(prompt_id, []).append((manager, name, time.time() + manager.lease_seconds))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="axun-lease-completer", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """立即确认已结束的工作流；新的执行开始前调用，上一次执行的结果此时已经确定"""
+        with self._condition:
+            pending = list(self._pending)
+        for prompt_id in pending:
+            self._check(prompt_id)
+
+    def _check(self, prompt_id: str):
+        try:
+            status = self._status_of(prompt_id)
+        except Exception as e:
+            logger.error(f"查询工作流执行结果失败 '{prompt_id}': {str(e)}")
+            status = None
+        with self._condition:
+            leases = self._pending.get(prompt_id, [])
+            if status is None:
+                now = time.time()
+                expired = [lease for lease in leases if lease[2] <= now]
+                self._pending[prompt_id] = [lease for lease in leases if lease[2] > now]
+                for _, name, _ in expired:
+                    logger.warning(f"未能确认工作流执行结果，租约将过期: {name}")
+                if self._pending[prompt_id]:
+                    return
+            self._pending.pop(prompt_id, None)
+        if status is None:
+            return
+        for manager, name, _ in leases:
+            if status == "success":
+                manager.complete(name)
+            else:
+                logger.warning(f"工作流未成功完成，保留租约等待过期后重新处理: {name}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            time.sleep(self._poll_seconds)
+            self.flush()
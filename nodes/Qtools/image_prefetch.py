@@ -0,0 +1,285 @@
+"""
+图像预读取
+用途：一次解码同时得到图像和 mask，并在工作流运行期间用线程池提前解码接下来的文件
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import torch
+from PIL import Image, ImageOps
+
+logger = logging.getLogger("axun_nodes.image_prefetch")
+
+# 默认参数
+PREFETCH_WORKERS = 2                    # 解码线程数
+PREFETCH_MAX_ENTRIES = 16               # 最多缓存的已解码文件数
+PREFETCH_MAX_BYTES = 1024 * 1024 * 1024 # 已解码像素的最大内存占用
+IMAGE_SIZE_CACHE_ENTRIES = 65536        # 缓存的图像尺寸数量
+
+# 交换宽高的 EXIF 方向值（旋转 90/270 度）
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+# 输出精度
+TENSOR_DTYPES = {"fp32": torch.float32, "fp16": torch.float16}
+# 非 float32 输出时每块转换的元素数
+_CONVERT_CHUNK_ELEMENTS = 4 * 1024 * 1024
+
+# 可直接读取的未压缩像素布局：(PIL 模式, rawmode) -> (每像素字节数, RGB 通道切片, 透明通道下标)
+_RAW_LAYOUTS = {
+    ("RGB", "RGB"): (3, slice(0, 3), None),
+    ("RGB", "RGBX"): (4, slice(0, 3), None),
+    ("RGB", "BGR"): (3, slice(2, None, -1), None),
+    ("RGB", "BGRX"): (4, slice(2, None, -1), None),
+    ("RGBA", "RGBA"): (4, slice(0, 3), 3),
+    ("RGBA", "BGRA"): (4, slice(2, None, -1), 3),
+    ("L", "L"): (1, None, None),
+}
+
+
+class DecodedImage(NamedTuple):
+    """
+    解码后的 uint8 像素；缓存 uint8 而不是 float32，占用只有四分之一
+
+    未压缩格式的像素为整块读入内存的原始数据上的视图（可能带负步长或广播），只能作为复制的来源。
+    """
+    rgb: np.ndarray                 # [H, W, 3]
+    alpha: Optional[np.ndarray]     # [H, W]，无透明通道时为 None
+
+    @property
+    def nbytes(self) -> int:
+        return self.rgb.nbytes + (self.alpha.nbytes if self.alpha is not None else 0)
+
+
+def _read_uncompressed(i: Image.Image, file_path: str) -> Optional[DecodedImage]:
+    """
+    BMP/PPM/TGA/未压缩 TIFF 等单块原始像素一次读入内存，不经过 PIL 解码和中间数组
+
+    不使用内存映射：缓存中的映射会让源文件一直处于打开状态，Windows 上无法移动或删除。
+    布局不在 _RAW_LAYOUTS 中或需要 EXIF 旋转时返回 None，由 PIL 正常解码。
+    """
+    if len(i.tile) != 1:
+        return None
+    codec, extents, offset, args = i.tile[0]
+    width, height = i.size
+    if codec != "raw" or tuple(extents) != (0, 0, width, height):
+        return None
+    rawmode, stride, orientation = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+    layout = _RAW_LAYOUTS.get((i.mode, rawmode))
+    if layout is None or orientation not in (1, -1) or i.getexif().get(0x0112, 1) != 1:
+        return None
+    channels, rgb_slice, alpha_index = layout
+    stride = stride or width * channels
+    if stride < width * channels or offset + stride * height > os.path.getsize(file_path):
+        return None
+
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        raw = np.fromfile(f, dtype=np.uint8, count=stride * height)
+    if raw.size != stride * height:
+        return None
+    pixels = np.ndarray((height, width, channels), dtype=np.uint8, buffer=raw, strides=(stride, channels, 1))
+    if orientation == -1:
+        pixels = pixels[::-1]
+    if rgb_slice is None:
+        # 灰度图按通道广播，与 convert("RGB") 结果相同
+        rgb = np.broadcast_to(pixels, (height, width, 3))
+    else:
+        rgb = pixels[..., rgb_slice]
+    alpha = pixels[..., alpha_index] if alpha_index is not None else None
+    return DecodedImage(rgb, alpha)
+
+
+def decode_file(file_path: str) -> DecodedImage:
+    """打开并解码一次，同时取出 RGB 和透明通道；未压缩格式直接读取原始像素"""
+    with Image.open(file_path) as i:
+        raw = _read_uncompressed(i, file_path)
+        if raw is not None:
+            return raw
+        # exif_transpose 在无需旋转时也会复制整张图，只在需要时调用
+        if i.getexif().get(0x0112, 1) != 1:
+            i = ImageOps.exif_transpose(i)
+        alpha = np.asarray(i.getchannel('A')) if 'A' in i.getbands() else None
+        rgb = np.asarray(i if i.mode == "RGB" else i.convert("RGB"))
+    return DecodedImage(rgb, alpha)
+
+
+def _fill_unit(out: torch.Tensor, pixels: np.ndarray) -> torch.Tensor:
+    """
+    uint8 像素一次转换写入预分配的 out，再原地除以 255
+
+    float32 直接转换；其他精度在 CPU 上直接运算较慢，按行分块经 float32 小缓冲区计算后写入，
+    结果与先算 float32 再转换相同。
+    """
+    if out.dtype == torch.float32:
+        np.copyto(out.numpy(), pixels, casting="unsafe")
+        return out.div_(255.0)
+    rows = max(1, _CONVERT_CHUNK_ELEMENTS // max(1, out[0].numel()))
+    buffer = torch.empty((min(rows, out.shape[0]),) + tuple(out.shape[1:]), dtype=torch.float32)
+    for start in range(0, out.shape[0], rows):
+        chunk = buffer[:min(rows, out.shape[0] - start)]
+        np.copyto(chunk.numpy(), pixels[start:start + chunk.shape[0]], casting="unsafe")
+        out[start:start + chunk.shape[0]].copy_(chunk.div_(255.0))
+    return out
+
+
+def _fill_mask(out: torch.Tensor, alpha: Optional[np.ndarray]) -> torch.Tensor:
+    """mask 为 1 - alpha / 255，没有透明通道时为全零"""
+    if alpha is None:
+        return out.zero_()
+    return _fill_unit(out, alpha).neg_().add_(1.0)
+
+
+def to_tensors(decoded: DecodedImage, dtype: torch.dtype = torch.float32) -> Tuple[torch.Tensor, torch.Tensor]:
+    """转换为 ComfyUI 的 IMAGE [1, H, W, 3] 和 MASK [H, W]"""
+    height, width = decoded.rgb.shape[:2]
+    image = torch.empty((1, height, width, 3), dtype=dtype)
+    _fill_unit(image[0], decoded.rgb)
+    if decoded.alpha is not None:
+        mask = _fill_mask(torch.empty((height, width), dtype=dtype), decoded.alpha)
+    else:
+        mask = torch.zeros((64, 64), dtype=dtype, device="cpu")
+    return image, mask
+
+
+def stack_tensors(decoded_images: List[DecodedImage], dtype: torch.dtype = torch.float32) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    将尺寸相同的多张图像直接写入预分配的 IMAGE [K, H, W, 3] 和 MASK [K, H, W]
+
+    全部没有透明通道时 mask 与单张加载一致为 64x64 全零；部分有透明通道时，
+    没有透明通道的图像使用与图像同尺寸的全零 mask，保证可以合并。
+    """
+    height, width = decoded_images[0].rgb.shape[:2]
+    images = torch.empty((len(decoded_images), height, width, 3), dtype=dtype)
+    for index, decoded in enumerate(decoded_images):
+        _fill_unit(images[index], decoded.rgb)
+    if all(decoded.alpha is None for decoded in decoded_images):
+        masks = torch.zeros((len(decoded_images), 64, 64), dtype=dtype, device="cpu")
+    else:
+        masks = torch.empty((len(decoded_images), height, width), dtype=dtype)
+        for index, decoded in enumerate(decoded_images):
+            _fill_mask(masks[index], decoded.alpha)
+    return images, masks
+
+
+def _file_key(file_path: str) -> Tuple[str, int, int]:
+    """文件路径加修改时间和大小，文件被替换后不会命中旧的解码结果"""
+    stat = os.stat(file_path)
+    return (file_path, stat.st_mtime_ns, stat.st_size)
+
+
+_image_sizes: "OrderedDict[Tuple[str, int, int], Tuple[int, int]]" = OrderedDict()
+_image_sizes_lock = threading.Lock()
+
+
+def _oriented_size(i: Image.Image) -> Tuple[int, int]:
+    """
+    decode_file 解码结果的 (宽, 高)，不解码像素
+
+    TIFF 插件打开文件时已按方向标签交换了 size（加载时再旋转像素），此时 size 与文件头中的
+    原始宽高（标签 256/257）不同，不能再交换一次；其他格式的 size 为旋转前的尺寸。
+    """
+    width, height = i.size
+    if i.getexif().get(0x0112) not in _TRANSPOSED_ORIENTATIONS:
+        return width, height
+    tags = getattr(i, "tag_v2", None)
+    if tags is not None and (tags.get(256), tags.get(257)) == (height, width):
+        return width, height
+    return height, width
+
+
+def image_size(file_path: str) -> Tuple[int, int]:
+    """
+    读取文件头得到 exif_transpose 之后的 (宽, 高)，不解码像素
+
+    结果按文件路径、修改时间和大小缓存，批量模式按尺寸分组时每个文件只读取一次。
+    """
+    key = _file_key(file_path)
+    with _image_sizes_lock:
+        size = _image_sizes.get(key)
+        if size is not None:
+            _image_sizes.move_to_end(key)
+            return size
+    with Image.open(file_path) as i:
+        width, height = _oriented_size(i)
+    with _image_sizes_lock:
+        _image_sizes[key] = (width, height)
+        while len(_image_sizes) > IMAGE_SIZE_CACHE_ENTRIES:
+            _image_sizes.popitem(last=False)
+    return width, height
+
+
+class ImagePrefetcher:
+    """
+    后台解码队列
+
+    prefetch 提交接下来要用的文件，get 取出结果（尚未完成时等待，未提交时同步解码）。
+    缓存按条目数和像素占用限制，超出时丢弃最早提交的结果，未开始的解码任务会被取消。
+    """
+
+    def __init__(self, workers: int = PREFETCH_WORKERS, max_entries: int = PREFETCH_MAX_ENTRIES,
+                 max_bytes: int = PREFETCH_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="axun-prefetch")
+        self._lock = threading.Lock()
+        self._futures: "OrderedDict[Tuple[str, int, int], Future]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "submitted": 0, "evicted": 0}
+
+    def _cached_bytes(self) -> int:
+        return sum(
+            future.result().nbytes for future in self._futures.values()
+            if future.done() and not future.cancelled() and future.exception() is None
+        )
+
+    def _evict(self):
+        while self._futures and (len(self._futures) > self.max_entries or self._cached_bytes() > self.max_bytes):
+            _, future = self._futures.popitem(last=False)
+            future.cancel()
+            self.stats["evicted"] += 1
+
+    def prefetch(self, file_paths: Iterable[str]):
+        """提交后台解码"""
+        with self._lock:
+            for file_path in file_paths:
+                try:
+                    key = _file_key(file_path)
+                except OSError:
+                    continue
+                if key in self._futures:
+                    continue
+                self._futures[key] = self._executor.submit(decode_file, file_path)
+                self.stats["submitted"] += 1
+            self._evict()
+
+    def get(self, file_path: str) -> DecodedImage:
+        """取出解码结果；解码失败时抛出原始异常"""
+        key = _file_key(file_path)
+        with self._lock:
+            future = self._futures.pop(key, None)
+            if future is not None and future.cancel():
+                future = None
+        if future is None:
+            self.stats["misses"] += 1
+            return decode_file(file_path)
+        self.stats["hits"] += 1
+        return future.result()
+
+
+_prefetcher: Optional[ImagePrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_image_prefetcher() -> ImagePrefetcher:
+    """获取进程级共享的预读取器"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = ImagePrefetcher()
+        return _prefetcher
@@ -1,18 +1,40 @@
 import os
 import torch
-import numpy as np
-from PIL import Image, ImageOps
-import re
-import random
 import logging
+import threading
 from server import PromptServer
 from aiohttp import web
+from ...utils.feedback import send_feedback
+from ...utils.state_store import get_node_state, node_state_key, workflow_id_of
+from .file_index import get_directory_index
+from .file_shard import SHARD_MODES, LeaseCompleter, LeaseManager, make_worker_id, shard_files
+from .image_prefetch import TENSOR_DTYPES, get_image_prefetcher, image_size, stack_tensors, to_tensors
 
 # 配置日志
 logger = logging.getLogger("axun_nodes.path_processor")
 
-# 全局变量
-loop_indexes = {}
+# 各节点的循环索引，重启后保留
+loop_indexes = get_node_state("loop_indexes", value_types=(int,))
+
+# 批量模式的分组方式
+BATCH_MODES = ["same_size", "resolution_bucket"]
+
+_lease_completer = None
+_lease_completer_lock = threading.Lock()
+
+def _prompt_status(prompt_id):
+    """从 ComfyUI 执行历史读取工作流结果：success / error，尚未结束时为 None"""
+    history = PromptServer.instance.prompt_queue.get_history(prompt_id=prompt_id)
+    status = history.get(prompt_id, {}).get("status") or {}
+    return status.get("status_str")
+
+def get_lease_completer():
+    """获取进程级共享的租约完成器"""
+    global _lease_completer
+    with _lease_completer_lock:
+        if _lease_completer is None:
+            _lease_completer = LeaseCompleter(_prompt_status)
+        return _lease_completer
 
 class PathProcessor:
     """
@@ -22,8 +44,9 @@ class PathProcessor:
     2. 文件过滤（扩展名/正则表达式）
     3. 文件排序（名称/修改时间/创建时间）
     4. 自动索引管理
+    5. 多实例分片（固定分片/租约文件）
     """
-    
+
     @classmethod
     def INPUT_TYPES(cls):
         return {
@@ -39,9 +62,19 @@ class PathProcessor:
                 "single_mask": ("MASK",),
                 "loop_index": ("INT", {"default": 0, "min": 0, "max": 999999, "step": 1}),
             },
+            "optional": {
+                "random_seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffff, "step": 1}),
+                "prefetch_count": ("INT", {"default": 2, "min": 0, "max": 16, "step": 1}),
+                "shard_mode": (SHARD_MODES, {"default": "off"}),
+                "worker_index": ("INT", {"default": 0, "min": 0, "max": 1024, "step": 1}),
+                "worker_count": ("INT", {"default": 1, "min": 1, "max": 1024, "step": 1}),
+                "lease_seconds": ("INT", {"default": 1800, "min": 10, "max": 7 * 24 * 3600, "step": 10}),
+                "precision": (list(TENSOR_DTYPES), {"default": "fp32"}),
+            },
             "hidden": {
                 "prompt": "PROMPT",
                 "id": "UNIQUE_ID",
+                "extra_pnginfo": "EXTRA_PNGINFO",
             }
         }
 
@@ -51,7 +84,16 @@ class PathProcessor:
     CATEGORY = "!Axun Nodes/Queue Tools"
     OUTPUT_NODE = True
 
-    def process_path(self, load_path, save_path, filter_type, filter_value, sort_by, sort_order, path_mode, single_image, single_mask, loop_index, prompt, id):
+    @classmethod
+    def IS_CHANGED(cls, shard_mode="off", **kwargs):
+        # 租约模式每次执行都要认领新文件，不能使用缓存结果
+        return float("nan") if shard_mode == "lease" else ""
+
+    def process_path(self, load_path, save_path, filter_type, filter_value, sort_by, sort_order, path_mode, single_image, single_mask, loop_index, prompt, id,
+                     random_seed=0, prefetch_count=2, shard_mode="off", worker_index=0, worker_count=1, lease_seconds=1800,
+                     precision="fp32", extra_pnginfo=None):
+        # 循环索引按工作流区分，避免不同工作流的同号节点共用索引
+        state_key = node_state_key(id, workflow_id_of(extra_pnginfo))
         try:
             # 单文件模式直接返回
             if not path_mode:
@@ -63,17 +105,27 @@ class PathProcessor:
                 return (0, 0, "", "", torch.zeros((1, 3, 64, 64)), torch.zeros((64, 64)))
 
             # 获取匹配文件
-            matched_files = self._filter_files(load_path, filter_type, filter_value, sort_by, sort_order)
+            matched_files = self._filter_files(load_path, filter_type, filter_value, sort_by, sort_order, random_seed)
+            # 固定分片：只处理分配给当前实例的文件，索引在分片内循环
+            if shard_mode == "static":
+                matched_files = shard_files(matched_files, worker_index, worker_count)
             file_count = len(matched_files)
             
             if file_count == 0:
-                loop_indexes[id] = 0
+                loop_indexes[state_key] = 0
                 self._update_index(id, 0)
                 logger.warning(f"在目录中未找到文件: {load_path}")
                 return (0, 0, "", "", torch.zeros((1, 3, 64, 64)), torch.zeros((64, 64)))
             
-            # 获取当前索引，优先使用手动设置的值
-            current_index = loop_index if loop_index is not None else loop_indexes.get(id, 0)
+            if shard_mode == "lease":
+                # 租约模式：认领下一个未被其他实例处理的文件，不使用循环索引
+                current_index = self._claim_next(load_path, matched_files, id, lease_seconds)
+                if current_index is None:
+                    logger.info(f"目录中的文件已全部处理完成: {load_path}")
+                    return (file_count, 0, "", "", torch.zeros((1, 3, 64, 64)), torch.zeros((64, 64)))
+            else:
+                # 获取当前索引，优先使用手动设置的值
+                current_index = loop_index if loop_index is not None else loop_indexes.get(state_key, 0)
             
             # 确保索引在有效范围内并获取当前文件
             current_index = current_index % file_count
@@ -85,20 +137,26 @@ class PathProcessor:
             current_dir = os.path.basename(load_path)
             batch_directory = f"{save_path}/{current_dir}"
             
+            # 在后台解码接下来的文件，下一次执行时直接取用
+            if prefetch_count > 0 and file_count > 1:
+                upcoming = (matched_files[(current_index + k) % file_count]
+                            for k in range(1, min(prefetch_count, file_count - 1) + 1))
+                get_image_prefetcher().prefetch(os.path.join(load_path, name) for name in upcoming)
+            
             # 加载图像和mask
-            image = self._load_image(current_file_path)
+            image, mask = self._load_image_and_mask(current_file_path, TENSOR_DTYPES.get(precision, torch.float32))
             if image is None:
                 logger.error(f"图像加载失败: {current_file_path}")
                 return (0, 0, "", "", torch.zeros((1, 3, 64, 64)), torch.zeros((64, 64)))
             
-            mask = self._load_mask(current_file_path)
-            
             # 准备输出并更新下一个索引
             output = (file_count, current_index, batch_file, batch_directory, image, mask)
+            if shard_mode == "lease":
+                return output
             next_index = (current_index + 1) % file_count
             
             # 更新全局状态和前端显示
-            loop_indexes[id] = next_index
+            loop_indexes[state_key] = next_index
             self._update_index(id, next_index)
             
             return output
@@ -107,92 +165,202 @@ class PathProcessor:
             logger.error(f"路径处理失败: {str(e)}")
             return (0, 0, "", "", torch.zeros((1, 3, 64, 64)), torch.zeros((64, 64)))
 
-    def _filter_files(self, directory, filter_type, filter_value, sort_by, sort_order):
+    def _claim_next(self, load_path, matched_files, node_id, lease_seconds):
+        """认领下一个文件，返回其在文件列表中的索引；没有可认领的文件时返回 None"""
+        # 上一次执行已经结束，先按其结果完成租约
+        completer = get_lease_completer()
+        completer.flush()
+        manager = LeaseManager(load_path, make_worker_id(node_id), lease_seconds)
+        claimed = manager.claim_next(matched_files)
+        if claimed is None:
+            return None
+        # 工作流执行成功后才标记完成，失败或中断时租约过期后重新处理
+        prompt_id = getattr(PromptServer.instance, "last_prompt_id", None)
+        if prompt_id:
+            completer.register(prompt_id, manager, claimed)
+        else:
+            logger.warning(f"无法获取当前工作流 ID，租约将在过期后重新处理: {claimed}")
+        logger.info(f"认领文件: {claimed}")
+        return matched_files.index(claimed)
+
+    def _filter_files(self, directory, filter_type, filter_value, sort_by, sort_order, seed=0):
         try:
-            files = os.listdir(directory)
-            matched_files = []
-            
-            # 排序
-            if sort_by == "name":
-                files.sort()
-            elif sort_by == "date_modified":
-                files.sort(key=lambda x: os.path.getmtime(os.path.join(directory, x)))
-            elif sort_by == "date_created":
-                files.sort(key=lambda x: os.path.getctime(os.path.join(directory, x)))
-            
-            # 排序顺序
-            if sort_order == "desc":
-                files.reverse()
-            elif sort_order == "random":
-                random.shuffle(files)
-            
-            # 过滤
-            for file in files:
-                try:
-                    if filter_type == "regex" and re.match(filter_value, file):
-                        matched_files.append(file)
-                    elif filter_type == "extension" and file.endswith(filter_value):
-                        matched_files.append(file)
-                except re.error as e:
-                    logger.error(f"正则表达式错误: {str(e)}")
-                    continue
-                    
-            return matched_files
-            
+            # 目录索引按目录修改时间缓存，重复执行时不再重新列目录和排序
+            return get_directory_index().list_files(directory, filter_type, filter_value, sort_by, sort_order, seed)
         except Exception as e:
             logger.error(f"文件过滤失败: {str(e)}")
             return []
 
-    def _load_image(self, file_path):
+    def _load_image_and_mask(self, file_path, dtype=torch.float32):
+        """一次解码得到图像和mask，优先使用预读取的结果"""
         try:
-            i = Image.open(file_path)
-            i = ImageOps.exif_transpose(i)
-            image = i.convert("RGB")
-            image = np.array(image).astype(np.float32) / 255.0
-            return torch.from_numpy(image)[None,]
+            return to_tensors(get_image_prefetcher().get(file_path), dtype)
         except Exception as e:
             logger.error(f"图像加载失败 '{file_path}': {str(e)}")
-            return None
+            return None, None
 
-    def _load_mask(self, file_path):
+    def _update_index(self, node_id: str, index: int):
+        """更新前端显示的索引值"""
         try:
-            i = Image.open(file_path)
-            i = ImageOps.exif_transpose(i)
-            if 'A' in i.getbands():
-                mask = np.array(i.getchannel('A')).astype(np.float32) / 255.0
-                mask = 1. - torch.from_numpy(mask)
+            send_feedback(node_id, "loop_index", "int", index)
+        except Exception as e:
+            logger.error(f"更新索引失败: {str(e)}")
+
+class PathBatchProcessor(PathProcessor):
+    """
+    批量路径处理节点
+    功能：
+    1. 每次从当前索引开始加载最多 batch_size 个尺寸相同的文件，合并为 [K, H, W, C] 图像
+    2. same_size: 按原有顺序取连续的同尺寸文件，遇到尺寸不同的文件时提前结束本批
+    3. resolution_bucket: 先按分辨率对文件列表做稳定排序，同尺寸文件相邻，批次尽量填满
+    4. 文件名按批次顺序以换行连接为一个字符串输出，不使用列表输出，下游节点不会被逐项执行
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "load_path": ("STRING", {"forceInput": True, "default": ""}),
+                "save_path": ("STRING", {"forceInput": True, "default": ""}),
+                "filter_type": (["regex", "extension"], {"default": "extension"}),
+                "filter_value": ("STRING", {"default": ""}),
+                "sort_by": (["name", "date_modified", "date_created"], {"default": "name"}),
+                "sort_order": (["asc", "desc", "random"], {"default": "asc"}),
+                "batch_size": ("INT", {"default": 4, "min": 1, "max": 64, "step": 1}),
+                "batch_mode": (BATCH_MODES, {"default": "same_size"}),
+                "loop_index": ("INT", {"default": 0, "min": 0, "max": 999999, "step": 1}),
+            },
+            "optional": {
+                "random_seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffff, "step": 1}),
+                "prefetch_count": ("INT", {"default": 1, "min": 0, "max": 4, "step": 1}),
+                # 租约按单个文件认领，批量节点只支持固定分片
+                "shard_mode": (["off", "static"], {"default": "off"}),
+                "worker_index": ("INT", {"default": 0, "min": 0, "max": 1024, "step": 1}),
+                "worker_count": ("INT", {"default": 1, "min": 1, "max": 1024, "step": 1}),
+                "precision": (list(TENSOR_DTYPES), {"default": "fp32"}),
+            },
+            "hidden": {
+                "prompt": "PROMPT",
+                "id": "UNIQUE_ID",
+                "extra_pnginfo": "EXTRA_PNGINFO",
+            }
+        }
+
+    RETURN_TYPES = ("INT", "INT", "STRING", "STRING", "IMAGE", "MASK", "INT")
+    RETURN_NAMES = ("file_count", "current_index", "filename", "filepath", "image", "mask", "batch_count")
+    FUNCTION = "process_batch"
+
+    def process_batch(self, load_path, save_path, filter_type, filter_value, sort_by, sort_order, batch_size, batch_mode, loop_index, prompt, id,
+                      random_seed=0, prefetch_count=1, shard_mode="off", worker_index=0, worker_count=1, precision="fp32",
+                      extra_pnginfo=None):
+        state_key = node_state_key(id, workflow_id_of(extra_pnginfo))
+        empty = (0, 0, "", "", torch.zeros((1, 64, 64, 3)), torch.zeros((1, 64, 64)), 0)
+        try:
+            if not load_path or not save_path:
+                logger.error("路径不能为空")
+                return empty
+
+            if batch_mode == "resolution_bucket":
+                # 分组结果和文件尺寸缓存在目录索引中；分片按文件名分配，先分组后分片结果相同
+                matched_files, sizes = self._bucket_by_resolution(load_path, filter_type, filter_value, sort_by, sort_order, random_seed)
             else:
-                mask = torch.zeros((64, 64), dtype=torch.float32, device="cpu")
-            return mask
+                matched_files, sizes = self._filter_files(load_path, filter_type, filter_value, sort_by, sort_order, random_seed), {}
+            if shard_mode == "static":
+                matched_files = shard_files(matched_files, worker_index, worker_count)
+            file_count = len(matched_files)
+
+            if file_count == 0:
+                loop_indexes[state_key] = 0
+                self._update_index(id, 0)
+                logger.warning(f"在目录中未找到文件: {load_path}")
+                return empty
+
+            current_index = loop_index if loop_index is not None else loop_indexes.get(state_key, 0)
+            current_index = current_index % file_count
+            batch_files = self._collect_batch(load_path, matched_files, current_index, batch_size, sizes)
+            end_index = current_index + len(batch_files)
+
+            # 当前批次交给解码线程并行解码，同时预读取后续批次；总数不超过预读取缓存容量
+            prefetcher = get_image_prefetcher()
+            upcoming_count = min(prefetch_count * batch_size, file_count - len(batch_files),
+                                 max(prefetcher.max_entries - len(batch_files), 0))
+            upcoming = [matched_files[(end_index + k) % file_count] for k in range(upcoming_count)]
+            prefetcher.prefetch(os.path.join(load_path, name) for name in batch_files + upcoming)
+
+            decoded_images = []
+            for name in batch_files:
+                file_path = os.path.join(load_path, name)
+                try:
+                    decoded_images.append(prefetcher.get(file_path))
+                except Exception as e:
+                    logger.error(f"图像加载失败 '{file_path}': {str(e)}")
+                    return empty
+            # 缓存的尺寸在文件被原地替换后可能过期，以解码结果为准，本批在第一个尺寸不同的文件处结束
+            first_shape = decoded_images[0].rgb.shape
+            for k, decoded in enumerate(decoded_images):
+                if decoded.rgb.shape != first_shape:
+                    decoded_images, batch_files = decoded_images[:k], batch_files[:k]
+                    end_index = current_index + k
+                    break
+            images, masks = stack_tensors(decoded_images, TENSOR_DTYPES.get(precision, torch.float32))
+
+            batch_directory = f"{save_path}/{os.path.basename(load_path)}"
+            filenames = "\n".join(os.path.splitext(name)[0] for name in batch_files)
+
+            next_index = end_index % file_count
+            loop_indexes[state_key] = next_index
+            self._update_index(id, next_index)
+
+            return (file_count, current_index, filenames, batch_directory, images, masks, len(batch_files))
+
         except Exception as e:
-            logger.error(f"Mask加载失败 '{file_path}': {str(e)}")
-            return torch.zeros((64, 64), dtype=torch.float32, device="cpu")
+            logger.error(f"批量路径处理失败: {str(e)}")
+            return empty
 
-    def _update_index(self, node_id: str, index: int):
-        """更新前端显示的索引值"""
+    def _collect_batch(self, load_path, matched_files, start, batch_size, sizes=None):
+        """从 start 开始取最多 batch_size 个与第一个文件尺寸相同的连续文件，不跨过列表末尾；sizes 为已知的文件尺寸"""
+        def size_of(name):
+            if sizes and name in sizes:
+                return sizes[name]
+            return self._safe_size(os.path.join(load_path, name))
+
+        batch = [matched_files[start]]
+        if batch_size <= 1:
+            return batch
+        first_size = size_of(batch[0])
+        for name in matched_files[start + 1:start + batch_size]:
+            size = size_of(name)
+            if size is None or size != first_size:
+                break
+            batch.append(name)
+        return batch
+
+    def _bucket_by_resolution(self, directory, filter_type, filter_value, sort_by, sort_order, seed=0):
+        """按 (宽, 高) 稳定排序的文件列表和各文件尺寸，目录不变时直接使用目录索引中的缓存"""
         try:
-            PromptServer.instance.send_sync(
-                "impact-node-feedback",
-                {
-                    "node_id": node_id,
-                    "widget_name": "loop_index",
-                    "type": "int",
-                    "value": index
-                }
-            )
+            return get_directory_index().list_files_by_resolution(
+                directory, filter_type, filter_value, sort_by, sort_order, seed, self._safe_size)
         except Exception as e:
-            logger.error(f"更新索引失败: {str(e)}")
+            logger.error(f"文件过滤失败: {str(e)}")
+            return [], {}
+
+    def _safe_size(self, file_path):
+        try:
+            return image_size(file_path)
+        except Exception as e:
+            logger.error(f"读取图像尺寸失败 '{file_path}': {str(e)}")
+            return None
 
 # API路由
 @PromptServer.instance.routes.get("/axun-dir/loop-index")
 async def get_loop_index(request):
-    node_id = request.rel_url.query.get('id', '')
-    current_index = loop_indexes.get(node_id, 0)
+    key = node_state_key(request.rel_url.query.get('id', ''), request.rel_url.query.get('workflow', ''))
+    current_index = loop_indexes.get(key, 0)
     return web.json_response({'loop_index': current_index})
 
 @PromptServer.instance.routes.get("/axun-dir/set-loop-index")
 async def set_loop_index(request):
-    node_id = request.rel_url.query.get('id', '')
+    key = node_state_key(request.rel_url.query.get('id', ''), request.rel_url.query.get('workflow', ''))
     index = int(request.rel_url.query.get('index', 0))
-    loop_indexes[node_id] = index
+    loop_indexes[key] = index
     return web.json_response({'success': True}) 
\ No newline at end of file
@@ -1,7 +1,7 @@
 from typing import Tuple, Dict, Any
 import logging
 import time
-from server import PromptServer
+from ...utils.feedback import send_event, send_feedback
 
 # 配置日志
 logger = logging.getLogger("axun_nodes.queue_trigger")
@@ -123,21 +123,14 @@ class ImpactQueueTriggerCountdown:
     def _update_count(self, node_id: str, count: int):
         """更新计数器"""
         try:
-            PromptServer.instance.send_sync(
-                "impact-node-feedback",
-                {
-                    "node_id": node_id,
-                    "widget_name": "count",
-                    "type": "int",
-                    "value": count
-                }
-            )
+            send_feedback(node_id, "count", "int", count)
         except Exception as e:
             logger.error(f"更新计数失败: {str(e)}")
 
     def _add_to_queue(self):
         """添加任务到队列"""
         try:
-            PromptServer.instance.send_sync("impact-add-queue", {})
+            # 先发送计数更新，前端按更新后的控件值提交新任务
+            send_event("impact-add-queue", {})
         except Exception as e:
             logger.error(f"添加队列失败: {str(e)}") 
\ No newline at end of file
@@ -3,17 +3,18 @@ Auto Translator Box Node for ComfyUI
 提供自动翻译功能的文本框节点
 """
 
-import os
-import json
-import re
-import asyncio
 from typing import Dict, Any
 from server import PromptServer
 from aiohttp import web
-from .utils.translator_utils import handle_translate_text, is_chinese, translate_with_baidu, load_translator_config
+from .utils.translator_utils import get_translation_backend, translate_text_auto, load_translator_config
+from .utils.backends import TRANSLATION_BACKENDS
+from .utils.language_detect import detect_paragraph_languages
+from .utils.async_runtime import get_translator_runtime
+from ...utils.feedback import send_feedback
+from ...utils.state_store import get_node_state, node_state_key, workflow_id_of
 
-# 存储节点实例的翻译文本
-translated_texts = {}
+# 存储节点实例的翻译文本，重启后保留
+translated_texts = get_node_state("translated_texts", value_types=(str,))
 
 @PromptServer.instance.routes.get("/axun-translator/get-translation")
 async def get_translation(request):
@@ -21,7 +22,8 @@ async def get_translation(request):
     node_id = request.query.get("id")
     if not node_id:
         return web.Response(status=400)
-    return web.json_response({"translated_text": translated_texts.get(node_id, "")})
+    key = node_state_key(node_id, request.query.get("workflow", ""))
+    return web.json_response({"translated_text": translated_texts.get(key, "")})
 
 class AutoTranslatorBox:
     """自动翻译文本框节点"""
@@ -37,8 +39,12 @@ class AutoTranslatorBox:
                 "text": ("STRING", {"multiline": True, "default": ""}),
                 "translated": ("STRING", {"multiline": True, "default": "翻译结果将显示在这里...", "readonly": True}),
             },
+            "optional": {
+                "backend": (["default"] + TRANSLATION_BACKENDS, {"default": "default"}),
+            },
             "hidden": {
                 "unique_id": "UNIQUE_ID",
+                "extra_pnginfo": "EXTRA_PNGINFO",
             }
         }
     
@@ -48,21 +54,24 @@ class AutoTranslatorBox:
     CATEGORY = "!Axun Nodes/Translator"
     OUTPUT_NODE = True
     
-    async def _translate_text(self, text: str, appid: str, key: str, from_lang: str, to_lang: str) -> str:
-        """异步执行翻译"""
+    async def _translate_text(self, text: str, backend, config=None) -> str:
+        """异步执行翻译，按段落确定翻译方向"""
         try:
-            return await translate_with_baidu(text, appid, key, from_lang, to_lang)
+            return await translate_text_auto(text, backend, config)
         except Exception as e:
             print(f"[AutoTranslatorBox] 翻译失败: {e}")
             return ""
     
-    def process_text(self, text: str, translated: str, unique_id: str) -> tuple[str]:
+    def process_text(self, text: str, translated: str, unique_id: str, backend: str = "default",
+                     extra_pnginfo=None) -> tuple[str]:
         """
         处理输入文本并自动翻译
         Args:
             text: 输入的文本
             translated: 翻译结果显示区域（只读）
             unique_id: 节点唯一标识
+            extra_pnginfo: 工作流信息，用于按工作流区分保存的翻译结果
+            backend: 翻译后端，default 使用 translator.json 中的设置
         Returns:
             tuple: (原文,)
         """
@@ -72,53 +81,30 @@ class AutoTranslatorBox:
             return (text,)
             
         try:
-            # 检测语言
-            first_paragraph = text.split('\n')[0]
-            is_chinese_text = is_chinese(first_paragraph)
-            print(f"[AutoTranslatorBox] 检测到{'中' if is_chinese_text else '英'}文")
+            # 按段落检测语言
+            languages = detect_paragraph_languages(text)
+            print(f"[AutoTranslatorBox] 检测到中文段落 {languages.count('zh')} 个，英文段落 {languages.count('en')} 个")
             
-            # 加载配置
+            # 选择翻译后端
+            # 配置只读取一次，选择后端和翻译记忆共用
             config = load_translator_config()
-            appid = config["baidu_api"]["appid"]
-            key = config["baidu_api"]["key"]
-            
-            if not appid or not key:
-                print("[AutoTranslatorBox] API配置缺失")
+            try:
+                translation_backend = get_translation_backend(None if backend == "default" else backend, config)
+            except ValueError as e:
+                print(f"[AutoTranslatorBox] {e}")
                 return (text,)
             
-            print("[AutoTranslatorBox] 开始调用百度翻译API...")
-            
-            # 创建事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # 执行翻译
-            translated = loop.run_until_complete(
-                self._translate_text(
-                    text,
-                    appid,
-                    key,
-                    "zh" if is_chinese_text else "en",
-                    "en" if is_chinese_text else "zh"
-                )
-            )
+            print(f"[AutoTranslatorBox] 开始调用翻译后端: {translation_backend.name}...")
             
-            # 关闭事件循环
-            loop.close()
+            # 在共享的翻译运行时中执行，与前端翻译共用连接、限速器和已加载的模型
+            translated = get_translator_runtime().run(self._translate_text(text, translation_backend, config))
             
             # 返回结果
             if translated:
                 print(f"[AutoTranslatorBox] 翻译完成: {translated[:100]}...")
+                translated_texts[node_state_key(unique_id, workflow_id_of(extra_pnginfo))] = translated
                 # 通知前端更新翻译结果
-                PromptServer.instance.send_sync(
-                    "impact-node-feedback",
-                    {
-                        "node_id": unique_id,
-                        "widget_name": "translated",
-                        "type": "string",
-                        "value": translated
-                    }
-                )
+                send_feedback(unique_id, "translated", "string", translated, display_only=True)
                 return (text,)
             else:
                 print("[AutoTranslatorBox] 翻译返回空结果")
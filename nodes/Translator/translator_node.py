@@ -3,13 +3,10 @@ Translator Node for ComfyUI
 提供文本翻译功能的节点
 """
 
-import os
-import json
-import re
-import asyncio
 from typing import Dict, Any
-from server import PromptServer
-from .utils.translator_utils import handle_translate_text, is_chinese, translate_with_baidu, load_translator_config
+from .utils.translator_utils import get_translation_backend, translate_text_auto_sync, load_translator_config
+from .utils.backends import TRANSLATION_BACKENDS
+from .utils.language_detect import detect_paragraph_languages
 
 class TranslatorNode:
     """翻译器节点类"""
@@ -24,18 +21,22 @@ class TranslatorNode:
             "required": {
                 "text": ("STRING", {"multiline": True}),
             },
+            "optional": {
+                "backend": (["default"] + TRANSLATION_BACKENDS, {"default": "default"}),
+            },
         }
     
     RETURN_TYPES = ("STRING",)
     FUNCTION = "translate"
     CATEGORY = "!Axun Nodes/Translator"
     
-    def translate(self, text: str) -> tuple:
+    def translate(self, text: str, backend: str = "default") -> tuple:
         """
         执行翻译操作，自动识别中英文并互译
-        支持全文多段落翻译
+        支持全文多段落翻译，按段落识别语言
         Args:
             text: 要翻译的文本
+            backend: 翻译后端，default 使用 translator.json 中的设置
         Returns:
             tuple: 包含翻译后文本的元组
         """
@@ -44,38 +45,22 @@ class TranslatorNode:
             print("[Translator] 文本为空，跳过翻译")
             return (text,)
             
-        # 使用工具函数检测第一段文本的语言
-        first_paragraph = text.split('\n')[0]
-        is_chinese_text = is_chinese(first_paragraph)
-        print(f"[Translator] 检测到{'中' if is_chinese_text else '英'}文")
+        # 按段落检测语言，中英混合的文本各段分别翻译
+        languages = detect_paragraph_languages(text)
+        print(f"[Translator] 检测到中文段落 {languages.count('zh')} 个，英文段落 {languages.count('en')} 个")
         
         try:
+            # 配置只读取一次，选择后端和翻译记忆共用
             config = load_translator_config()
-            appid = config["baidu_api"]["appid"]
-            key = config["baidu_api"]["key"]
-            
-            if not appid or not key:
-                print("[Translator] API配置缺失")
+            try:
+                translation_backend = get_translation_backend(None if backend == "default" else backend, config)
+            except ValueError as e:
+                print(f"[Translator] {e}")
                 return (text,)
             
-            print("[Translator] 开始调用百度翻译API...")
-            # 创建新的事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # 在新的事件循环中运行异步函数
-            result = loop.run_until_complete(
-                translate_with_baidu(
-                    text, 
-                    appid, 
-                    key,
-                    "zh" if is_chinese_text else "en",
-                    "en" if is_chinese_text else "zh"
-                )
-            )
-            
-            # 关闭事件循环
-            loop.close()
+            print(f"[Translator] 开始调用翻译后端: {translation_backend.name}...")
+            # 在共享的翻译运行时中执行，与前端翻译共用连接、限速器和已加载的模型
+            result = translate_text_auto_sync(text, translation_backend, config=config)
             
             print(f"[Translator] 翻译完成")
             return (result,)
@@ -0,0 +1,61 @@
+"""
+翻译接口
+提供前端双击翻译和翻译记忆管理的 HTTP 路由，翻译逻辑见 utils/translator_utils.py
+路由与 utils 包分开，utils 包不依赖 ComfyUI，可单独导入和测试
+"""
+
+import asyncio
+from aiohttp import web
+from server import PromptServer
+from .utils.translator_utils import (
+    get_configured_memory, get_translation_backend, load_translator_config, translate_text_auto,
+)
+
+@PromptServer.instance.routes.post('/translator/translate')
+async def handle_translate_text(request):
+    """
+    翻译请求处理函数
+    来源：Translator 节点组
+    用途：处理翻译请求
+    支持：全文多段落翻译
+    """
+    try:
+        data = await request.json()
+        text = data.get("text", "")
+        
+        # 配置文件只读取一次，读取和后续的翻译记忆读写都不在服务器事件循环中执行
+        config = await asyncio.to_thread(load_translator_config)
+        try:
+            backend = get_translation_backend(config=config)
+        except ValueError:
+            backend = None
+        if not text or backend is None:
+            return web.json_response({"error": "Missing required parameters"}, status=400)
+        
+        # 按段落检测语言并分别确定翻译方向
+        translated = await translate_text_auto(text, backend, config)
+            
+        return web.json_response({"translated": translated})
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+@PromptServer.instance.routes.get('/translator/memory/stats')
+async def get_translation_memory_stats(request):
+    """
+    翻译记忆统计
+    来源：Translator 节点组
+    用途：查看命中率、条目数和占用
+    """
+    memory = await asyncio.to_thread(get_configured_memory)
+    return web.json_response(await asyncio.to_thread(memory.get_stats))
+
+@PromptServer.instance.routes.post('/translator/memory/clear')
+async def clear_translation_memory(request):
+    """
+    清空翻译记忆
+    来源：Translator 节点组
+    用途：译文质量有问题或切换账号后重新翻译
+    """
+    memory = await asyncio.to_thread(get_configured_memory)
+    await asyncio.to_thread(memory.clear)
+    return web.json_response({"success": True})
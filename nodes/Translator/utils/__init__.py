@@ -7,5 +7,15 @@ from .translator_utils import (
     load_translator_config,
     is_chinese,
     translate_with_baidu,
-    handle_translate_text
-) 
\ No newline at end of file
+    translate_text,
+    translate_text_sync,
+    translate_paragraphs,
+    translate_text_auto,
+    translate_text_auto_sync,
+    get_translation_backend,
+    get_configured_memory,
+)
+from .baidu_client import BaiduTranslateClient, get_baidu_client
+from .async_runtime import TranslatorRuntime, get_translator_runtime
+from .backends import TranslationBackend, BaiduBackend, LocalModelBackend, TRANSLATION_BACKENDS
+from .language_detect import detect_paragraph_languages, route_paragraph_directions
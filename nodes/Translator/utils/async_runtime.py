@@ -0,0 +1,56 @@
+"""
+翻译异步运行时
+用途：节点执行线程和 aiohttp 路由通过插件共享的后台事件循环使用同一个翻译客户端、会话和限速器
+"""
+
+import atexit
+import threading
+from typing import Optional
+
+from ....utils.background_loop import get_background_loop
+from .baidu_client import get_baidu_client
+
+
+class TranslatorRuntime:
+    """
+    翻译客户端使用的后台事件循环
+
+    与 AI 助手连接池共用插件的后台事件循环（见 utils/background_loop.py）：
+    - 同步调用方（节点执行线程）通过 run() 提交协程并等待结果
+    - 异步调用方（aiohttp 路由）通过 run_async() 在自己的事件循环中等待
+    翻译客户端的会话只在该事件循环中创建和使用。
+    """
+
+    def __init__(self):
+        self._background = get_background_loop()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在后台事件循环中执行协程，并同步等待结果"""
+        return self._background.run(coro, timeout)
+
+    async def run_async(self, coro):
+        """从其他事件循环中等待后台事件循环执行的协程"""
+        return await self._background.run_async(coro)
+
+    def close(self):
+        """关闭翻译客户端会话；后台事件循环由 get_background_loop 在退出时停止"""
+        if not self._background.running:
+            return
+        try:
+            self.run(get_baidu_client().close_session(), timeout=5)
+        except Exception:
+            pass
+
+
+_runtime: Optional[TranslatorRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_translator_runtime() -> TranslatorRuntime:
+    """获取进程级共享的翻译运行时"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = TranslatorRuntime()
+            atexit.register(_runtime.close)
+        return _runtime
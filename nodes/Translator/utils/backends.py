@@ -0,0 +1,210 @@
+"""
+翻译后端
+用途：统一百度翻译 API 和本地离线翻译模型的调用接口，节点和前端翻译按配置选择后端
+"""
+
+import asyncio
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .baidu_client import get_baidu_client
+
+# 可选的翻译后端
+TRANSLATION_BACKENDS = ["baidu", "local"]
+
+# 本地模型默认参数，可在 translator.json 的 "local_model" 字段中覆盖
+DEFAULT_LOCAL_SETTINGS = {
+    "engine": "marian",             # marian（transformers 加载）或 ctranslate2
+    "models": {                     # 各翻译方向的模型目录，相对路径基于 ComfyUI/models
+        "zh-en": "translator/opus-mt-zh-en",
+        "en-zh": "translator/opus-mt-en-zh",
+    },
+    "batch_size": 16,               # 每批翻译的段落数
+    "max_length": 512,              # 单个段落的最大 token 数
+}
+
+
+class TranslationBackend(ABC):
+    """
+    翻译后端接口
+
+    translate_paragraphs 在翻译运行时的事件循环中调用，结果与输入一一对应，失败的段落为 None；
+    engine_id 用于区分翻译记忆中不同后端的译文。
+    """
+
+    name = ""
+
+    def engine_id(self, from_lang: str, to_lang: str) -> str:
+        return self.name
+
+    @abstractmethod
+    async def translate_paragraphs(self, paragraphs: List[str], from_lang: str,
+                                   to_lang: str) -> List[Optional[str]]:
+        """翻译段落列表"""
+
+
+class BaiduBackend(TranslationBackend):
+    """百度翻译 API，请求合并与限速见 baidu_client"""
+
+    name = "baidu"
+
+    def __init__(self, appid: str, key: str, settings: Optional[Dict[str, Any]] = None):
+        if not appid or not key:
+            raise ValueError("百度翻译 API 配置缺失")
+        self.appid = appid
+        self.key = key
+        self.settings = settings
+
+    async def translate_paragraphs(self, paragraphs: List[str], from_lang: str,
+                                   to_lang: str) -> List[Optional[str]]:
+        return await get_baidu_client().translate_paragraphs(
+            paragraphs, self.appid, self.key, from_lang, to_lang, self.settings
+        )
+
+
+class _MarianModel:
+    """transformers 加载的 MarianMT 等 Seq2Seq 模型"""
+
+    def __init__(self, path: str, max_length: int):
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        self._torch = torch
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(path).eval()
+
+    def translate(self, texts: List[str]) -> List[str]:
+        with self._torch.inference_mode():
+            inputs = self.tokenizer(texts, return_tensors="pt", padding=True,
+                                    truncation=True, max_length=self.max_length)
+            outputs = self.model.generate(**inputs, max_length=self.max_length)
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+class _CTranslate2Model:
+    """CTranslate2 转换后的模型，分词器从同一目录加载"""
+
+    def __init__(self, path: str, max_length: int):
+        import ctranslate2
+        from transformers import AutoTokenizer
+
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.translator = ctranslate2.Translator(path, device="cpu")
+
+    def translate(self, texts: List[str]) -> List[str]:
+        sources = [
+            self.tokenizer.convert_ids_to_tokens(
+                self.tokenizer.encode(text, truncation=True, max_length=self.max_length)
+            )
+            for text in texts
+        ]
+        results = self.translator.translate_batch(sources, max_batch_size=len(sources),
+                                                  max_decoding_length=self.max_length)
+        return [
+            self.tokenizer.decode(self.tokenizer.convert_tokens_to_ids(result.hypotheses[0]),
+                                  skip_special_tokens=True)
+            for result in results
+        ]
+
+
+_LOCAL_ENGINES = {"marian": _MarianModel, "ctranslate2": _CTranslate2Model}
+
+
+class LocalModelBackend(TranslationBackend):
+    """
+    本地 CPU 翻译模型
+
+    各翻译方向的模型在首次使用时加载并常驻内存；推理在单独的线程中串行执行，
+    不阻塞翻译运行时的事件循环。段落按长度排序后分批，减少批内填充。
+    """
+
+    name = "local"
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_LOCAL_SETTINGS)
+        self.settings.update(settings)
+        # 只配置了部分方向时保留其余方向的默认模型
+        self.settings["models"] = {**DEFAULT_LOCAL_SETTINGS["models"], **settings.get("models", {})}
+        if self.settings["engine"] not in _LOCAL_ENGINES:
+            raise ValueError(f"不支持的本地翻译引擎: {self.settings['engine']}")
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="axun-translator-model")
+
+    def _configured_path(self, from_lang: str, to_lang: str) -> str:
+        path = self.settings["models"].get(f"{from_lang}-{to_lang}")
+        if not path:
+            raise ValueError(f"未配置 {from_lang}-{to_lang} 方向的本地翻译模型")
+        return path
+
+    def model_path(self, from_lang: str, to_lang: str) -> str:
+        path = self._configured_path(from_lang, to_lang)
+        if os.path.isabs(path):
+            return path
+        # 只在需要 ComfyUI 模型目录时导入，后端本身不依赖 ComfyUI
+        import folder_paths
+        return os.path.join(folder_paths.models_dir, path)
+
+    def engine_id(self, from_lang: str, to_lang: str) -> str:
+        return f"local:{self.settings['engine']}:{self._configured_path(from_lang, to_lang)}"
+
+    def _get_model(self, from_lang: str, to_lang: str):
+        path = self.model_path(from_lang, to_lang)
+        with self._lock:
+            model = self._models.get(path)
+            if model is None:
+                if not os.path.isdir(path):
+                    raise FileNotFoundError(f"本地翻译模型不存在: {path}")
+                print(f"[Translator] 加载本地翻译模型: {path}")
+                model = self._models[path] = _LOCAL_ENGINES[self.settings["engine"]](path, self.settings["max_length"])
+            return model
+
+    def _translate_sync(self, paragraphs: List[str], from_lang: str, to_lang: str) -> List[Optional[str]]:
+        translated: List[Optional[str]] = ["" for _ in paragraphs]
+        pending = sorted((i for i, p in enumerate(paragraphs) if p.strip()), key=lambda i: len(paragraphs[i]))
+        if not pending:
+            return translated
+        try:
+            model = self._get_model(from_lang, to_lang)
+        except Exception as e:
+            print(f"[Translator] 本地翻译模型加载失败: {e}")
+            for i in pending:
+                translated[i] = None
+            return translated
+        batch_size = max(1, self.settings["batch_size"])
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            try:
+                results = model.translate([paragraphs[i] for i in batch])
+            except Exception as e:
+                print(f"[Translator] 本地翻译失败: {e}")
+                results = [None] * len(batch)
+            for i, result in zip(batch, results):
+                translated[i] = result
+        return translated
+
+    async def translate_paragraphs(self, paragraphs: List[str], from_lang: str,
+                                   to_lang: str) -> List[Optional[str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._translate_sync, paragraphs, from_lang, to_lang)
+
+
+_local_backends: Dict[str, LocalModelBackend] = {}
+_local_backends_lock = threading.Lock()
+
+
+def get_local_backend(settings: Optional[Dict[str, Any]] = None) -> LocalModelBackend:
+    """获取本地模型后端，相同配置共用同一实例以保持模型常驻"""
+    settings = {k: v for k, v in (settings or {}).items() if k in DEFAULT_LOCAL_SETTINGS}
+    key = json.dumps(settings, sort_keys=True)
+    with _local_backends_lock:
+        backend = _local_backends.get(key)
+        if backend is None:
+            backend = _local_backends[key] = LocalModelBackend(**settings)
+        return backend
@@ -0,0 +1,208 @@
+"""
+百度翻译异步客户端
+用途：复用 aiohttp 会话，将多个段落按 q 的长度上限合并为尽量少的请求，并用令牌桶按账号 QPS 限速
+"""
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+BAIDU_API_URL = "https://api.fanyi.baidu.com/api/trans/vip/translate"
+
+# 默认参数，可在 translator.json 的 "baidu_api" 字段中覆盖
+DEFAULT_BAIDU_SETTINGS = {
+    "qps": 1,                   # 账号 QPS 上限（标准版 1，高级版 10）
+    "max_query_bytes": 6000,    # 单次请求 q 的最大 UTF-8 字节数
+    "max_retries": 2,           # 频率受限、服务端超时和网络错误的重试次数
+    "timeout": 15,              # 单次请求超时（秒）
+}
+
+# 可重试的错误码：52001 请求超时，52002 系统错误，54003 访问频率受限
+RETRY_ERROR_CODES = {"52001", "52002", "54003"}
+
+
+class BaiduTranslateError(Exception):
+    """百度翻译 API 返回错误"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(f"Translation error {code}: {message}")
+        self.code = code
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶
+
+    令牌在加锁时预留，等待在锁外进行，因此 aiohttp 路由和节点执行线程中的
+    不同事件循环共享同一速率上限。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预留一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def pack_paragraphs(paragraphs: List[str], max_bytes: int) -> List[List[int]]:
+    """
+    将待翻译段落按顺序分组，每组用换行连接后不超过 max_bytes
+
+    返回每组段落在列表中的下标；单个段落超过上限时单独成组。
+    """
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    size = 0
+    for index, paragraph in enumerate(paragraphs):
+        length = len(paragraph.encode("utf-8"))
+        # 换行分隔符占 1 字节
+        if current and size + 1 + length > max_bytes:
+            chunks.append(current)
+            current, size = [], 0
+        size += length + (1 if current else 0)
+        current.append(index)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class BaiduTranslateClient:
+    """
+    百度翻译客户端
+
+    请求方法须在翻译运行时（async_runtime）的事件循环中执行，会话在该事件循环中常驻并保持长连接。
+    令牌桶按 appid 共享，同一账号的所有请求共用 QPS。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._buckets: Dict[Tuple[str, float], TokenBucket] = {}
+        self.stats = {"paragraphs": 0, "requests": 0, "retries": 0, "errors": 0, "fallbacks": 0}
+
+    def _get_session(self, timeout: float) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout))
+        return self._session
+
+    async def close_session(self):
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+
+    def _bucket(self, appid: str, qps: float) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get((appid, qps))
+            if bucket is None:
+                bucket = self._buckets[(appid, qps)] = TokenBucket(qps)
+            return bucket
+
+    async def _request(self, query: str, appid: str, key: str, from_lang: str, to_lang: str,
+                       settings: Dict[str, Any]) -> List[Dict[str, str]]:
+        """发送一次翻译请求，返回 trans_result；可重试的错误按令牌桶间隔重试"""
+        session = self._get_session(settings["timeout"])
+        bucket = self._bucket(appid, settings["qps"])
+        attempt = 0
+        while True:
+            salt = str(random.randint(32768, 65536))
+            data = {
+                "appid": appid,
+                "q": query,
+                "from": from_lang,
+                "to": to_lang,
+                "salt": salt,
+                "sign": hashlib.md5((appid + query + salt + key).encode()).hexdigest(),
+            }
+            await bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                async with session.post(BAIDU_API_URL, data=data) as response:
+                    result = await response.json(content_type=None)
+                if "trans_result" in result:
+                    return result["trans_result"]
+                error = BaiduTranslateError(str(result.get("error_code", "")), result.get("error_msg", "Unknown error"))
+                retryable = error.code in RETRY_ERROR_CODES
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error, retryable = e, True
+            self.stats["errors"] += 1
+            if not retryable or attempt >= settings["max_retries"]:
+                raise error
+            attempt += 1
+            self.stats["retries"] += 1
+            print(f"[BaiduTranslate] 请求失败（{error}），第 {attempt} 次重试")
+
+    async def _translate_chunk(self, paragraphs: List[str], appid: str, key: str, from_lang: str, to_lang: str,
+                               settings: Dict[str, Any]) -> List[Optional[str]]:
+        """翻译一组段落；失败的段落为 None"""
+        try:
+            results = await self._request("\n".join(paragraphs), appid, key, from_lang, to_lang, settings)
+            if len(results) == len(paragraphs):
+                return [item["dst"] for item in results]
+            if len(paragraphs) == 1:
+                return ["\n".join(item["dst"] for item in results)]
+        except Exception as e:
+            if len(paragraphs) == 1:
+                print(f"翻译段落时出错: {str(e)}")
+                return [None]
+            print(f"[BaiduTranslate] 合并请求失败，改为逐段翻译: {str(e)}")
+        # 返回行数与段落数不一致（段落内含其他换行符等）时逐段翻译
+        self.stats["fallbacks"] += 1
+        translated = []
+        for paragraph in paragraphs:
+            translated.extend(await self._translate_chunk([paragraph], appid, key, from_lang, to_lang, settings))
+        return translated
+
+    async def translate_paragraphs(self, paragraphs: List[str], appid: str, key: str, from_lang: str, to_lang: str,
+                                   settings: Optional[Dict[str, Any]] = None) -> List[Optional[str]]:
+        """
+        翻译段落列表，结果与输入一一对应，翻译失败的段落为 None
+
+        空白段落直接返回空字符串，其余段落按 max_query_bytes 合并为尽量少的请求。
+        """
+        settings = {**DEFAULT_BAIDU_SETTINGS, **(settings or {})}
+        translated = ["" for _ in paragraphs]
+        pending = [index for index, paragraph in enumerate(paragraphs) if paragraph.strip()]
+        self.stats["paragraphs"] += len(pending)
+        texts = [paragraphs[index] for index in pending]
+        chunks = pack_paragraphs(texts, settings["max_query_bytes"])
+        results = await asyncio.gather(*(
+            self._translate_chunk([texts[i] for i in chunk], appid, key, from_lang, to_lang, settings)
+            for chunk in chunks
+        ))
+        for chunk, chunk_result in zip(chunks, results):
+            for i, text in zip(chunk, chunk_result):
+                translated[pending[i]] = text
+        return translated
+
+
+_baidu_client: Optional[BaiduTranslateClient] = None
+_baidu_client_lock = threading.Lock()
+
+
+def get_baidu_client() -> BaiduTranslateClient:
+    """获取进程级共享的百度翻译客户端"""
+    global _baidu_client
+    with _baidu_client_lock:
+        if _baidu_client is None:
+            _baidu_client = BaiduTranslateClient()
+        return _baidu_client
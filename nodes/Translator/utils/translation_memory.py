@@ -0,0 +1,217 @@
+"""
+翻译记忆
+用途：按段落缓存翻译结果，以 (原文, 源语言, 目标语言) 为键持久化到 SQLite，重复的段落不再请求翻译接口
+"""
+
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# 插件根目录
+PLUGIN_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# 默认参数，可在 translator.json 的 "translation_memory" 字段中覆盖
+DEFAULT_MEMORY_SETTINGS = {
+    "enabled": True,
+    "db_path": "cache/translation_memory.sqlite3",  # 数据库路径，相对路径基于插件目录
+    "max_entries": 50000,                           # 最多保留的段落数
+    "max_bytes": 64 * 1024 * 1024,                  # 原文和译文的最大总占用
+}
+
+# 单条 SQL 中 IN 查询的参数个数上限
+_QUERY_BATCH = 500
+
+
+def memory_key(source: str, from_lang: str, to_lang: str, engine: str = "baidu") -> str:
+    """段落的缓存键：翻译引擎、语言方向和原文的哈希"""
+    return hashlib.sha1(f"{engine}\0{from_lang}\0{to_lang}\0{source}".encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """
+    段落级翻译记忆
+
+    命中时更新最近使用时间，超出条目数或占用上限时淘汰最久未使用的段落。
+    数据库不可用时所有查询视为未命中，不影响翻译。
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_MEMORY_SETTINGS)
+        self.settings.update(settings)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._entries = 0
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        if self.settings["enabled"]:
+            self._open()
+
+    @property
+    def db_path(self) -> str:
+        path = self.settings["db_path"]
+        return path if os.path.isabs(path) else os.path.join(PLUGIN_ROOT, path)
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translation_memory ("
+                "key TEXT PRIMARY KEY, engine TEXT NOT NULL, from_lang TEXT NOT NULL, to_lang TEXT NOT NULL, "
+                "source TEXT NOT NULL, target TEXT NOT NULL, size INTEGER NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS translation_memory_used_at ON translation_memory (used_at)")
+            self._entries, self._bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translation_memory"
+            ).fetchone()
+            self._conn = conn
+        except sqlite3.Error as e:
+            print(f"[TranslationMemory] 打开翻译记忆数据库失败，不使用缓存: {e}")
+            self._conn = None
+
+    def lookup(self, paragraphs: Sequence[str], from_lang: str, to_lang: str,
+               engine: str = "baidu") -> Dict[int, str]:
+        """查询段落译文，返回 {段落下标: 译文}，只包含命中的段落"""
+        if self._conn is None or not paragraphs:
+            return {}
+        keys = [memory_key(p, from_lang, to_lang, engine) for p in paragraphs]
+        found: Dict[str, str] = {}
+        try:
+            with self._lock:
+                unique_keys = list(dict.fromkeys(keys))
+                for start in range(0, len(unique_keys), _QUERY_BATCH):
+                    batch = unique_keys[start:start + _QUERY_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    found.update(self._conn.execute(
+                        f"SELECT key, target FROM translation_memory WHERE key IN ({placeholders})", batch
+                    ).fetchall())
+                if found:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE translation_memory SET used_at = ? WHERE key = ?",
+                        [(now, key) for key in found],
+                    )
+        except sqlite3.Error as e:
+            print(f"[TranslationMemory] 查询翻译记忆失败: {e}")
+            return {}
+        hits = {index: found[key] for index, key in enumerate(keys) if key in found}
+        self.stats["hits"] += len(hits)
+        self.stats["misses"] += len(keys) - len(hits)
+        return hits
+
+    def store(self, pairs: Sequence[Tuple[str, str]], from_lang: str, to_lang: str, engine: str = "baidu"):
+        """保存 (原文, 译文) 段落对"""
+        if self._conn is None or not pairs:
+            return
+        now = time.time()
+        rows = {}
+        for source, target in pairs:
+            key = memory_key(source, from_lang, to_lang, engine)
+            size = len(source.encode("utf-8")) + len(target.encode("utf-8"))
+            rows[key] = (key, engine, from_lang, to_lang, source, target, size, now)
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                # 替换已有条目时先扣除旧条目的占用
+                keys = list(rows)
+                for start in range(0, len(keys), _QUERY_BATCH):
+                    batch = keys[start:start + _QUERY_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    count, size = self._conn.execute(
+                        f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translation_memory WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchone()
+                    self._entries -= count
+                    self._bytes -= size
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO translation_memory "
+                    "(key, engine, from_lang, to_lang, source, target, size, used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    list(rows.values()),
+                )
+                self._entries += len(rows)
+                self._bytes += sum(row[6] for row in rows.values())
+                self._evict()
+                self._conn.execute("COMMIT")
+            self.stats["stored"] += len(rows)
+        except sqlite3.Error as e:
+            print(f"[TranslationMemory] 保存翻译记忆失败: {e}")
+            try:
+                with self._lock:
+                    self._conn.execute("ROLLBACK")
+                    self._entries, self._bytes = self._conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translation_memory"
+                    ).fetchone()
+            except sqlite3.Error:
+                pass
+
+    def _over_limit(self) -> bool:
+        return self._entries > self.settings["max_entries"] or self._bytes > self.settings["max_bytes"]
+
+    def _evict(self):
+        """淘汰最久未使用的段落直到满足上限，需在事务中调用"""
+        while self._over_limit():
+            rows = self._conn.execute(
+                "SELECT key, size FROM translation_memory ORDER BY used_at LIMIT ?", (_QUERY_BATCH,)
+            ).fetchall()
+            if not rows:
+                self._entries, self._bytes = 0, 0
+                return
+            evicted = []
+            for key, size in rows:
+                if not self._over_limit():
+                    break
+                evicted.append((key,))
+                self._entries -= 1
+                self._bytes -= size
+            self._conn.executemany("DELETE FROM translation_memory WHERE key = ?", evicted)
+            self.stats["evicted"] += len(evicted)
+
+    def clear(self):
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM translation_memory")
+                self._entries, self._bytes = 0, 0
+        except sqlite3.Error as e:
+            print(f"[TranslationMemory] 清空翻译记忆失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            enabled=self._conn is not None,
+            db_path=self.db_path,
+            entries=self._entries,
+            bytes=self._bytes,
+            max_entries=self.settings["max_entries"],
+            max_bytes=self.settings["max_bytes"],
+        )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_translation_memory: Optional[TranslationMemory] = None
+_translation_memory_lock = threading.Lock()
+
+
+def get_translation_memory(settings: Optional[Dict[str, Any]] = None) -> TranslationMemory:
+    """获取进程级共享的翻译记忆，settings 只在首次创建时生效"""
+    global _translation_memory
+    with _translation_memory_lock:
+        if _translation_memory is None:
+            settings = settings or {}
+            _translation_memory = TranslationMemory(
+                **{k: v for k, v in settings.items() if k in DEFAULT_MEMORY_SETTINGS}
+            )
+            atexit.register(_translation_memory.close)
+        return _translation_memory
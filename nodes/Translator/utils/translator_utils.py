@@ -4,13 +4,17 @@
 """
 
 import os
+import re
 import json
-import hashlib
-import random
-import requests
-from aiohttp import web
-from server import PromptServer
 import asyncio
+from .baidu_client import DEFAULT_BAIDU_SETTINGS
+from .backends import BaiduBackend, get_local_backend
+from .translation_memory import get_translation_memory
+from .async_runtime import get_translator_runtime
+from .language_detect import route_paragraph_directions
+
+# 与 is_chinese 原有判断相同的码位范围
+_CHINESE_PATTERN = re.compile('[\u4e00-\u9fff]')
 
 def load_translator_config():
     """
@@ -34,95 +38,126 @@ def is_chinese(text):
     来源：Translator 节点组
     用途：判断文本语言类型
     """
-    for char in text:
-        if '\u4e00' <= char <= '\u9fff':
-            return True
-    return False
+    return _CHINESE_PATTERN.search(text) is not None
 
-async def translate_with_baidu(text, appid, key, from_lang, to_lang):
+def load_baidu_settings(config=None):
     """
-    使用百度翻译API进行翻译
+    读取百度翻译请求参数
     来源：Translator 节点组
-    用途：调用百度翻译 API
-    支持：全文多段落翻译
+    用途：合并 translator.json 中 baidu_api 的 QPS、请求长度等设置与默认值
     """
-    url = "https://api.fanyi.baidu.com/api/trans/vip/translate"
-    salt = str(random.randint(32768, 65536))
-    
-    # 分割文本为段落
-    paragraphs = text.split('\n')
-    translated_paragraphs = []
+    config = config if config is not None else load_translator_config()
+    baidu_api = config.get("baidu_api", {})
+    return {k: baidu_api.get(k, v) for k, v in DEFAULT_BAIDU_SETTINGS.items()}
+
+def get_translation_backend(name=None, config=None):
+    """
+    获取翻译后端
+    来源：Translator 节点组
+    用途：按名称或 translator.json 的 backend 字段（默认 baidu）选择百度 API 或本地模型
+    """
+    config = config if config is not None else load_translator_config()
+    name = name or config.get("backend", "baidu")
+    if name == "local":
+        return get_local_backend(config.get("local_model"))
+    if name == "baidu":
+        baidu_api = config.get("baidu_api", {})
+        return BaiduBackend(baidu_api.get("appid", ""), baidu_api.get("key", ""), load_baidu_settings(config))
+    raise ValueError(f"不支持的翻译后端: {name}")
+
+def get_configured_memory(config=None):
+    """按配置获取翻译记忆；读取配置文件和打开数据库都是阻塞操作，异步调用方通过 asyncio.to_thread 调用"""
+    config = config if config is not None else load_translator_config()
+    return get_translation_memory(config.get("translation_memory"))
+
+async def translate_paragraphs(paragraphs, from_lang, to_lang, backend, memory=None):
+    """
+    翻译段落列表
+    来源：Translator 节点组
+    用途：先查询翻译记忆，未命中的段落交给翻译后端，结果与输入一一对应
+    支持：空白段落返回空字符串，翻译失败的段落保留原文
+    说明：翻译记忆的 SQLite 读写在工作线程中执行，不阻塞调用方的事件循环（前端翻译时为服务器事件循环）
+    """
+    if memory is None:
+        memory = await asyncio.to_thread(get_configured_memory)
+    engine = backend.engine_id(from_lang, to_lang)
     
-    for paragraph in paragraphs:
-        if not paragraph.strip():
-            translated_paragraphs.append('')
-            continue
-            
-        # 为每个段落生成新的签名
-        sign = hashlib.md5((appid + paragraph + salt + key).encode()).hexdigest()
-        
-        params = {
-            'appid': appid,
-            'q': paragraph,
-            'from': from_lang,
-            'to': to_lang,
-            'salt': salt,
-            'sign': sign
-        }
-        
-        try:
-            response = requests.get(url, params=params)
-            result = response.json()
-            
-            if 'trans_result' in result:
-                translated = result['trans_result'][0]['dst']
-                translated_paragraphs.append(translated)
-            else:
-                error_msg = result.get('error_msg', 'Unknown error')
-                raise Exception(f"Translation error: {error_msg}")
-                
-            # 添加延时避免请求过快
-            await asyncio.sleep(0.1)
-            
-        except Exception as e:
-            print(f"翻译段落时出错: {str(e)}")
-            # 如果翻译失败，保留原文
-            translated_paragraphs.append(paragraph)
+    # 已在翻译记忆中的段落不再请求
+    translated_paragraphs = [''] * len(paragraphs)
+    pending = [i for i, paragraph in enumerate(paragraphs) if paragraph.strip()]
+    cached = await asyncio.to_thread(memory.lookup, [paragraphs[i] for i in pending], from_lang, to_lang, engine)
+    for j, translated in cached.items():
+        translated_paragraphs[pending[j]] = translated
+    missing = [i for j, i in enumerate(pending) if j not in cached]
     
-    # 使用原始文本的换行方式重新组合
+    if missing:
+        # 在翻译运行时的事件循环中执行，与其他调用方共用会话、限速器和已加载的模型
+        results = await get_translator_runtime().run_async(
+            backend.translate_paragraphs([paragraphs[i] for i in missing], from_lang, to_lang)
+        )
+        # 只保存翻译成功的段落
+        await asyncio.to_thread(
+            memory.store,
+            [(paragraphs[i], result) for i, result in zip(missing, results) if result is not None],
+            from_lang, to_lang, engine
+        )
+        for i, result in zip(missing, results):
+            translated_paragraphs[i] = result if result is not None else paragraphs[i]
+    return translated_paragraphs
+
+async def translate_text(text, from_lang, to_lang, backend, config=None):
+    """
+    按固定方向翻译文本
+    来源：Translator 节点组
+    用途：按换行分段翻译后按原有换行重新组合；config 为调用方已读取的配置，省略时读取一次
+    """
+    memory = await asyncio.to_thread(get_configured_memory, config)
+    return '\n'.join(await translate_paragraphs(text.split('\n'), from_lang, to_lang, backend, memory))
+
+async def translate_text_auto(text, backend, config=None):
+    """
+    按段落自动判断方向翻译文本
+    来源：Translator 节点组
+    用途：中文段落译为英文、英文段落译为中文，中英混合的文本不再整体按第一段的语言翻译
+    支持：同一方向的段落合并翻译，两个方向并行请求，共用一次读取的配置和翻译记忆
+    """
+    memory = await asyncio.to_thread(get_configured_memory, config)
+    paragraphs = text.split('\n')
+    groups = {}
+    for i, direction in enumerate(route_paragraph_directions(text)):
+        groups.setdefault(direction, []).append(i)
+    results = await asyncio.gather(*(
+        translate_paragraphs([paragraphs[i] for i in indices], from_lang, to_lang, backend, memory)
+        for (from_lang, to_lang), indices in groups.items()
+    ))
+    translated_paragraphs = [''] * len(paragraphs)
+    for indices, group_result in zip(groups.values(), results):
+        for i, translated in zip(indices, group_result):
+            translated_paragraphs[i] = translated
     return '\n'.join(translated_paragraphs)
 
-@PromptServer.instance.routes.post('/translator/translate')
-async def handle_translate_text(request):
+async def translate_with_baidu(text, appid, key, from_lang, to_lang):
     """
-    翻译请求处理函数
+    使用百度翻译API进行翻译
     来源：Translator 节点组
-    用途：处理翻译请求
-    支持：全文多段落翻译
+    用途：调用百度翻译 API
+    支持：全文多段落翻译，多个段落合并为一次请求，按账号 QPS 限速
     """
-    try:
-        data = await request.json()
-        text = data.get("text", "")
-        config = load_translator_config()
-        
-        appid = config["baidu_api"]["appid"]
-        key = config["baidu_api"]["key"]
-        
-        if not text or not appid or not key:
-            return web.json_response({"error": "Missing required parameters"}, status=400)
-        
-        # 检测第一段文本的语言类型
-        first_paragraph = text.split('\n')[0]
-        is_source_chinese = is_chinese(first_paragraph)
-        
-        translated = await translate_with_baidu(
-            text, 
-            appid, 
-            key,
-            'zh' if is_source_chinese else 'en',
-            'en' if is_source_chinese else 'zh'
-        )
-            
-        return web.json_response({"translated": translated})
-    except Exception as e:
-        return web.json_response({"error": str(e)}, status=500) 
\ No newline at end of file
+    config = await asyncio.to_thread(load_translator_config)
+    return await translate_text(text, from_lang, to_lang, BaiduBackend(appid, key, load_baidu_settings(config)), config)
+
+def translate_text_sync(text, from_lang, to_lang, backend, timeout=None, config=None):
+    """
+    同步翻译
+    来源：Translator 节点组
+    用途：节点执行线程通过共享的翻译运行时调用 translate_text，不再为每次执行创建事件循环
+    """
+    return get_translator_runtime().run(translate_text(text, from_lang, to_lang, backend, config), timeout)
+
+def translate_text_auto_sync(text, backend, timeout=None, config=None):
+    """
+    同步按段落自动判断方向翻译
+    来源：Translator 节点组
+    用途：节点执行线程通过共享的翻译运行时调用 translate_text_auto
+    """
+    return get_translator_runtime().run(translate_text_auto(text, backend, config), timeout)
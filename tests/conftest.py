@@ -0,0 +1,20 @@
+"""
+测试配置
+
+仓库根目录是 ComfyUI 加载的插件包，根目录 __init__.py 会导入全部节点并向 ComfyUI 注册。
+测试以 tests/ 为根目录收集（见 tests/pytest.ini），不导入该文件；这里将仓库根目录注册为
+Axun_Nodes 包（与安装到 ComfyUI/custom_nodes 后的包名一致），测试按需导入各模块。
+依赖 ComfyUI 的模块（server、folder_paths）需要将 ComfyUI 根目录加入 PYTHONPATH 后运行。
+"""
+
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+if "Axun_Nodes" not in sys.modules:
+    package = types.ModuleType("Axun_Nodes")
+    package.__path__ = [str(ROOT)]
+    sys.modules["Axun_Nodes"] = package
+
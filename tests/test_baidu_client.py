@@ -0,0 +1,86 @@
+"""百度翻译请求合并与行数不一致时的逐段回退"""
+
+import asyncio
+
+from Axun_Nodes.nodes.Translator.utils.baidu_client import (
+    BaiduTranslateClient, BaiduTranslateError, DEFAULT_BAIDU_SETTINGS, pack_paragraphs,
+)
+
+
+def test_pack_respects_byte_limit():
+    # 3 + 1（换行）+ 3 = 7 字节
+    assert pack_paragraphs(["aaa", "bbb", "ccc"], 7) == [[0, 1], [2]]
+    assert pack_paragraphs(["aaa", "bbb", "ccc"], 11) == [[0, 1, 2]]
+
+
+def test_pack_counts_utf8_bytes():
+    # 每个“中文”为 6 字节
+    assert pack_paragraphs(["中文", "中文"], 13) == [[0, 1]]
+    assert pack_paragraphs(["中文", "中文"], 12) == [[0], [1]]
+
+
+def test_pack_oversize_paragraph_alone():
+    assert pack_paragraphs(["a", "x" * 20, "b"], 10) == [[0], [1], [2]]
+    assert pack_paragraphs(["x" * 20], 10) == [[0]]
+    assert pack_paragraphs([], 10) == []
+
+
+class FakeClient(BaiduTranslateClient):
+    """按查询文本返回结果的客户端；mismatch 中的查询只返回第一行"""
+
+    def __init__(self, mismatch=(), failing=()):
+        super().__init__()
+        self.queries = []
+        self.mismatch = set(mismatch)
+        self.failing = set(failing)
+
+    async def _request(self, query, appid, key, from_lang, to_lang, settings):
+        self.queries.append(query)
+        if query in self.failing:
+            raise BaiduTranslateError("54001", "Invalid Sign")
+        lines = query.split("\n")
+        if query in self.mismatch:
+            lines = lines[:1]
+        return [{"src": line, "dst": line.upper()} for line in lines]
+
+
+def translate(client, paragraphs, **settings):
+    return asyncio.run(client.translate_paragraphs(
+        paragraphs, "id", "key", "en", "zh", {**DEFAULT_BAIDU_SETTINGS, **settings}))
+
+
+def test_packed_request_maps_back_to_paragraphs():
+    client = FakeClient()
+
+    result = translate(client, ["one", "", "two", "  ", "three"], max_query_bytes=7)
+
+    assert result == ["ONE", "", "TWO", "", "THREE"]
+    assert client.queries == ["one\ntwo", "three"]
+
+
+def test_line_count_mismatch_falls_back_per_paragraph():
+    client = FakeClient(mismatch={"one\ntwo\nthree"})
+
+    result = translate(client, ["one", "two", "three"])
+
+    assert result == ["ONE", "TWO", "THREE"]
+    assert client.queries == ["one\ntwo\nthree", "one", "two", "three"]
+    assert client.stats["fallbacks"] == 1
+
+
+def test_single_paragraph_lines_are_joined():
+    client = FakeClient()
+
+    result = asyncio.run(client._translate_chunk(
+        ["first\nsecond"], "id", "key", "en", "zh", DEFAULT_BAIDU_SETTINGS))
+
+    assert result == ["FIRST\nSECOND"]
+
+
+def test_failed_paragraph_is_none():
+    client = FakeClient(failing={"one\nbad", "bad"})
+
+    result = translate(client, ["one", "bad"])
+
+    # 合并请求失败后逐段翻译，只有失败的段落为 None
+    assert result == ["ONE", None]
@@ -0,0 +1,34 @@
+"""控件反馈推送：输入控件立即发送，仅显示的控件合并发送"""
+
+from Axun_Nodes.utils.feedback import FEEDBACK_EVENT, FeedbackDispatcher
+
+
+def make_dispatcher(**settings):
+    sent = []
+    dispatcher = FeedbackDispatcher(lambda event, data: sent.append((event, data)), **settings)
+    return dispatcher, sent
+
+
+def test_input_widget_sent_immediately():
+    dispatcher, sent = make_dispatcher(interval=60)
+    dispatcher.update("5", "loop_index", "int", 3)
+    assert sent == [(FEEDBACK_EVENT, {"node_id": "5", "widget_name": "loop_index", "type": "int", "value": 3})]
+
+
+def test_display_widget_coalesced_and_truncated():
+    dispatcher, sent = make_dispatcher(interval=60, max_text_length=10)
+    dispatcher.update("5", "stream_preview", "text", "a", display_only=True)
+    dispatcher.update("5", "stream_preview", "text", "b" * 100, display_only=True)
+    assert sent == []
+    dispatcher.flush()
+    assert len(sent) == 1
+    value = sent[0][1]["value"]
+    assert value.startswith("bbbbb") and value.endswith("bbbbb") and len(value) < 100
+    assert dispatcher.stats["coalesced"] == 1
+
+
+def test_event_sent_after_pending_updates():
+    dispatcher, sent = make_dispatcher(interval=60)
+    dispatcher.update("5", "translated", "string", "x", display_only=True)
+    dispatcher.send_event("impact-add-queue", {})
+    assert [event for event, _ in sent] == [FEEDBACK_EVENT, "impact-add-queue"]
@@ -0,0 +1,143 @@
+"""共享 HTTP 客户端的重试、退避、Retry-After 上限和熔断状态"""
+
+import asyncio
+
+import aiohttp
+import pytest
+
+from Axun_Nodes.nodes.AIAssistant.utils import http_client
+from Axun_Nodes.nodes.AIAssistant.utils.http_client import CircuitOpenError, PooledHttpClient
+
+KEY = "http://llm.test"
+
+
+class FakeSend:
+    """按顺序返回预设结果的 send()；结果为异常时抛出"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        status, headers = result if isinstance(result, tuple) else (result, {})
+        return status, f"body {status}", headers
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """记录重试前的等待时间，不实际等待；退避取抖动区间的上限"""
+    recorded = []
+
+    async def fake_sleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr(http_client.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(http_client.random, "uniform", lambda low, high: high)
+    return recorded
+
+
+def run(client, send, **kwargs):
+    return asyncio.run(client._send_with_retry(KEY, send, **kwargs))
+
+
+def test_retry_statuses_use_exponential_backoff(delays):
+    client = PooledHttpClient(backoff_base=1.0, backoff_max=3.0)
+    send = FakeSend(503, 502, 500, 200)
+    assert run(client, send) == (200, "body 200")
+    assert delays == [1.0, 2.0, 3.0]
+    assert client._stats[KEY]["retries"] == 3
+
+
+def test_retries_stop_after_max_retries(delays):
+    client = PooledHttpClient(max_retries=1, circuit_failure_threshold=10)
+    send = FakeSend(503, 503, 200)
+    assert run(client, send) == (503, "body 503")
+    assert send.calls == 2
+
+
+def test_non_retry_status_returned_immediately(delays):
+    client = PooledHttpClient()
+    send = FakeSend(400)
+    assert run(client, send) == (400, "body 400")
+    assert delays == []
+
+
+def test_retry_after_is_capped(delays):
+    client = PooledHttpClient(retry_after_max=5.0)
+    send = FakeSend((429, {"Retry-After": "2"}), (429, {"Retry-After": "1000"}), 200)
+    assert run(client, send) == (200, "body 200")
+    assert delays == [2.0, 5.0]
+
+
+def test_connect_errors_are_retried(delays):
+    client = PooledHttpClient()
+    send = FakeSend(aiohttp.ConnectionTimeoutError(), 200)
+    assert run(client, send) == (200, "body 200")
+    assert send.calls == 2
+
+
+@pytest.mark.parametrize("error", [asyncio.TimeoutError(), aiohttp.ServerDisconnectedError()])
+def test_read_errors_not_retried_by_default(delays, error):
+    client = PooledHttpClient()
+    send = FakeSend(error, 200)
+    with pytest.raises(type(error)):
+        run(client, send)
+    assert send.calls == 1
+
+
+def test_read_errors_retried_when_enabled(delays):
+    client = PooledHttpClient(retry_read_errors=True)
+    send = FakeSend(asyncio.TimeoutError(), 200)
+    assert run(client, send) == (200, "body 200")
+
+
+def test_can_retry_false_stops_retrying(delays):
+    client = PooledHttpClient()
+    send = FakeSend(aiohttp.ConnectionTimeoutError(), 200)
+    with pytest.raises(aiohttp.ConnectionTimeoutError):
+        run(client, send, can_retry=lambda: False)
+
+
+def test_circuit_opens_then_recovers(delays, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: now[0])
+    client = PooledHttpClient(max_retries=0, circuit_failure_threshold=2, circuit_reset_timeout=30.0)
+    breaker = client._breaker_for(KEY)
+
+    for _ in range(2):
+        assert run(client, FakeSend(500)) == (500, "body 500")
+    assert breaker.state == "open"
+
+    send = FakeSend(200)
+    with pytest.raises(CircuitOpenError):
+        run(client, send)
+    assert send.calls == 0
+    assert client._stats[KEY]["circuit_rejections"] == 1
+
+    # 超过 reset_timeout 后放行一次试探请求，失败则重新熔断
+    now[0] += 31
+    assert run(client, FakeSend(502)) == (502, "body 502")
+    assert breaker.state == "open"
+
+    now[0] += 31
+    assert run(client, FakeSend(200)) == (200, "body 200")
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+@pytest.mark.parametrize("error", [RuntimeError("中止"), asyncio.CancelledError()])
+def test_aborted_request_releases_probe(delays, monkeypatch, error):
+    now = [1000.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: now[0])
+    client = PooledHttpClient(max_retries=0, circuit_failure_threshold=1, circuit_reset_timeout=30.0)
+    run(client, FakeSend(500))
+    now[0] += 31
+
+    # 回调主动中止或任务取消不计入熔断，也不占用试探名额
+    with pytest.raises(type(error)):
+        run(client, FakeSend(error))
+    assert run(client, FakeSend(200)) == (200, "body 200")
@@ -0,0 +1,43 @@
+"""按分辨率分组使用的图像尺寸与解码结果一致"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from Axun_Nodes.nodes.Qtools.image_prefetch import decode_file, image_size
+
+FORMATS = [
+    ("jpg", {}),
+    ("png", {}),
+    ("webp", {}),
+    ("tif", {}),
+    ("tif", {"compression": "tiff_lzw"}),
+]
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+@pytest.mark.parametrize("ext, options", FORMATS)
+def test_image_size_matches_decoded_shape(tmp_path, ext, options, orientation):
+    image = Image.new("RGB", (40, 20), (200, 100, 50))
+    exif = image.getexif()
+    exif[0x0112] = orientation
+    path = tmp_path / f"o{orientation}.{ext}"
+    image.save(path, exif=exif, **options)
+
+    decoded = decode_file(str(path))
+    assert image_size(str(path)) == tuple(decoded.rgb.shape[1::-1])
+
+
+@pytest.mark.parametrize("ext", ["bmp", "ppm", "tif"])
+def test_uncompressed_pixels_do_not_hold_file(tmp_path, ext):
+    image = Image.new("RGB", (40, 20), (200, 100, 50))
+    image.putpixel((3, 5), (1, 2, 3))
+    path = tmp_path / f"raw.{ext}"
+    image.save(path)
+
+    decoded = decode_file(str(path))
+    # 解码结果缓存期间源文件可以移动或删除
+    path.rename(tmp_path / f"moved.{ext}")
+    (tmp_path / f"moved.{ext}").unlink()
+    assert not isinstance(decoded.rgb.base, np.memmap)
+    assert (decoded.rgb == np.asarray(image)).all()
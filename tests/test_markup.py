@@ -0,0 +1,104 @@
+"""##名称:{内容} 分词器与各节点原有正则的对比"""
+
+import json
+import re
+import time
+
+from Axun_Nodes.nodes.AIAssistant.utils.markup import find_block_end, tokenize_markup
+
+# 分词器替换前各节点使用的正则
+LEGACY_TEXT_CACHE = re.compile(r'##[^{:]*:\{(.*?)\}', re.DOTALL)
+LEGACY_TEXT_PROCESSOR = re.compile(r'##[^{]*:\{(.*?)\}', re.DOTALL)
+LEGACY_STORY_EXTRACTOR = re.compile(r'##story_(\d+):\s*({(?:[^{}]|{[^{}]*})*})', re.DOTALL)
+
+
+def contents(text):
+    return [block.content for block in tokenize_markup(text)]
+
+
+def test_flat_blocks_match_legacy():
+    text = "前言\n##title:{第一章}\n\n##scene_1:{\"a\": 1}\n##scene_2:{教室, 早晨}\n结尾"
+
+    assert contents(text) == LEGACY_TEXT_CACHE.findall(text)
+    assert contents(text) == LEGACY_TEXT_PROCESSOR.findall(text)
+    assert [block.name for block in tokenize_markup(text)] == ["title", "scene_1", "scene_2"]
+
+
+def test_one_level_nesting_matches_legacy_story_extractor():
+    text = (
+        '##story_1: {"narrative": "day 1", "scene": {"camera": "wide"}}\n'
+        '##story_2:{"narrative": "day 2", "scene": {"camera": "close"}}\n'
+    )
+    blocks = tokenize_markup(text)
+
+    legacy = LEGACY_STORY_EXTRACTOR.findall(text)
+    assert [("story_" + number, body) for number, body in legacy] == \
+        [(block.name, "{" + block.content + "}") for block in blocks]
+
+
+def test_nested_content_is_not_truncated():
+    body = '{"scene": {"environment": {"light": "morning"}}, "cast": ["Ming"]}'
+    text = f"##scene_1:{body}\n##scene_2:{{\"cast\": []}}"
+
+    blocks = tokenize_markup(text)
+
+    # 旧正则在第一个右括号处截断
+    assert LEGACY_TEXT_CACHE.findall(text)[0] == '"scene": {"environment": {"light": "morning"'
+    assert json.loads("{" + blocks[0].content + "}") == json.loads(body)
+    assert blocks[1].content == '"cast": []'
+
+
+def test_braces_inside_strings_are_ignored():
+    text = '##scene_1:{"line": "a } b { c", "quote": "say \\"}\\""}\n##scene_2:{x}'
+
+    blocks = tokenize_markup(text)
+
+    assert json.loads("{" + blocks[0].content + "}")["line"] == "a } b { c"
+    assert blocks[1].content == "x"
+
+
+def test_missing_brace_stops_at_next_header():
+    text = "##scene_1:{unterminated\n##scene_2:{second}"
+
+    # 旧正则越过下一个标记头，第二个块丢失
+    assert LEGACY_TEXT_CACHE.findall(text) == ["unterminated\n##scene_2:{second"]
+    assert contents(text) == ["unterminated\n", "second"]
+
+
+def test_unbalanced_block_falls_back_to_last_brace():
+    text = "##scene_1:{a {b} c} tail\n##scene_2:{d}"
+    unbalanced = "##scene_1:{a {b} c tail\n##scene_2:{d}"
+
+    assert contents(text) == ["a {b} c", "d"]
+    # 缺少一个右括号时退回到下一个标记头之前的最后一个右括号
+    assert contents(unbalanced)[0] == "a {b"
+    assert find_block_end(unbalanced, len("##scene_1:{"), unbalanced.index("##scene_2")) == unbalanced.index("}")
+
+
+def test_block_ranges_cover_source():
+    text = "x ##a:{1} y ##b: {2}"
+
+    blocks = tokenize_markup(text)
+
+    assert [text[block.start:block.end] for block in blocks] == ["##a:{1}", "##b: {2}"]
+
+
+def test_results_are_cached():
+    text = "##a:{1}\n##b:{2}"
+
+    assert tokenize_markup(text) is tokenize_markup(text)
+    assert tokenize_markup("") == ()
+    assert tokenize_markup("没有标记") == ()
+
+
+def test_truncated_document_is_linear():
+    block = '##scene_{i}:{{"scene_description": {{"environment": "classroom {i}"\n\n'
+    text = "".join(block.format(i=i) for i in range(5000)).replace("}", "")
+
+    started = time.perf_counter()
+    blocks = tokenize_markup(text)
+    elapsed = time.perf_counter() - started
+
+    # 旧的非贪婪正则在缺少右括号时为二次复杂度，该文档需要数秒以上
+    assert len(blocks) == 5000
+    assert elapsed < 1.0
@@ -0,0 +1,76 @@
+"""节点状态按工作流区分的键，以及批量写入接口的校验"""
+
+import pytest
+
+from Axun_Nodes.utils import state_store
+from Axun_Nodes.utils.state_store import StateStore, node_state_key, parse_state_updates, workflow_id_of
+
+
+@pytest.fixture
+def store():
+    return StateStore(persist=False)
+
+
+def test_same_node_id_in_different_workflows_is_separate(store):
+    indexes = store.namespace("loop_indexes", value_types=(int,))
+    indexes[node_state_key("5", workflow_id_of({"workflow": {"id": "wf-a"}}))] = 3
+    assert node_state_key("5", "wf-b") not in indexes
+    assert indexes.get(node_state_key("5", "wf-a")) == 3
+
+
+def test_missing_workflow_id_falls_back_to_node_id():
+    assert workflow_id_of(None) == ""
+    assert workflow_id_of({"workflow": {"nodes": []}}) == ""
+    assert node_state_key(7, "") == "7"
+
+
+def test_value_types(store):
+    indexes = store.namespace("loop_indexes", value_types=(int,))
+    assert indexes.accepts(3)
+    assert not indexes.accepts(True)
+    assert not indexes.accepts("3")
+    assert store.namespace("free").accepts({"any": [1, 2]})
+
+
+def test_parse_valid_payload(store):
+    store.namespace("text_cache", value_types=(str,))
+    updates = parse_state_updates(store, {"text_cache": {"wf:1": "a"}, "unknown": {"1": 1}})
+    assert [(ns.name, key, value) for ns, key, value in updates] == [("text_cache", "wf:1", "a")]
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"text_cache": "a"},
+    {"text_cache": {"1": 1}},
+    {"text_cache": {"x" * 200: "a"}},
+])
+def test_parse_invalid_payload(store, payload):
+    store.namespace("text_cache", value_types=(str,))
+    with pytest.raises(ValueError):
+        parse_state_updates(store, payload)
+
+
+def test_parse_value_size_and_count_limits(store):
+    store.namespace("text_cache", value_types=(str,))
+    with pytest.raises(ValueError):
+        parse_state_updates(store, {"text_cache": {"1": "a" * (state_store.MAX_VALUE_BYTES + 1)}})
+    many = {str(k): "a" for k in range(state_store.MAX_UPDATES + 1)}
+    with pytest.raises(ValueError):
+        parse_state_updates(store, {"text_cache": many})
+
+
+def test_writes_are_batched_and_persisted(tmp_path):
+    db_path = str(tmp_path / "state.sqlite3")
+    store = StateStore(db_path=db_path, flush_interval=60)
+    texts = store.namespace("text_cache")
+    texts["wf:1"] = "a"
+    texts["wf:1"] = "b"
+    texts["wf:2"] = "c"
+    del texts["wf:2"]
+    # 窗口结束前不写入数据库
+    assert store._read("text_cache") == []
+
+    store.close()
+    reopened = StateStore(db_path=db_path)
+    assert dict(reopened.namespace("text_cache").items()) == {"wf:1": "b"}
+    reopened.close()
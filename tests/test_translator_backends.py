@@ -0,0 +1,120 @@
+"""翻译后端选择与本地模型后端的分批、失败处理"""
+
+import asyncio
+
+import pytest
+
+from Axun_Nodes.nodes.Translator.utils.backends import (
+    DEFAULT_LOCAL_SETTINGS, BaiduBackend, LocalModelBackend, TranslationBackend, get_local_backend,
+)
+from Axun_Nodes.nodes.Translator.utils.baidu_client import DEFAULT_BAIDU_SETTINGS
+from Axun_Nodes.nodes.Translator.utils.translator_utils import get_translation_backend
+
+
+class RecordingModel:
+    """记录每批输入的模型；输入中含 fail_on 的批次抛出异常"""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def translate(self, texts):
+        self.batches.append(list(texts))
+        if self.fail_on is not None and self.fail_on in texts:
+            raise RuntimeError("推理失败")
+        return [text.upper() for text in texts]
+
+
+def make_backend(monkeypatch, model, **settings):
+    backend = LocalModelBackend(**settings)
+    monkeypatch.setattr(backend, "_get_model", lambda from_lang, to_lang: model)
+    return backend
+
+
+def test_backend_base_is_abstract():
+    with pytest.raises(TypeError):
+        TranslationBackend()
+
+
+def test_local_batches_sorted_by_length(monkeypatch):
+    model = RecordingModel()
+    backend = make_backend(monkeypatch, model, batch_size=2)
+
+    result = backend._translate_sync(["ccc", "", "a", "bbbb", "dd"], "en", "zh")
+
+    assert model.batches == [["a", "dd"], ["ccc", "bbbb"]]
+    assert result == ["CCC", "", "A", "BBBB", "DD"]
+
+
+def test_local_failed_batch_is_none(monkeypatch):
+    model = RecordingModel(fail_on="bad")
+    backend = make_backend(monkeypatch, model, batch_size=2)
+
+    result = backend._translate_sync(["x", "bad", "longer", "longest"], "en", "zh")
+
+    # 按长度分批：["x", "bad"] 失败，["longer", "longest"] 正常
+    assert result == [None, None, "LONGER", "LONGEST"]
+
+
+def test_local_missing_model_returns_none(tmp_path):
+    backend = LocalModelBackend(models={"en-zh": str(tmp_path / "missing")})
+
+    result = backend._translate_sync(["hello", " ", "world"], "en", "zh")
+
+    assert result == [None, "", None]
+
+
+def test_local_async_wrapper(monkeypatch):
+    backend = make_backend(monkeypatch, RecordingModel())
+
+    assert asyncio.run(backend.translate_paragraphs(["a", "b"], "en", "zh")) == ["A", "B"]
+
+
+def test_local_engine_id_uses_configured_path():
+    backend = LocalModelBackend(models={"zh-en": "translator/custom"})
+
+    assert backend.engine_id("zh", "en") == "local:marian:translator/custom"
+    # 只配置部分方向时其余方向使用默认模型
+    assert backend.settings["models"]["en-zh"] == DEFAULT_LOCAL_SETTINGS["models"]["en-zh"]
+    with pytest.raises(ValueError):
+        backend.engine_id("zh", "ja")
+
+
+def test_local_unknown_engine():
+    with pytest.raises(ValueError):
+        LocalModelBackend(engine="unknown")
+
+
+def test_get_local_backend_reuses_instance():
+    settings = {"batch_size": 3, "unrelated": True}
+
+    assert get_local_backend(settings) is get_local_backend({"batch_size": 3})
+    assert get_local_backend(settings) is not get_local_backend({"batch_size": 4})
+
+
+def test_select_baidu_by_default():
+    config = {"baidu_api": {"appid": "id", "key": "secret", "qps": 10}}
+
+    backend = get_translation_backend(config=config)
+
+    assert isinstance(backend, BaiduBackend)
+    assert (backend.appid, backend.key) == ("id", "secret")
+    assert backend.settings == {**DEFAULT_BAIDU_SETTINGS, "qps": 10}
+
+
+def test_select_backend_from_config_and_name():
+    config = {"backend": "local", "local_model": {"batch_size": 8},
+              "baidu_api": {"appid": "id", "key": "secret"}}
+
+    local = get_translation_backend(config=config)
+    assert isinstance(local, LocalModelBackend)
+    assert local.settings["batch_size"] == 8
+    # 节点上选择的后端优先于配置文件
+    assert isinstance(get_translation_backend("baidu", config), BaiduBackend)
+
+
+def test_select_backend_errors():
+    with pytest.raises(ValueError):
+        get_translation_backend(config={"baidu_api": {"appid": "", "key": ""}})
+    with pytest.raises(ValueError):
+        get_translation_backend("unknown", config={})
@@ -0,0 +1,13 @@
+"""
+插件公共工具包
+"""
+
+from .background_loop import BackgroundLoop, get_background_loop
+from .state_store import (
+    StateNamespace, StateStore, get_node_state, get_state_store, node_state_key, workflow_id_of,
+)
+
+__all__ = [
+    'BackgroundLoop', 'get_background_loop',
+    'StateNamespace', 'StateStore', 'get_node_state', 'get_state_store', 'node_state_key', 'workflow_id_of',
+]
@@ -0,0 +1,83 @@
+"""
+后台事件循环
+用途：插件内需要长期复用 aiohttp 会话的组件（AI 助手连接池、翻译客户端）共用一个进程级的后台事件循环线程，
+节点执行线程和 ComfyUI 服务器的事件循环都通过这里提交协程
+"""
+
+import asyncio
+import atexit
+import threading
+from typing import Optional
+
+
+class BackgroundLoop:
+    """
+    懒启动的后台事件循环线程
+
+    - 同步调用方（节点执行线程）通过 run() 提交协程并等待结果
+    - 异步调用方（aiohttp 路由、async 节点）通过 run_async() 在自己的事件循环中等待
+    会话等绑定事件循环的对象只能在该循环中创建和使用。
+    """
+
+    def __init__(self, name: str = "axun-async"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """后台线程是否已启动且未停止"""
+        return self._loop is not None and not self._loop.is_closed() and self._loop.is_running()
+
+    def ensure(self) -> asyncio.AbstractEventLoop:
+        """懒启动后台事件循环线程"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在后台事件循环中执行协程，并同步等待结果"""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("不能在后台事件循环线程内同步等待")
+        loop = self.ensure()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    async def run_async(self, coro):
+        """从其他事件循环中等待后台事件循环执行的协程"""
+        if self.in_loop_thread():
+            return await coro
+        loop = self.ensure()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def stop(self):
+        """停止后台事件循环；各组件应先通过 run() 关闭自己的会话"""
+        with self._lock:
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+
+
+_background_loop: Optional[BackgroundLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundLoop:
+    """
+    获取进程级共享的后台事件循环
+
+    首次获取时注册退出时停止循环；使用方在此之后注册自己的关闭回调，退出时先于停止循环执行。
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = BackgroundLoop()
+            atexit.register(_background_loop.stop)
+        return _background_loop
@@ -0,0 +1,146 @@
+"""
+节点控件反馈推送
+用途：统一发送 impact-node-feedback 消息，仅用于显示的控件在短时间内的多次更新只发送最后一次
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 更新控件值的事件名（与 Impact Pack 前端约定一致）
+FEEDBACK_EVENT = "impact-node-feedback"
+
+# 默认参数
+DEFAULT_FEEDBACK_SETTINGS = {
+    "interval": 0.05,           # 合并窗口（秒）
+    "max_text_length": 20000,   # 仅用于显示的文本控件最多推送的字符数
+}
+
+
+def truncate_text(text: str, max_length: int) -> str:
+    """保留开头和结尾，中间替换为省略说明"""
+    if max_length <= 0 or len(text) <= max_length:
+        return text
+    half = max_length // 2
+    omitted = len(text) - half * 2
+    return f"{text[:half]}\n\n... (省略 {omitted} 个字符) ...\n\n{text[-half:]}"
+
+
+class FeedbackDispatcher:
+    """
+    合并发送控件更新
+
+    仅用于显示的控件更新按 (节点 ID, 控件名) 合并，窗口结束后按首次更新的顺序逐条发送，超长文本截断；
+    作为节点输入的控件（循环索引、计数等）立即发送完整值：前端下一次提交任务时使用控件的当前值，
+    更新必须在节点执行结束前到达，否则自动排队的下一个任务会使用旧值。
+    """
+
+    def __init__(self, send: Callable[[str, Dict[str, Any]], None], **settings):
+        self.send = send
+        self.settings = dict(DEFAULT_FEEDBACK_SETTINGS)
+        self.settings.update(settings)
+        self._lock = threading.Lock()
+        # 保证取出和发送的顺序一致，避免定时发送与 send_event 交错
+        self._send_lock = threading.RLock()
+        self._pending: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._timer: Optional[threading.Timer] = None
+        self.stats = {"updates": 0, "messages": 0, "bytes": 0, "coalesced": 0, "truncated": 0}
+
+    def update(self, node_id: str, widget_name: str, value_type: str, value: Any,
+               display_only: bool = False):
+        """登记一次控件更新"""
+        if not node_id:
+            return
+        truncated = False
+        if display_only and isinstance(value, str):
+            shortened = truncate_text(value, self.settings["max_text_length"])
+            truncated = shortened is not value
+            value = shortened
+        message = {
+            "node_id": node_id,
+            "widget_name": widget_name,
+            "type": value_type,
+            "value": value,
+        }
+        key = (str(node_id), widget_name)
+        if not display_only:
+            with self._send_lock:
+                with self._lock:
+                    self.stats["updates"] += 1
+                    self._pending.pop(key, None)
+                self._send(FEEDBACK_EVENT, message)
+            return
+        with self._lock:
+            self.stats["updates"] += 1
+            if truncated:
+                self.stats["truncated"] += 1
+            if key in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[key] = message
+            if self._timer is None:
+                self._timer = threading.Timer(self.settings["interval"], self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """立即发送所有待发送的更新"""
+        with self._send_lock:
+            with self._lock:
+                pending = list(self._pending.values())
+                self._pending.clear()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            for message in pending:
+                self._send(FEEDBACK_EVENT, message)
+
+    def send_event(self, event: str, data: Dict[str, Any]):
+        """
+        先发送待发送的控件更新，再发送其他事件
+
+        例如 impact-add-queue 会让前端按当前控件值提交新任务，必须在控件更新之后到达。
+        """
+        with self._send_lock:
+            self.flush()
+            self._send(event, data)
+
+    def _send(self, event: str, data: Dict[str, Any]):
+        try:
+            self.send(event, data)
+        except Exception as e:
+            print(f"[Feedback] 发送 {event} 失败: {e}")
+            return
+        size = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self.stats["messages"] += 1
+            self.stats["bytes"] += size
+
+
+def _send_sync(event: str, data: Dict[str, Any]):
+    from server import PromptServer
+    PromptServer.instance.send_sync(event, data)
+
+
+_dispatcher: Optional[FeedbackDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_feedback_dispatcher() -> FeedbackDispatcher:
+    """获取进程级共享的反馈推送器"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = FeedbackDispatcher(_send_sync)
+        return _dispatcher
+
+
+def send_feedback(node_id: str, widget_name: str, value_type: str, value: Any,
+                  display_only: bool = False):
+    """更新节点控件值；display_only 表示控件只用于显示，超长文本可截断"""
+    get_feedback_dispatcher().update(node_id, widget_name, value_type, value, display_only)
+
+
+def send_event(event: str, data: Dict[str, Any]):
+    """在已登记的控件更新之后发送其他事件"""
+    get_feedback_dispatcher().send_event(event, data)
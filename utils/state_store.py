@@ -0,0 +1,412 @@
+"""
+节点界面状态存储
+用途：替代按节点 ID 无限增长的模块级字典，按命名空间限制条目数和占用，可选持久化到 SQLite
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 获取当前模块所在目录
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_ROOT = os.path.dirname(UTILS_DIR)
+
+# 默认参数，可在 config/state_store.json 中覆盖
+DEFAULT_STATE_SETTINGS = {
+    "persist": True,                            # 是否持久化到 SQLite
+    "db_path": "cache/node_state.sqlite3",      # 数据库路径，相对路径基于插件目录
+    "max_entries": 1000,                        # 每个命名空间最多保留的节点数
+    "max_bytes": 16 * 1024 * 1024,              # 每个命名空间的值序列化后最大占用
+    "flush_interval": 0.5,                      # 合并写入数据库的时间窗口（秒）
+}
+
+# 前端批量写入的限制：单次写入条目数、键长度、单个值序列化后的大小
+MAX_UPDATES = 500
+MAX_KEY_LENGTH = 128
+MAX_VALUE_BYTES = 256 * 1024
+
+_MISSING = object()
+
+
+def _load_state_settings() -> Dict[str, Any]:
+    """读取 config/state_store.json，文件不存在时使用默认值"""
+    settings = dict(DEFAULT_STATE_SETTINGS)
+    config_path = os.path.join(PLUGIN_ROOT, "config", "state_store.json")
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                user_settings = json.load(f)
+            settings.update({k: v for k, v in user_settings.items() if k in DEFAULT_STATE_SETTINGS})
+        except (OSError, ValueError) as e:
+            print(f"[StateStore] 读取状态存储配置失败，使用默认值: {e}")
+    return settings
+
+
+class StateNamespace:
+    """
+    一个命名空间内的节点状态，用法与字典相同
+
+    按最近写入顺序淘汰超出条目数或占用上限的节点；值须可 JSON 序列化。
+    键由 node_state_key 生成，value_types 为前端写入时允许的值类型（None 表示不限）。
+    """
+
+    def __init__(self, store: "StateStore", name: str, max_entries: int, max_bytes: int,
+                 value_types: Optional[Tuple[type, ...]] = None):
+        self.store = store
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.value_types = value_types
+        # key -> (value, 序列化后的字节数)
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def _load(self, rows):
+        for key, encoded in rows:
+            try:
+                value = json.loads(encoded)
+            except ValueError:
+                continue
+            self._entries[key] = (value, len(encoded))
+            self._bytes += len(encoded)
+        evicted = self._evict()
+        if evicted:
+            self.store._delete(self.name, evicted)
+
+    def _evict(self):
+        """淘汰最久未写入的节点，返回被淘汰的键"""
+        evicted = []
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            evicted.append(key)
+        return evicted
+
+    def accepts(self, value: Any) -> bool:
+        """值的类型是否符合本命名空间的要求；bool 不视为 int"""
+        if self.value_types is None:
+            return True
+        if isinstance(value, bool) and bool not in self.value_types:
+            return False
+        return isinstance(value, self.value_types)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(str(key))
+            return default if entry is None else entry[0]
+
+    def set(self, key: str, value: Any):
+        key = str(key)
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, len(encoded))
+            self._bytes += len(encoded)
+            evicted = self._evict()
+            self.store._write(self.name, key, encoded, evicted)
+            if previous is None or previous[0] != value:
+                self.store._notify(self.name, key, value, False)
+
+    def pop(self, key: str, default: Any = _MISSING) -> Any:
+        key = str(key)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                if default is _MISSING:
+                    raise KeyError(key)
+                return default
+            self._bytes -= entry[1]
+            self.store._delete(self.name, [key])
+            self.store._notify(self.name, key, None, True)
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self.store._delete(self.name, keys)
+            for key in keys:
+                self.store._notify(self.name, key, None, True)
+
+    def items(self):
+        with self._lock:
+            return [(key, entry[0]) for key, entry in self._entries.items()]
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        self.set(key, value)
+
+    def __delitem__(self, key: str):
+        self.pop(key)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return str(key) in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class StateStore:
+    """
+    按命名空间管理节点状态
+
+    读写只操作内存；持久化时修改先登记，由定时线程在 flush_interval 后合并为一个事务写入 SQLite，
+    aiohttp 路由和节点执行线程都不会等待磁盘。同一节点在窗口内的多次修改只写入最后一次。
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_STATE_SETTINGS)
+        self.settings.update(settings)
+        self._namespaces: Dict[str, StateNamespace] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # (命名空间, 键) -> (序列化后的值, 更新时间)，None 表示删除
+        self._pending: "OrderedDict[Tuple[str, str], Optional[Tuple[str, float]]]" = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._listeners: List[Callable[[str, str, Any, bool], None]] = []
+        if self.settings["persist"]:
+            self._open()
+
+    @property
+    def db_path(self) -> str:
+        path = self.settings["db_path"]
+        return path if os.path.isabs(path) else os.path.join(PLUGIN_ROOT, path)
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS node_state ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._conn = conn
+        except sqlite3.Error as e:
+            print(f"[StateStore] 打开状态数据库失败，仅保存在内存中: {e}")
+            self._conn = None
+
+    def namespace(self, name: str, max_entries: Optional[int] = None,
+                  max_bytes: Optional[int] = None,
+                  value_types: Optional[Tuple[type, ...]] = None) -> StateNamespace:
+        """获取命名空间，首次获取时从数据库加载已保存的状态"""
+        with self._lock:
+            namespace = self._namespaces.get(name)
+            if namespace is None:
+                namespace = StateNamespace(
+                    self, name,
+                    max_entries or self.settings["max_entries"],
+                    max_bytes or self.settings["max_bytes"],
+                    value_types,
+                )
+                namespace._load(self._read(name))
+                self._namespaces[name] = namespace
+            elif value_types is not None:
+                namespace.value_types = value_types
+            return namespace
+
+    def get_namespace(self, name: str) -> Optional[StateNamespace]:
+        """获取已创建的命名空间，不存在时返回 None"""
+        with self._lock:
+            return self._namespaces.get(name)
+
+    def add_listener(self, listener: Callable[[str, str, Any, bool], None]):
+        """注册状态变化回调，参数为 (命名空间, 键, 新值, 是否已删除)；值未变化时不回调"""
+        self._listeners.append(listener)
+
+    def _notify(self, name: str, key: str, value: Any, removed: bool):
+        for listener in self._listeners:
+            try:
+                listener(name, key, value, removed)
+            except Exception as e:
+                print(f"[StateStore] 状态变化回调失败: {e}")
+
+    def _read(self, name: str):
+        if self._conn is None:
+            return []
+        try:
+            with self._db_lock:
+                return self._conn.execute(
+                    "SELECT key, value FROM node_state WHERE namespace = ? ORDER BY updated_at",
+                    (name,),
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[StateStore] 读取 {name} 状态失败: {e}")
+            return []
+
+    def _write(self, name: str, key: str, encoded: str, evicted):
+        if self._conn is None:
+            return
+        with self._pending_lock:
+            self._pending.pop((name, key), None)
+            self._pending[(name, key)] = (encoded, time.time())
+            for evicted_key in evicted:
+                self._pending[(name, evicted_key)] = None
+            self._schedule_flush()
+
+    def _delete(self, name: str, keys):
+        if self._conn is None or not keys:
+            return
+        with self._pending_lock:
+            for key in keys:
+                self._pending[(name, key)] = None
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """在 _pending_lock 内调用"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.settings["flush_interval"], self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """立即把登记的修改写入数据库"""
+        with self._pending_lock:
+            pending = list(self._pending.items())
+            self._pending.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return
+        upserts = [(name, key, entry[0], entry[1]) for (name, key), entry in pending if entry is not None]
+        deletes = [(name, key) for (name, key), entry in pending if entry is None]
+        with self._db_lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute("BEGIN")
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO node_state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                        upserts,
+                    )
+                if deletes:
+                    self._conn.executemany(
+                        "DELETE FROM node_state WHERE namespace = ? AND key = ?",
+                        deletes,
+                    )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                print(f"[StateStore] 保存节点状态失败: {e}")
+                try:
+                    self._conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: ns.stats() for name, ns in self._namespaces.items()}
+        return {
+            "persist": self._conn is not None,
+            "db_path": self.db_path,
+            "namespaces": namespaces,
+        }
+
+    def close(self):
+        """写入尚未保存的修改后关闭数据库"""
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def workflow_id_of(extra_pnginfo: Any) -> str:
+    """从节点的 EXTRA_PNGINFO 隐藏输入中读取前端工作流 ID，未提供时返回空字符串"""
+    if not isinstance(extra_pnginfo, dict):
+        return ""
+    workflow = extra_pnginfo.get("workflow")
+    if not isinstance(workflow, dict):
+        return ""
+    return str(workflow.get("id") or "")
+
+
+def node_state_key(node_id: Any, workflow_id: str = "") -> str:
+    """
+    节点状态的键：工作流 ID:节点 ID
+
+    节点 ID 只在单个工作流内唯一，加上工作流 ID 后不同工作流的同号节点互不影响；
+    工作流 ID 未知时（旧版前端、API 提交）只使用节点 ID。与 web/axun_state.js 的 nodeStateKey 一致。
+    """
+    return f"{workflow_id}:{node_id}" if workflow_id else str(node_id)
+
+
+def parse_state_updates(store: StateStore, data: Any) -> List[Tuple[StateNamespace, str, Any]]:
+    """
+    校验批量写入的请求体，返回 [(命名空间, 键, 值)]
+
+    只接受已存在的命名空间；键为不超过 MAX_KEY_LENGTH 的字符串，值须符合命名空间的类型且序列化后
+    不超过 MAX_VALUE_BYTES。任一条目不合法时抛出 ValueError，整个请求都不写入。
+    """
+    if not isinstance(data, dict):
+        raise ValueError("请求体格式错误")
+    updates = []
+    for name, values in data.items():
+        namespace = store.get_namespace(name)
+        if namespace is None:
+            continue
+        if not isinstance(values, dict):
+            raise ValueError(f"{name} 的值必须是 {{节点ID: 值}} 对象")
+        for key, value in values.items():
+            if not key or len(key) > MAX_KEY_LENGTH:
+                raise ValueError(f"{name} 中的节点键无效: {key[:MAX_KEY_LENGTH]}")
+            if not namespace.accepts(value):
+                raise ValueError(f"{name}[{key}] 的值类型不正确")
+            if len(json.dumps(value, ensure_ascii=False).encode("utf-8")) > MAX_VALUE_BYTES:
+                raise ValueError(f"{name}[{key}] 的值超过 {MAX_VALUE_BYTES} 字节")
+            updates.append((namespace, key, value))
+            if len(updates) > MAX_UPDATES:
+                raise ValueError(f"单次最多写入 {MAX_UPDATES} 个状态")
+    return updates
+
+
+_state_store: Optional[StateStore] = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """获取进程级共享的状态存储"""
+    global _state_store
+    with _state_store_lock:
+        if _state_store is None:
+            _state_store = StateStore(**_load_state_settings())
+            atexit.register(_state_store.close)
+        return _state_store
+
+
+def get_node_state(name: str, **options) -> StateNamespace:
+    """获取共享状态存储中的命名空间，options 为 max_entries / max_bytes / value_types"""
+    return get_state_store().namespace(name, **options)
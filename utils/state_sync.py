@@ -0,0 +1,135 @@
+"""
+节点状态前端同步
+用途：提供批量读写节点状态的 /axun/state 接口，并将状态变化合并后通过 websocket 推送到前端
+"""
+
+import json
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from aiohttp import web
+from server import PromptServer
+
+from .feedback import get_feedback_dispatcher
+from .state_store import get_state_store, parse_state_updates
+
+# 推送到前端的事件名
+STATE_EVENT = "axun-state"
+# 合并推送的时间窗口（秒）
+FLUSH_INTERVAL = 0.1
+# 批量写入接口的请求体大小上限，条目数和单个值的限制见 state_store.parse_state_updates
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class StatePublisher:
+    """
+    收集状态变化并在时间窗口结束后一次性推送
+
+    同一节点的同一状态在窗口内多次变化只推送最后的值。
+    推送格式为 {"changes": {命名空间: {节点键: 值}}, "removed": {命名空间: [节点键]}}，节点键见 node_state_key。
+    """
+
+    def __init__(self, send: Callable[[Dict[str, Any]], None], interval: float = FLUSH_INTERVAL):
+        self.send = send
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._changes: Dict[str, Dict[str, Any]] = {}
+        self._removed: Dict[str, set] = {}
+        self._timer: Optional[threading.Timer] = None
+        self.stats = {"changes": 0, "messages": 0}
+
+    def on_change(self, namespace: str, key: str, value: Any, removed: bool):
+        with self._lock:
+            self.stats["changes"] += 1
+            if removed:
+                self._changes.get(namespace, {}).pop(key, None)
+                self._removed.setdefault(namespace, set()).add(key)
+            else:
+                self._changes.setdefault(namespace, {})[key] = value
+                self._removed.get(namespace, set()).discard(key)
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            changes = {ns: values for ns, values in self._changes.items() if values}
+            removed = {ns: sorted(keys) for ns, keys in self._removed.items() if keys}
+            self._changes, self._removed = {}, {}
+            self._timer = None
+            if not changes and not removed:
+                return
+            self.stats["messages"] += 1
+        try:
+            self.send({"changes": changes, "removed": removed})
+        except Exception as e:
+            print(f"[StateSync] 推送状态失败: {e}")
+
+
+def _send_state(data: Dict[str, Any]):
+    PromptServer.instance.send_sync(STATE_EVENT, data)
+
+
+publisher = StatePublisher(_send_state)
+get_state_store().add_listener(publisher.on_change)
+
+
+def _split_param(value: str):
+    return [item for item in (part.strip() for part in value.split(",")) if item]
+
+
+@PromptServer.instance.routes.get("/axun/state")
+async def get_node_states(request):
+    """
+    批量获取节点状态
+
+    参数 ns 为逗号分隔的命名空间，ids 为逗号分隔的节点键（工作流 ID:节点 ID，省略时返回命名空间内全部节点）。
+    """
+    namespaces = _split_param(request.query.get("ns", ""))
+    ids = _split_param(request.query.get("ids", ""))
+    if not namespaces:
+        return web.json_response({"error": "缺少 ns 参数"}, status=400)
+
+    store = get_state_store()
+    result = {}
+    for name in namespaces:
+        namespace = store.get_namespace(name)
+        if namespace is None:
+            result[name] = {}
+        elif ids:
+            result[name] = {node_id: namespace[node_id] for node_id in ids if node_id in namespace}
+        else:
+            result[name] = dict(namespace.items())
+    return web.json_response(result)
+
+
+@PromptServer.instance.routes.post("/axun/state")
+async def set_node_states(request):
+    """批量设置节点状态，请求体为 {命名空间: {节点键: 值}}，校验规则见 state_store.parse_state_updates"""
+    if request.content_length is not None and request.content_length > MAX_REQUEST_BYTES:
+        return web.json_response({"error": "请求体过大"}, status=413)
+    body = await request.read()
+    if len(body) > MAX_REQUEST_BYTES:
+        return web.json_response({"error": "请求体过大"}, status=413)
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return web.json_response({"error": "请求体不是有效的 JSON"}, status=400)
+
+    try:
+        updates = parse_state_updates(get_state_store(), data)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    for namespace, key, value in updates:
+        namespace[key] = value
+    return web.json_response({"updated": len(updates)})
+
+
+@PromptServer.instance.routes.get("/axun/state/stats")
+async def get_state_stats(request):
+    """获取状态存储、状态推送和控件反馈推送统计"""
+    stats = get_state_store().stats()
+    stats["push"] = dict(publisher.stats)
+    stats["feedback"] = dict(get_feedback_dispatcher().stats)
+    return web.json_response(stats)
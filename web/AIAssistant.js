@@ -263,3 +263,66 @@ app.registerExtension(
 app.registerExtension(
     createGenericOpenAIExtension("GenericOpenAIVLMAPI")
 );
+
+// 通用 OpenAI 批量 LLM 扩展
+app.registerExtension(
+    createGenericOpenAIExtension("GenericOpenAIBatchLLMAPI")
+);
+
+// 流式输出预览：仅用于显示的 DOM 控件，不作为节点输入，也不保存到工作流
+const STREAM_PREVIEW_NODES = ["GenericOpenAILLMAPI", "GenericOpenAIVLMAPI"];
+
+function setStreamPreview(node, text) {
+    const widget = node.widgets?.find((w) => w.name === "stream_preview");
+    if (widget) {
+        widget.element.value = text ?? "";
+        widget.element.scrollTop = widget.element.scrollHeight;
+    }
+}
+
+app.registerExtension({
+    name: "axun.AIAssistant.stream_preview",
+    async beforeRegisterNodeDef(nodeType, nodeData) {
+        if (!STREAM_PREVIEW_NODES.includes(nodeData.name)) {
+            return;
+        }
+
+        const originalNodeCreated = nodeType.prototype.onNodeCreated;
+        nodeType.prototype.onNodeCreated = function () {
+            originalNodeCreated?.apply(this, arguments);
+
+            const element = document.createElement("textarea");
+            element.readOnly = true;
+            element.placeholder = "开启 stream 后在此显示生成中的文本";
+            element.style.cssText = "width: 100%; resize: none; opacity: 0.8;";
+            // 值始终为空，流式文本不会写入工作流
+            const widget = this.addDOMWidget("stream_preview", "preview", element, {
+                serialize: false,
+                getValue: () => "",
+                setValue: (value) => setStreamPreview(this, value),
+            });
+            widget.serialize = false;
+        };
+
+        // 执行完成（包括命中执行缓存）时显示最终文本
+        const originalExecuted = nodeType.prototype.onExecuted;
+        nodeType.prototype.onExecuted = function (message) {
+            originalExecuted?.apply(this, arguments);
+            if (message?.stream_preview) {
+                setStreamPreview(this, message.stream_preview.join(""));
+            }
+        };
+    },
+    setup() {
+        // 生成过程中后端经 impact-node-feedback 推送的增量文本
+        api.addEventListener("impact-node-feedback", ({ detail }) => {
+            if (detail?.widget_name !== "stream_preview") {
+                return;
+            }
+            const node = app.graph.getNodeById(Number(detail.node_id));
+            if (node) {
+                setStreamPreview(node, detail.value);
+            }
+        });
+    },
+});
@@ -0,0 +1,122 @@
+import { api } from '../../../scripts/api.js';
+import { app } from '../../../scripts/app.js';
+
+// 节点状态同步：合并各节点的读取和写入请求，并接收后端推送的状态变化
+// 后端接口见 utils/state_sync.py
+// 状态按 工作流ID:节点ID 保存（见 nodeStateKey），不同工作流的同号节点互不影响
+
+const LOAD_DELAY = 50;    // 合并读取请求的等待时间(ms)，同时等待工作流加载完成后节点 ID 确定
+const SAVE_DELAY = 200;   // 合并写入请求的等待时间(ms)
+
+const watchers = new Set();
+const pendingLoads = new Set();
+let loadTimer = null;
+let pendingSaves = {};
+let saveTimer = null;
+
+/**
+ * 当前工作流 ID，与节点执行时 EXTRA_PNGINFO 中 workflow.id 相同；旧版前端没有时为空字符串
+ */
+export function workflowId() {
+    return String((app.rootGraph ?? app.graph)?.id ?? '');
+}
+
+/**
+ * 节点状态的键，与 utils/state_store.py 的 node_state_key 一致
+ */
+export function nodeStateKey(node) {
+    const workflow = workflowId();
+    return workflow ? `${workflow}:${node.id}` : String(node.id);
+}
+
+function scheduleLoad(watcher) {
+    pendingLoads.add(watcher);
+    if (!loadTimer) {
+        loadTimer = setTimeout(flushLoads, LOAD_DELAY);
+    }
+}
+
+async function flushLoads() {
+    const batch = [...pendingLoads];
+    pendingLoads.clear();
+    loadTimer = null;
+    if (!batch.length) return;
+
+    const namespaces = [...new Set(batch.map(w => w.namespace))];
+    const ids = [...new Set(batch.map(w => nodeStateKey(w.node)))];
+    try {
+        const response = await api.fetchApi(
+            `/axun/state?ns=${encodeURIComponent(namespaces.join(','))}&ids=${encodeURIComponent(ids.join(','))}`
+        );
+        const data = await response.json();
+        for (const watcher of batch) {
+            const values = data[watcher.namespace] || {};
+            const key = nodeStateKey(watcher.node);
+            if (key in values) {
+                watcher.onValue(values[key]);
+            }
+        }
+    } catch (err) {
+        console.error("[AxunState] 获取节点状态失败:", err);
+    }
+}
+
+async function flushSaves() {
+    const body = pendingSaves;
+    pendingSaves = {};
+    saveTimer = null;
+    try {
+        await api.fetchApi('/axun/state', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+    } catch (err) {
+        console.error("[AxunState] 保存节点状态失败:", err);
+    }
+}
+
+/**
+ * 监听节点在后端保存的状态
+ * 初始值通过批量接口读取，之后的变化由后端推送；节点删除时自动取消监听
+ */
+export function watchNodeState(node, namespace, onValue) {
+    const watcher = { node, namespace, onValue };
+    watchers.add(watcher);
+    scheduleLoad(watcher);
+
+    const origRemoved = node.onRemoved;
+    node.onRemoved = function () {
+        watchers.delete(watcher);
+        pendingLoads.delete(watcher);
+        return origRemoved?.apply(this, arguments);
+    };
+    return watcher;
+}
+
+/**
+ * 保存节点状态到后端，短时间内的多次写入合并为一个请求
+ */
+export function setNodeState(node, namespace, value) {
+    (pendingSaves[namespace] ??= {})[nodeStateKey(node)] = value;
+    if (!saveTimer) {
+        saveTimer = setTimeout(flushSaves, SAVE_DELAY);
+    }
+}
+
+// 后端合并推送的状态变化：{changes: {命名空间: {节点键: 值}}, removed: {...}}
+api.addEventListener('axun-state', ({ detail }) => {
+    const changes = detail?.changes || {};
+    for (const watcher of watchers) {
+        const values = changes[watcher.namespace];
+        const key = nodeStateKey(watcher.node);
+        if (values && key in values) {
+            watcher.onValue(values[key]);
+        }
+    }
+});
+
+// 断线重连后重新读取，补上断线期间错过的推送
+api.addEventListener('reconnected', () => {
+    watchers.forEach(scheduleLoad);
+});
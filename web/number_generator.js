@@ -1,5 +1,6 @@
 import { api } from '../../../scripts/api.js';
 import { app } from '../../../scripts/app.js';
+import { setNodeState, watchNodeState } from './axun_state.js';
 
 // 注册数字生成器扩展
 app.registerExtension({
@@ -38,35 +39,20 @@ app.registerExtension({
                 }
                 
                 if (numberValueWidget) {
-                    // 从后端获取初始值
-                    fetch(`/axun-number/get-value?id=${node.id}`)
-                        .then(r => r.json())
-                        .then(data => {
-                            if (data.number_value) {
-                                numberValueWidget.value = data.number_value;
-                                node.onWidgetChanged(numberValueWidget);
-                            }
-                        });
+                    // 获取后端数字值，执行后的更新由后端推送
+                    watchNodeState(node, 'number_values', value => {
+                        if (value && value !== numberValueWidget.value) {
+                            numberValueWidget.value = value;
+                            node.onWidgetChanged(numberValueWidget);
+                        }
+                    });
 
                     // 添加callback同步到后端
-                    numberValueWidget.callback = async function() {
-                        await fetch(
-                            `/axun-number/set-value?id=${node.id}&value=${numberValueWidget.value}`,
-                            {method: 'POST'}
-                        );
+                    numberValueWidget.callback = function() {
+                        setNodeState(node, 'number_values', Math.floor(numberValueWidget.value));
                         node.onWidgetChanged(numberValueWidget);
                     }
 
-                    // 监听executed事件
-                    api.addEventListener('executed', async () => {
-                        const response = await fetch(`/axun-number/get-value?id=${node.id}`);
-                        const data = await response.json();
-                        if (data.number_value !== numberValueWidget.value) {
-                            numberValueWidget.value = data.number_value;
-                            node.onWidgetChanged(numberValueWidget);
-                        }
-                    });
-
                     // 监听queue事件
                     api.addEventListener('queue', () => {
                         node.onWidgetChanged(numberValueWidget);
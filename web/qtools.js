@@ -1,5 +1,6 @@
 import { api } from '../../../scripts/api.js';
 import { app } from '../../../scripts/app.js';
+import { workflowId } from './axun_state.js';
 
 /**
  * API请求工具类
@@ -42,7 +43,8 @@ class ApiService {
      */
     static async getLoopIndex(node_id) {
         try {
-            const data = await this.fetchWithRetry(`/axun-dir/loop-index?id=${node_id}`);
+            const workflow = encodeURIComponent(workflowId());
+            const data = await this.fetchWithRetry(`/axun-dir/loop-index?id=${node_id}&workflow=${workflow}`);
             return Math.floor(parseInt(data.loop_index) || 0);
         } catch (error) {
             console.error('获取循环索引失败:', error);
@@ -55,8 +57,9 @@ class ApiService {
      */
     static async setLoopIndex(node_id, loop_index) {
         try {
+            const workflow = encodeURIComponent(workflowId());
             const data = await this.fetchWithRetry(
-                `/axun-dir/set-loop-index?id=${node_id}&index=${Math.floor(loop_index)}`
+                `/axun-dir/set-loop-index?id=${node_id}&workflow=${workflow}&index=${Math.floor(loop_index)}`
             );
             return data.success;
         } catch (error) {
@@ -99,7 +102,7 @@ app.registerExtension({
 app.registerExtension({
     name: "AxunNodes.Path",
     async beforeRegisterNodeDef(nodeType, nodeData) {
-        if (nodeType.comfyClass === 'axun_nodes_PathProcessor') {
+        if (['axun_nodes_PathProcessor', 'axun_nodes_PathBatchProcessor'].includes(nodeType.comfyClass)) {
             const orig_nodeCreated = nodeType.prototype.onNodeCreated;
             nodeType.prototype.onNodeCreated = function () {
                 orig_nodeCreated?.apply(this, arguments);
@@ -1,5 +1,6 @@
 import { api } from '../../../scripts/api.js';
 import { app } from '../../../scripts/app.js';
+import { setNodeState, watchNodeState } from './axun_state.js';
 
 // 注册文本缓存器扩展
 app.registerExtension({
@@ -41,14 +42,7 @@ app.registerExtension({
                         node.onWidgetChanged(cacheTextWidget);
                         
                         // 同步到后端
-                        fetch(
-                            `/axun-text/set-cache?id=${node.id}`,
-                            {
-                                method: 'POST',
-                                headers: { 'Content-Type': 'application/json' },
-                                body: JSON.stringify({ text: inputText })
-                            }
-                        ).catch(err => console.error("[TextCache] 设置缓存失败:", err));
+                        setNodeState(node, 'text_cache', inputText);
                     }
                 }
             };
@@ -75,18 +69,7 @@ app.registerExtension({
                             node.onWidgetChanged(cacheTextWidget);
                             
                             // 同步到后端
-                            try {
-                                await fetch(
-                                    `/axun-text/set-cache?id=${node.id}`,
-                                    {
-                                        method: 'POST',
-                                        headers: { 'Content-Type': 'application/json' },
-                                        body: JSON.stringify({ text: inputTextWidget.value })
-                                    }
-                                );
-                            } catch (err) {
-                                console.error("[TextCache] 设置缓存失败:", err);
-                            }
+                            setNodeState(node, 'text_cache', inputTextWidget.value);
                         }
                     }
                 }
@@ -94,34 +77,19 @@ app.registerExtension({
                 if (cacheTextWidget) {
                     console.log("[TextCache] 找到缓存文本控件");
                     
-                    // 从后端获取初始缓存
-                    fetch(`/axun-text/get-cache?id=${node.id}`)
-                        .then(r => r.json())
-                        .then(data => {
-                            console.log("[TextCache] 获取初始缓存:", data);
-                            if (data.text) {
-                                cacheTextWidget.value = data.text;
-                                node.onWidgetChanged(cacheTextWidget);
-                            }
-                        })
-                        .catch(err => console.error("[TextCache] 获取缓存失败:", err));
+                    // 获取后端缓存，之后的变化由后端推送
+                    watchNodeState(node, 'text_cache', text => {
+                        if (text && text !== cacheTextWidget.value) {
+                            cacheTextWidget.value = text;
+                            node.onWidgetChanged(cacheTextWidget);
+                        }
+                    });
 
                     // 添加缓存文本的callback
                     cacheTextWidget.callback = async function() {
                         console.log("[TextCache] 缓存文本变更:", cacheTextWidget.value);
-                        try {
-                            await fetch(
-                                `/axun-text/set-cache?id=${node.id}`,
-                                {
-                                    method: 'POST',
-                                    headers: { 'Content-Type': 'application/json' },
-                                    body: JSON.stringify({ text: cacheTextWidget.value })
-                                }
-                            );
-                            node.onWidgetChanged(cacheTextWidget);
-                        } catch (err) {
-                            console.error("[TextCache] 设置缓存失败:", err);
-                        }
+                        setNodeState(node, 'text_cache', cacheTextWidget.value);
+                        node.onWidgetChanged(cacheTextWidget);
                     }
                 }
                 
@@ -1,5 +1,6 @@
 import { api } from '../../../scripts/api.js';
 import { app } from '../../../scripts/app.js';
+import { setNodeState, watchNodeState } from './axun_state.js';
 
 // 注册文本处理器扩展
 app.registerExtension({
@@ -20,38 +21,23 @@ app.registerExtension({
                 if (textIndexWidget) {
                     console.log("[TextProcessor] 找到text_index控件");
                     
-                    // 从后端获取初始索引
-                    fetch(`/axun-text/text-index?id=${node.id}`)
-                        .then(r => r.json())
-                        .then(data => {
-                            console.log("[TextProcessor] 获取初始索引:", data);
-                            textIndexWidget.value = Math.floor(parseInt(data.text_index) || 1);
+                    // 获取后端索引，执行后的更新由后端推送
+                    watchNodeState(node, 'text_indices', index => {
+                        index = Math.floor(parseInt(index) || 1);
+                        if (index !== textIndexWidget.value) {
+                            console.log("[TextProcessor] 更新索引:", index);
+                            textIndexWidget.value = index;
                             node.onWidgetChanged(textIndexWidget);
-                        })
-                        .catch(err => console.error("[TextProcessor] 获取索引失败:", err));
+                        }
+                    });
 
                     // 添加callback同步到后端
-                    textIndexWidget.callback = async function() {
+                    textIndexWidget.callback = function() {
                         console.log("[TextProcessor] 索引变更:", textIndexWidget.value);
-                        await fetch(
-                            `/axun-text/set-text-index?id=${node.id}&index=${Math.floor(textIndexWidget.value)}`,
-                            {method: 'POST'}
-                        );
+                        setNodeState(node, 'text_indices', Math.floor(textIndexWidget.value));
                         node.onWidgetChanged(textIndexWidget);
                     }
 
-                    // 监听executed事件，更新索引
-                    api.addEventListener('executed', async () => {
-                        console.log("[TextProcessor] 执行完成，检查索引更新");
-                        const response = await fetch(`/axun-text/text-index?id=${node.id}`);
-                        const data = await response.json();
-                        if (data.text_index !== textIndexWidget.value) {
-                            console.log("[TextProcessor] 更新索引:", data.text_index);
-                            textIndexWidget.value = data.text_index;
-                            node.onWidgetChanged(textIndexWidget);
-                        }
-                    });
-
                     // 监听queue事件
                     api.addEventListener('queue', () => {
                         console.log("[TextProcessor] 队列执行，同步索引");